@@ -0,0 +1,173 @@
+"""
+מטמון LRU בזיכרון לתוצאות ניתוח - מפתח לפי hash של בייטי התמונה והפרמטרים
+
+ביטול: משתנה הסביבה ANALYSIS_CACHE_DISABLED=1, או use_cache=False בקריאה.
+גודל: ANALYSIS_CACHE_MAX_BYTES (ברירת מחדל 64MB).
+
+מטמון נפרד (upstream_cache) שומר תשובות של OpenAI (ניתוח פואטי ו-DALL-E), עם תפוגה:
+UPSTREAM_CACHE_MAX_BYTES (ברירת מחדל 16MB), UPSTREAM_CACHE_TTL בשניות (ברירת מחדל 50 דקות).
+"""
+
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_UPSTREAM_MAX_BYTES = 16 * 1024 * 1024
+# כתובות התמונות של DALL-E פגות אחרי כשעה - התשובה השמורה חייבת לפוג לפני כן
+DEFAULT_UPSTREAM_TTL = 50 * 60
+
+
+def content_hash(data):
+    """
+    מחזיר hash של תוכן (SHA-256, hex)
+
+    Args:
+        data (bytes): הבייטים לגיבוב
+
+    Returns:
+        str: ה-hash
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*image_hashes, **params):
+    """
+    בונה מפתח מטמון מ-hash של התמונות ומהפרמטרים
+
+    Args:
+        *image_hashes (str): hash של כל תמונה שמשתתפת בניתוח
+        **params: פרמטרים שמשפיעים על התוצאה
+
+    Returns:
+        tuple: מפתח יציב
+    """
+    return image_hashes + tuple(sorted(params.items()))
+
+
+def estimate_size(value):
+    """
+    מעריך את גודל התוצאה בבייטים (מחרוזות base64 הן רוב הנפח)
+
+    Args:
+        value: dict / list / str / bytes / מספר
+
+    Returns:
+        int: גודל משוער
+    """
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 64
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(estimate_size(v) for v in value)
+    return 32
+
+
+class LRUCache:
+    """
+    מטמון LRU עם פינוי לפי גודל כולל בבייטים, בטוח לשימוש מכמה threads
+
+    ttl (בשניות, אופציונלי) - פריט שעבר את זמן התפוגה נחשב כהחטאה ונמחק.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, name='cache', ttl=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        מחזיר עותק של הערך השמור, או None אם אינו קיים
+        """
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self._items[key]
+                self._bytes -= entry[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        # עותק עמוק כדי שקוראים שמוסיפים שדות לא ישנו את המטמון
+        return copy.deepcopy(value)
+
+    def put(self, key, value, size=None):
+        """
+        שומר ערך ומפנה את הפריטים הישנים ביותר עד שהגודל חוזר לתקציב
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, evicted_size, _) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: מונים של פגיעות, החטאות, פינויים, תפוגות ונפח נוכחי
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+            }
+
+
+def cache_enabled():
+    """
+    האם המטמון פעיל (ניתן לכבות עם ANALYSIS_CACHE_DISABLED=1)
+    """
+    return os.getenv('ANALYSIS_CACHE_DISABLED', '').lower() not in ('1', 'true', 'yes')
+
+
+# המטמון המשותף לתוצאות color_utils
+analysis_cache = LRUCache(
+    max_bytes=int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+    name='analysis'
+)
+
+# המטמון לתשובות OpenAI (app.py / asgi_app.py)
+upstream_cache = LRUCache(
+    max_bytes=int(os.getenv('UPSTREAM_CACHE_MAX_BYTES', DEFAULT_UPSTREAM_MAX_BYTES)),
+    name='upstream',
+    ttl=float(os.getenv('UPSTREAM_CACHE_TTL', DEFAULT_UPSTREAM_TTL))
+)
@@ -0,0 +1,252 @@
+"""
+מאגר תהליכים לניתוחים כבדים (KMeans, Canny, רינדור) - מחוץ ל-thread של הבקשה
+
+ממשק זהה לפונקציות של color_utils. תמונות קטנות רצות inline; תמונות גדולות
+(לפי סף פיקסלים) מפוענחות בתהליך הראשי, ומערך הפיקסלים מועבר לתהליך העובד
+דרך multiprocessing.shared_memory - בלי pickle של הפיקסלים.
+
+הגדרות (משתני סביבה):
+    ANALYSIS_POOL_WORKERS       מספר התהליכים (0 = כבוי, ברירת מחדל: מספר הליבות)
+    ANALYSIS_POOL_MIN_PIXELS    סף הפיקסלים לניתוב למאגר (ברירת מחדל: 1,000,000)
+    ANALYSIS_POOL_START_METHOD  forkserver / spawn / fork (ברירת מחדל: forkserver)
+"""
+
+import os
+import sys
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+import color_utils
+from image_source import ImageSource
+from pixel_sampling import decode_reduced, DEFAULT_PIXEL_BUDGET
+from analysis_cache import analysis_cache, cache_enabled, make_key
+from tiled_edges import should_tile
+from metrics import collect_stages, record_stages
+
+POOL_WORKERS = int(os.getenv('ANALYSIS_POOL_WORKERS', os.cpu_count() or 1))
+POOL_MIN_PIXELS = int(os.getenv('ANALYSIS_POOL_MIN_PIXELS', 1_000_000))
+POOL_START_METHOD = os.getenv('ANALYSIS_POOL_START_METHOD', 'forkserver')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool_enabled():
+    return POOL_WORKERS > 0 and np is not None
+
+
+def get_executor():
+    """
+    יוצר את מאגר התהליכים בשימוש הראשון (אחרי ה-fork של gunicorn)
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                method = POOL_START_METHOD
+                if method not in multiprocessing.get_all_start_methods():
+                    method = 'spawn'
+                context = multiprocessing.get_context(method)
+                if method == 'forkserver':
+                    # שרת ה-fork טוען את ספריות הניתוח פעם אחת, לא את app.py
+                    # (color_utils עצמו טוען אותן בעצלות - כאן הן נטענות מראש לכל העובדים)
+                    context.set_forkserver_preload(['color_utils', 'sklearn.cluster', 'cv2'])
+                _executor = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=context)
+    return _executor
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown_pool)
+
+
+def _share_array(array):
+    """
+    מעתיק מערך לבלוק זיכרון משותף
+
+    Returns:
+        tuple: (SharedMemory, תיאור שאפשר להעביר לתהליך אחר)
+    """
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, {'name': shm.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def _attach_shared(name):
+    """
+    מתחבר לבלוק קיים בתהליך העובד בלי לרשום אותו ב-resource tracker
+    (הבעלים - התהליך הראשי - אחראי על unlink)
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _worker(func_name, descriptors, kwargs):
+    """
+    רץ בתהליך העובד: בונה ImageSource מעל הזיכרון המשותף ומריץ את הניתוח
+
+    Returns:
+        tuple: (התוצאה, השלבים שנמדדו) - המדדים של העובד לא נראים ב-/metrics של התהליך הראשי
+    """
+    blocks = [_attach_shared(d['name']) for d in descriptors]
+    arrays = []
+    sources = None
+    try:
+        for d, shm in zip(descriptors, blocks):
+            arrays.append(np.ndarray(d['shape'], dtype=np.dtype(d['dtype']), buffer=shm.buf))
+        sources = [ImageSource.from_array(array) for array in arrays]
+        with collect_stages() as stages:
+            result = getattr(color_utils, func_name)(*sources, use_cache=False, **kwargs)
+        return result, stages
+    finally:
+        # שחרור כל ההפניות לזיכרון המשותף לפני close - גם כשהניתוח נכשל
+        sources = None
+        arrays.clear()
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                # ה-traceback של החריגה עוד מחזיק view - המיפוי ישוחרר באיסוף, והחריגה המקורית עולה
+                pass
+
+
+def _prepare_pixels(func_name, source, kwargs):
+    """
+    מפענח בתהליך הראשי את מה שהניתוח צריך
+
+    לניתוח צבעים מספיק הפענוח המוקטן של הדגימה; לקווי מתאר צריך רזולוציה מלאה.
+    """
+    if func_name in ('analyze_image_colors', 'analyze_combined_colors'):
+        return decode_reduced(source, kwargs.get('pixel_budget', DEFAULT_PIXEL_BUDGET))
+    return source.rgb()
+
+
+def _run(func_name, sources, kwargs, use_cache):
+    inline = getattr(color_utils, func_name)
+    sources = [ImageSource.from_any(s) for s in sources]
+
+    try:
+        pixels = sum(w * h for w, h in (s.size for s in sources))
+    except Exception:
+        # אם אי אפשר לקרוא את ה-header - color_utils יחזיר את השגיאה המתאימה
+        pixels = 0
+
+    if not pool_enabled() or pixels < POOL_MIN_PIXELS:
+        return inline(*sources, use_cache=use_cache, **kwargs)
+
+    # המטמון נבדק בתהליך הראשי - לתהליכי העובדים יש מטמון נפרד משלהם
+    saves_files = kwargs.get('save_gradient') or kwargs.get('save_image')
+    cache_key = None
+    if use_cache and cache_enabled() and not saves_files:
+        cache_key = make_key(*(s.content_hash for s in sources), op=f'pool:{func_name}', **kwargs)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    blocks = []
+    try:
+        descriptors = []
+        for source in sources:
+            shm, descriptor = _share_array(_prepare_pixels(func_name, source, kwargs))
+            blocks.append(shm)
+            descriptors.append(descriptor)
+        result, stages = get_executor().submit(_worker, func_name, descriptors, kwargs).result()
+        record_stages(stages)
+    except BrokenProcessPool as e:
+        print(f"Warning: analysis pool failed, running inline: {e}")
+        shutdown_pool()
+        return inline(*sources, use_cache=use_cache, **kwargs)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    if cache_key is not None and result and 'error' not in result:
+        analysis_cache.put(cache_key, result)
+    return result
+
+
+def analyze_image_colors(image_data, num_colors=6, save_gradient=False, output_dir="color_results",
+                         gradient_format='png', gradient_space='rgb', engine=color_utils.DEFAULT_PALETTE_ENGINE,
+                         use_cache=True, pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """
+    כמו color_utils.analyze_image_colors - תמונות גדולות רצות במאגר התהליכים
+    """
+    kwargs = {
+        'num_colors': num_colors, 'save_gradient': save_gradient, 'output_dir': output_dir,
+        'gradient_format': gradient_format, 'gradient_space': gradient_space, 'engine': engine,
+        'pixel_budget': pixel_budget,
+    }
+    return _run('analyze_image_colors', [image_data], kwargs, use_cache)
+
+
+def analyze_combined_colors(image1_data, image2_data, num_colors=8, source_weight=0.5, gradient_format='png',
+                            gradient_space='rgb', engine=color_utils.DEFAULT_PALETTE_ENGINE, use_cache=True,
+                            pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """
+    כמו color_utils.analyze_combined_colors - תמונות גדולות רצות במאגר התהליכים
+    """
+    kwargs = {
+        'num_colors': num_colors, 'source_weight': source_weight, 'gradient_format': gradient_format,
+        'gradient_space': gradient_space, 'engine': engine, 'pixel_budget': pixel_budget,
+    }
+    return _run('analyze_combined_colors', [image1_data, image2_data], kwargs, use_cache)
+
+
+def _use_tiled(sources, tiled):
+    """
+    עיבוד ברצועות רץ inline: הזיכרון שלו חסום, והמאגר היה דורש פענוח RGB מלא לזיכרון המשותף
+    """
+    try:
+        return should_tile(*(source.size for source in sources), tiled=tiled)
+    except Exception:
+        # header לא קריא - color_utils יחזיר את השגיאה המתאימה
+        return False
+
+
+def analyze_image_edges(image_url, operator=color_utils.DEFAULT_EDGE_OPERATOR, use_cache=True, tiled=None):
+    """
+    כמו color_utils.analyze_image_edges - תמונות גדולות רצות במאגר התהליכים (או ברצועות)
+    """
+    source = ImageSource.from_any(image_url)
+    if _use_tiled([source], tiled):
+        return color_utils.analyze_image_edges(source, operator, use_cache=use_cache, tiled=True)
+    return _run('analyze_image_edges', [source], {'operator': operator, 'tiled': False}, use_cache)
+
+
+def analyze_combined_edges(image1_data, image2_data, blend_ratio=0.5, save_image=False,
+                           output_dir="edge_results", use_cache=True, tiled=None):
+    """
+    כמו color_utils.analyze_combined_edges - תמונות גדולות רצות במאגר התהליכים (או ברצועות)
+    """
+    sources = [ImageSource.from_any(image1_data), ImageSource.from_any(image2_data)]
+    if _use_tiled(sources, tiled):
+        return color_utils.analyze_combined_edges(*sources, blend_ratio, save_image, output_dir,
+                                                  use_cache=use_cache, tiled=True)
+    kwargs = {'blend_ratio': blend_ratio, 'save_image': save_image, 'output_dir': output_dir, 'tiled': False}
+    return _run('analyze_combined_edges', sources, kwargs, use_cache)
@@ -4,49 +4,309 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Set environment variables for matplotlib before importing
+# Set environment variables for matplotlib before it is imported (lazily, by color_utils)
 os.environ['MPLBACKEND'] = 'Agg'  # Force Agg backend before importing matplotlib
 os.environ['DISPLAY'] = ''  # Disable display
 
-# Import matplotlib with proper backend
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-GUI backend to prevent crashes
-    matplotlib.rcParams['backend'] = 'Agg'  # Force Agg backend
-except ImportError as e:
-    print(f"Warning: matplotlib import failed: {e}")
-
-from flask import Flask, request, jsonify, render_template
+from flask import (Flask, request, jsonify, render_template, Response, stream_with_context, g, has_request_context,
+                   send_file)
 from flask_cors import CORS
-from openai import OpenAI
 import base64
+import json
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 
-# Import color_utils with error handling
+# Import color_utils with error handling (heavy analyses are routed through the process pool)
 try:
-    from color_utils import analyze_image_colors, analyze_combined_edges, analyze_image_edges
+    from analysis_pool import analyze_image_colors, analyze_combined_colors, analyze_combined_edges, analyze_image_edges
+    from color_utils import render_gradient_payload
 except ImportError as e:
     print(f"Warning: color_utils import failed: {e}")
     # Define fallback functions
     def analyze_image_colors(*args, **kwargs):
         return {'error': 'Color analysis not available'}
+    def analyze_combined_colors(*args, **kwargs):
+        return {'error': 'Color analysis not available'}
     def analyze_combined_edges(*args, **kwargs):
         return {'error': 'Edge analysis not available'}
     def analyze_image_edges(*args, **kwargs):
         return {'error': 'Edge analysis not available'}
+    def render_gradient_payload(*args, **kwargs):
+        return {}
+
+from image_source import ImageSource
+from image_downloader import download_image
+import image_downloader
+from session_store import (session_store, SESSION_COOKIE, SESSION_KINDS, resolve_session_id, bind_session,
+                           current_session_id, run_in_session)
+from blob_store import blob_store, externalize_data_urls, sniff_content_type, artifact_urls
+from artifact_encoder import encode_data_urls, validate_encoding, DEFAULT_ARTIFACT_FORMAT, DEFAULT_ARTIFACT_PRESET
+from edge_engine import EDGE_OPERATORS
+from gradient_renderer import GRADIENT_FORMATS, GRADIENT_SPACES, MAX_GRADIENT_SIZE
+from pixel_sampling import MAX_PIXEL_BUDGET
+from palette_engines import PALETTE_ENGINES
+from analysis_cache import analysis_cache, upstream_cache, cache_enabled, content_hash, make_key
+import metrics
+from metrics import upstream, observe_upstream
+from lazy_imports import optional_import, preload
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 CORS(app)
 
-# Global variable to store session data
-session_data = {
-    'images': [],
-    'texts': [],
-    'gradients': [],
-    'edge_images': []
+# Blobs still listed in a live session are never evicted from the blob store
+blob_store.referenced = session_store.referenced_hashes
+
+# Cache counters in /metrics are read at scrape time
+metrics.register_cache('analysis', analysis_cache.stats)
+metrics.register_cache('upstream', upstream_cache.stats)
+metrics.register_cache('downloads', image_downloader.stats)
+
+# Worker pool for batch analysis (created on first use)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 4))
+BATCH_MAX_IMAGES = int(os.getenv('BATCH_MAX_IMAGES', 64))
+_batch_executor = None
+
+def get_batch_executor():
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+    return _batch_executor
+
+# Thread pool for /pipeline stages - mostly waiting on OpenAI, so not bound to the CPU count
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 16))
+_pipeline_executor = None
+
+def get_pipeline_executor():
+    global _pipeline_executor
+    if _pipeline_executor is None:
+        _pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='pipeline')
+    return _pipeline_executor
+
+# Per-client session content (bounded, see session_store.py)
+@app.before_request
+def load_client_session():
+    g.session_id, g.new_session = resolve_session_id(request.cookies.get(SESSION_COOKIE))
+    bind_session(g.session_id)
+
+@app.after_request
+def save_client_session(response):
+    if g.get('new_session'):
+        response.set_cookie(SESSION_COOKIE, g.session_id, max_age=int(session_store.ttl) or None,
+                            httponly=True, samesite='Lax')
+    return response
+
+# Per-stage metrics (see metrics.py) - the stages of the current request are collected for Server-Timing
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.metrics_token = metrics.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    if not metrics.METRICS_ENABLED or 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    metrics.HTTP_SECONDS.observe(elapsed, endpoint=request.endpoint or 'unmatched', method=request.method,
+                                 status=str(response.status_code))
+    metrics.count_bytes_in(request.content_length, 'request')
+    if not response.is_streamed:
+        metrics.count_bytes_out(response.content_length, 'response')
+    if metrics.SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = metrics.server_timing(metrics.request_stages(), elapsed)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc=None):
+    metrics.end_request(g.pop('metrics_token', None))
+
+def client_session_id():
+    """
+    הסשן של הבקשה הנוכחית - גם מתוך threads של מאגרי העובדים (דרך run_in_session)
+    """
+    if has_request_context() and 'session_id' in g:
+        return g.session_id
+    return current_session_id()
+
+def store_session_item(kind, item):
+    # Store the item in the client's session content - data URLs go to the blob store, the session keeps the hash
+    return session_store.append(client_session_id(), kind, externalize_data_urls(item, blob_store))
+
+class ParameterError(ValueError):
+    """
+    ערך לא תקין בפרמטר של הבקשה - נקודות הקצה מחזירות אותו כ-400 ולא כ-500
+    """
+
+# הסוג של כל פרמטר מספרי / בוליאני בטופס או ב-query string - כל שדה אחר (output_dir, מזהים) נשאר מחרוזת
+FORM_FIELD_TYPES = {
+    'num_colors': int,
+    'pixel_budget': int,
+    'width': int,
+    'height': int,
+    'source_weight': float,
+    'blend_ratio': float,
+    'use_cache': bool,
+    'fresh': bool,
+    'is_additional': bool,
+    'save_image': bool,
+    'save_gradient': bool,
+    'tiled': bool,
 }
 
+def _form_value(name, value):
+    """
+    ממיר ערך טקסט מטופס / query string לסוג שנקודות הקצה מצפות לו לפי FORM_FIELD_TYPES
+
+    Raises:
+        ParameterError: אם שדה מספרי / בוליאני לא ניתן להמרה, או שהמספר לא סופי (nan / inf)
+    """
+    cast = FORM_FIELD_TYPES.get(name)
+    if cast is None:
+        return value
+    lowered = value.strip().lower()
+    if cast is bool:
+        if lowered in ('true', '1'):
+            return True
+        if lowered in ('false', '0'):
+            return False
+        raise ParameterError(f"ערך לא תקין ל-{name}: {value}. אפשרויות: true / false")
+    try:
+        number = cast(lowered)
+    except ValueError:
+        raise ParameterError(f"ערך לא מספרי ל-{name}: {value}")
+    if not math.isfinite(number):
+        raise ParameterError(f"ערך לא סופי ל-{name}: {value}")
+    return number
+
+def choice_param(data, name, default, choices):
+    """
+    מחזיר פרמטר שחייב להיות אחד מהערכים המותרים
+
+    Raises:
+        ParameterError: אם הערך לא ברשימה
+    """
+    value = data.get(name, default)
+    if value not in choices:
+        raise ParameterError(f"ערך לא מוכר ל-{name}: {value}. אפשרויות: {', '.join(choices)}")
+    return value
+
+def number_param(data, name, default, minimum, maximum, cast=int):
+    """
+    מחזיר פרמטר מספרי בטווח [minimum, maximum]
+
+    מחרוזת מספרית מתקבלת ("0.5"), אבל לא bool / null / nan / inf, וב-cast=int גם לא שבר.
+
+    Raises:
+        ParameterError: אם הערך לא מספרי, לא סופי, לא שלם (ב-int) או מחוץ לטווח
+    """
+    value = data.get(name, default)
+    if value is None or isinstance(value, bool):
+        raise ParameterError(f"ערך לא מספרי ל-{name}: {value}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ParameterError(f"ערך לא מספרי ל-{name}: {value}")
+    if not math.isfinite(number):
+        raise ParameterError(f"ערך לא סופי ל-{name}: {value}")
+    if cast is int:
+        if not number.is_integer():
+            raise ParameterError(f"ערך לא שלם ל-{name}: {value}")
+        number = int(number)
+    if not minimum <= number <= maximum:
+        raise ParameterError(f"{name} חייב להיות בין {minimum} ל-{maximum} (התקבל {value})")
+    return number
+
+ARTIFACT_MODES = ('inline', 'url')
+
+def validate_artifact_options(data):
+    """
+    בודק את artifacts / artifact_format / artifact_preset לפני שהניתוח מתחיל
+
+    Raises:
+        ParameterError: אם אחד מהם לא מוכר
+    """
+    choice_param(data, 'artifacts', 'inline', ARTIFACT_MODES)
+    try:
+        validate_encoding(data.get('artifact_format', DEFAULT_ARTIFACT_FORMAT),
+                          data.get('artifact_preset', DEFAULT_ARTIFACT_PRESET))
+    except ValueError as e:
+        raise ParameterError(str(e))
+
+def request_data(image_field, list_fields=()):
+    """
+    קורא את גוף הבקשה בכל אחד משלושת הפורמטים הנתמכים
+
+    - application/json: כמו קודם - התמונה כ-base64 / data URL / URL
+    - multipart/form-data: כל קובץ הופך ל-ImageSource לפי שם השדה, ושאר שדות הטופס הם הפרמטרים
+    - image/* (או application/octet-stream): הגוף עצמו הוא התמונה בשדה image_field,
+      והפרמטרים מגיעים מה-query string
+
+    בהעלאה בינארית הבייטים נקראים מה-stream ישירות, בלי base64 ובלי פענוח JSON.
+
+    Args:
+        image_field (str): שם שדה התמונה הראשי של נקודת הקצה
+        list_fields (tuple): שדות שמקבלים רשימת קבצים (למשל 'images' באצווה)
+
+    Returns:
+        dict: הפרמטרים, עם ImageSource במקום התמונות שהועלו כקבצים
+    """
+    mimetype = request.mimetype
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        data = {key: _form_value(key, value) for key, value in request.args.items()}
+        length = request.content_length
+        if length is None:
+            body = request.get_data(cache=False)
+        else:
+            # קריאה אחת באורך ידוע - request.stream קורא בחלקים ומחבר, כלומר שני עותקים של הגוף
+            if length > app.config['MAX_CONTENT_LENGTH']:
+                raise RequestEntityTooLarge()
+            body = request.input_stream.read(length)
+        if body:
+            source = ImageSource(body)
+            data[image_field] = [source] if image_field in list_fields else source
+        return data
+
+    if mimetype == 'multipart/form-data':
+        data = {key: _form_value(key, value) for key, value in request.form.items()}
+        for name in request.files:
+            # werkzeug כבר קרא את הקובץ מה-stream (לדיסק אם הוא גדול) - קריאה אחת לבייטים
+            sources = [ImageSource(f.read()) for f in request.files.getlist(name) if f]
+            if name in list_fields:
+                data[name] = sources
+            elif sources:
+                data[name] = sources[0]
+        return data
+
+    return request.get_json()
+
+def artifact_response(result, data):
+    """
+    מחזיר את התוצאה לפי הפרמטרים artifacts / artifact_format / artifact_preset בבקשה
+
+    - 'inline' (ברירת מחדל): התמונות כ-data URL בתוך ה-JSON, כמו קודם
+    - 'url': כל תמונה נשמרת במאגר ה-blobs ומוחזרת ככתובת /blob/<hash>, עם ETag לפי התוכן
+      ו-Cache-Control ארוך, כך שצפייה חוזרת היא 304
+
+    בשני המצבים artifact_format ('png' / 'webp' ללא אובדן) ו-artifact_preset
+    ('preview' / 'default' / 'archive') קובעים את הקידוד (ראו artifact_encoder).
+
+    Args:
+        result (dict): תוצאת הניתוח
+        data (dict): פרמטרי הבקשה
+
+    Returns:
+        dict: התוצאה לשליחה
+    """
+    image_format = data.get('artifact_format', DEFAULT_ARTIFACT_FORMAT)
+    preset = data.get('artifact_preset', DEFAULT_ARTIFACT_PRESET)
+    if data.get('artifacts', 'inline') != 'url':
+        return encode_data_urls(result, image_format, preset)
+    return artifact_urls(result, blob_store, image_format, preset)
+
 # OpenAI client with error handling
 api_key = os.getenv('OPENAI_API_KEY')
 print(f"DEBUG: API key found: {'Yes' if api_key else 'No'}")
@@ -60,19 +320,57 @@ if not api_key:
     for key, value in os.environ.items():
         if 'OPENAI' in key or 'API' in key:
             print(f"  {key}: {value[:10] if value else 'None'}...")
-    client = None
-else:
+
+# The client is built on first use - importing app.py makes no network calls
+_client = None
+_client_lock = threading.Lock()
+
+# Result of the optional background key check (OPENAI_HEALTH_CHECK=1)
+openai_health = {'status': 'unchecked'}
+
+def get_client():
+    """
+    לקוח OpenAI משותף - נוצר בקריאה הראשונה (ספריית openai נטענת רק אז)
+
+    Returns:
+        OpenAI: הלקוח, או None אם אין מפתח API או שהספרייה לא מותקנת
+    """
+    global _client
+    if _client is None and api_key:
+        with _client_lock:
+            if _client is None:
+                openai = optional_import('openai')
+                if openai is not None:
+                    _client = openai.OpenAI(api_key=api_key)
+    return _client
+
+def check_openai_health():
+    """
+    בודק את המפתח מול OpenAI (רשימת המודלים) - רץ ב-thread ברקע, לא חוסם את העלייה
+    """
+    client = get_client()
+    if client is None:
+        openai_health.update(status='unavailable')
+        return
     try:
-        # Test the API key by making a simple request
-        test_client = OpenAI(api_key=api_key)
         # Try to list models to test the key
-        models = test_client.models.list()
+        with upstream('models'):
+            models = client.models.list()
         print(f"✅ API key test successful - found {len(models.data)} models")
-        client = test_client
+        openai_health.update(status='ok', models=len(models.data), checked_at=time.time())
     except Exception as e:
         print(f"ERROR: API key test failed: {e}")
         print("Please check your API key at: https://platform.openai.com/account/api-keys")
-        client = None
+        openai_health.update(status='error', error=str(e), checked_at=time.time())
+
+if api_key and os.getenv('OPENAI_HEALTH_CHECK', '').lower() in ('1', 'true', 'yes'):
+    threading.Thread(target=check_openai_health, name='openai-health', daemon=True).start()
+
+# Optionally load the heavy analysis libraries in the background after boot,
+# so the first analysis request does not pay for the import
+if os.getenv('ANALYSIS_PRELOAD', '').lower() in ('1', 'true', 'yes'):
+    threading.Thread(target=preload, args=('sklearn.cluster', 'cv2', 'openai'), name='preload',
+                     daemon=True).start()
 
 # Function to encode image from base64 string
 def encode_image_from_base64(base64_string):
@@ -82,94 +380,397 @@ def encode_image_from_base64(base64_string):
 def index():
     return render_template('index.html')
 
+# Blobs are content-addressed, so they never change once written
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+
+# Page size for /get-all-content
+CONTENT_PAGE_SIZE = 100
+CONTENT_MAX_PAGE_SIZE = 500
+
 @app.route('/get-all-content', methods=['GET'])
 def get_all_content():
     """
-    נקודת קצה לקבלת כל התוכן שנוצר במהלך הסשן
+    נקודת קצה לקבלת התוכן שנוצר בסשן - בעמודים, עם סמן לקבלת החדש בלבד
+    
+    פרמטרים (query): since - הסמן מהתשובה הקודמת, limit - גודל העמוד, kind - סוג תוכן אחד בלבד.
+    התמונות מוחזרות ככתובות /blob/<hash> ולא כ-base64.
+    """
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', CONTENT_PAGE_SIZE, type=int), CONTENT_MAX_PAGE_SIZE)
+        kind = request.args.get('kind')
+        
+        if limit <= 0:
+            return jsonify({'error': 'limit חייב להיות חיובי'}), 400
+        if kind and kind not in SESSION_KINDS:
+            return jsonify({'error': f'סוג תוכן לא מוכר: {kind}'}), 400
+        
+        # רק התוכן של הסשן של הלקוח הזה
+        return jsonify(session_store.page(client_session_id(), since=since, limit=limit,
+                                          kinds=(kind,) if kind else SESSION_KINDS))
+    except Exception as e:
+        return jsonify({'error': f'שגיאה בקבלת התוכן: {str(e)}'}), 500
+
+@app.route('/blob/<blob_hash>', methods=['GET'])
+def get_blob(blob_hash):
+    """
+    מגיש את הבייטים של blob לפי ה-hash שלו (התוכן לא משתנה - אפשר לשמור במטמון לתמיד)
+    """
+    found = blob_store.open(blob_hash)
+    if found is None:
+        return jsonify({'error': 'הקובץ לא נמצא'}), 404
+    path, content_type = found
+    response = send_file(path, mimetype=content_type, etag=blob_hash, max_age=BLOB_MAX_AGE, conditional=True)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    בדיקת חיות ל-worker - לא פונה ל-OpenAI, רק מחזיר את תוצאת הבדיקה ברקע (אם הופעלה)
+    """
+    return jsonify({'status': 'ok', 'openai': openai_health})
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    נקודת קצה לסטטיסטיקות המטמון (פגיעות / החטאות / נפח)
     """
     try:
         return jsonify({
-            'images': session_data['images'],
-            'texts': session_data['texts'],
-            'gradients': session_data['gradients'],
-            'edge_images': session_data['edge_images']
+            'analysis': analysis_cache.stats(),
+            'upstream': upstream_cache.stats(),
+            'downloads': image_downloader.stats(),
+            'sessions': session_store.stats(),
+            'blobs': blob_store.stats()
         })
     except Exception as e:
-        return jsonify({'error': f'שגיאה בקבלת התוכן: {str(e)}'}), 500
+        return jsonify({'error': f'שגיאה בקבלת סטטיסטיקות המטמון: {str(e)}'}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    מדדי הביצועים של ה-worker בפורמט הטקסט של Prometheus (זמן לכל שלב, OpenAI, בייטים, מטמונים)
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# Prompt and sampling parameters shared by the sync (Flask) and async (ASGI) paths
+ANALYSIS_SYSTEM_PROMPT = (
+    "אתה סוכן מוזיקלי-פואטי הזוי, ציני ומצחיק. אתה רואה תמונות כאילו היו תווים, צבעים כצלילים, ותנועה כקצב. "
+    "כל תיאור שאתה כותב נועד להעביר תחושת סאונד, מרקם, ואווירה, כמו פסקול רגשי שנולד מהחזות. "
+    "אל תיקח את עצמך יותר מידי ברצינות תהיה פיוטי ומצחיק והזוי. "
+    "אל תברח לגמרי מהתמונה מהתיאור שלך סוכן אחר צריך לייצר סאונד ותמונה חדשים"
+)
+ANALYSIS_USER_PROMPT = " התיאור יהפוך לאחר מכן להנחייה ליצירת תמונה נוספת אבל אל תכתוב את זה. תאר את התמונה המצורפת כמוזיקה פיוטית מצחיקה וצינית בעברית."
+ANALYSIS_PARAMS = {
+    'model': "gpt-4o-mini",
+    'temperature': 0.60,
+    'max_tokens': 1500,
+    'top_p': 1,
+    'frequency_penalty': 0,
+    'presence_penalty': 0,
+}
+IMAGE_GENERATION_PARAMS = {
+    'model': "dall-e-3",
+    'size': "1024x1024",
+    'quality': "standard",
+    'n': 1,
+}
+CLIENT_NOT_INITIALIZED = 'OpenAI client not initialized. Please check that OPENAI_API_KEY is set correctly.'
+
+def build_analysis_messages(image_data):
+    """
+    בונה את ההודעות לניתוח הפואטי של תמונה (base64 ללא prefix, או ImageSource מהעלאה בינארית)
+    """
+    if isinstance(image_data, ImageSource):
+        # העלאה בינארית - base64 נוצר רק כאן, לבקשה ל-OpenAI
+        image_url = (f"data:{sniff_content_type(image_data.raw_bytes[:12])};base64,"
+                     f"{base64.b64encode(image_data.raw_bytes).decode('ascii')}")
+    else:
+        image_url = f"data:image/jpeg;base64,{image_data}"
+    return [
+        {
+            "role": "system",
+            "content": ANALYSIS_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": ANALYSIS_USER_PROMPT},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url
+                    }
+                }
+            ]
+        }
+    ]
+
+def analysis_cache_key(image_data):
+    """
+    מפתח מטמון לניתוח פואטי: hash של בייטי התמונה, ההנחיות והפרמטרים של המודל
+    """
+    prompt_hash = content_hash((ANALYSIS_SYSTEM_PROMPT + ANALYSIS_USER_PROMPT).encode('utf-8'))
+    if isinstance(image_data, ImageSource):
+        return make_key(image_data.content_hash, op='analyze', prompt=prompt_hash, **ANALYSIS_PARAMS)
+    try:
+        image_hash = content_hash(base64.b64decode(image_data))
+    except Exception:
+        image_hash = content_hash(image_data.encode('utf-8'))
+    return make_key(image_hash, op='analyze', prompt=prompt_hash, **ANALYSIS_PARAMS)
+
+def generation_cache_key(prompt):
+    """
+    מפתח מטמון ליצירת תמונה: hash של ההנחיה והפרמטרים של DALL-E
+    """
+    return make_key(content_hash(prompt.encode('utf-8')), op='generate', **IMAGE_GENERATION_PARAMS)
+
+def upstream_lookup(key, fresh=False):
+    """
+    מחזיר תשובה שמורה של OpenAI, או None (גם כשביקשו fresh או שהמטמון כבוי)
+    """
+    if fresh or not cache_enabled():
+        return None
+    return upstream_cache.get(key)
+
+def upstream_store(key, value):
+    if cache_enabled():
+        upstream_cache.put(key, value)
+
+def store_uploaded_image(image_data, is_additional):
+    # Store the image in session data
+    image_type = 'additional' if is_additional else 'original'
+    store_session_item('images', {
+        # בייטים מהעלאה בינארית עוברים ישירות למאגר ה-blobs
+        'url': image_data.raw_bytes if isinstance(image_data, ImageSource) else f"data:image/jpeg;base64,{image_data}",
+        'type': image_type
+    })
+
+def store_analysis_text(result):
+    # Store the text in session data
+    store_session_item('texts', {
+        'text': result
+    })
+
+def store_generated_image(generated_image_url, prompt, is_additional):
+    # Store the generated image in session data
+    image_type = 'additional_generated' if is_additional else 'generated'
+    store_session_item('images', {
+        'url': generated_image_url,
+        'prompt': prompt,
+        'type': image_type
+    })
+
+def analysis_text(response):
+    result = response.choices[0].message.content
+    if result is None:
+        result = "לא הצלחתי ליצור תיאור פואטי לתמונה"
+    return result
+
+def stream_chunk_text(chunk):
+    """
+    מחזיר את הטקסט החדש ב-chunk של stream=True (או מחרוזת ריקה)
+    """
+    if not chunk.choices:
+        return ''
+    return chunk.choices[0].delta.content or ''
+
+def finish_streamed_analysis(parts, cache_key):
+    """
+    מרכיב את הטקסט המלא בסוף ה-stream, שומר אותו במטמון ובנתוני הסשן
+    """
+    result = ''.join(parts)
+    if result:
+        upstream_store(cache_key, result)
+    else:
+        result = "לא הצלחתי ליצור תיאור פואטי לתמונה"
+    store_analysis_text(result)
+    return result
+
+# Headers for Server-Sent Events (no proxy buffering, no caching)
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse_event(event, payload):
+    """
+    אירוע SSE אחד - ה-data מקודד כ-JSON כדי ששורות חדשות בטקסט לא ישברו את הפורמט
+    """
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def generated_image_response(image_result, prompt, is_additional):
+    """
+    מפרק את תשובת DALL-E ומחזיר (payload, status)
+    """
+    # Get the image URL
+    if image_result.data and len(image_result.data) > 0:
+        generated_image_url = image_result.data[0].url
+        if generated_image_url:
+            store_generated_image(generated_image_url, prompt, is_additional)
+            return {'generated_image_url': generated_image_url}, 200
+        else:
+            return {'error': 'לא התקבל URL לתמונה'}, 500
+    else:
+        return {'error': 'לא התקבלו נתונים מהמודל'}, 500
+
+def cached_generation_response(generated_image_url, prompt, is_additional):
+    store_generated_image(generated_image_url, prompt, is_additional)
+    return {'generated_image_url': generated_image_url, 'cached': True}
+
+def run_poetic_analysis(image_data, is_additional=False, fresh=False):
+    """
+    ניתוח פואטי של תמונה (base64 ללא prefix) - משותף ל-/analyze ול-/pipeline
+
+    Returns:
+        tuple: (payload, status)
+    """
+    store_uploaded_image(image_data, is_additional)
+    
+    # אותה תמונה עם אותם פרמטרים - בלי קריאה נוספת למודל
+    cache_key = analysis_cache_key(image_data)
+    cached = upstream_lookup(cache_key, fresh)
+    if cached is not None:
+        store_analysis_text(cached)
+        return {'result': cached, 'cached': True}, 200
+    
+    client = get_client()
+    if client is None:
+        return {'error': CLIENT_NOT_INITIALIZED}, 500
+    
+    with upstream('chat'):
+        response = client.chat.completions.create(
+            messages=build_analysis_messages(image_data),
+            **ANALYSIS_PARAMS
+        )
+    
+    result = analysis_text(response)
+    if response.choices[0].message.content is not None:
+        upstream_store(cache_key, result)
+    store_analysis_text(result)
+    
+    return {'result': result}, 200
 
 @app.route('/analyze', methods=['POST'])
 def analyze_image():
     try:
-        data = request.get_json()
+        data = request_data('image')
         image_data = data.get('image')
         is_additional = data.get('is_additional', False)  # New parameter to identify additional images
+        fresh = data.get('fresh', False)  # אופציונלי - True עוקף את מטמון התשובות
         
         if not image_data:
             return jsonify({'error': 'לא נשלחה תמונה'}), 400
         
         # Remove data URL prefix if present
-        if image_data.startswith('data:image'):
+        if isinstance(image_data, str) and image_data.startswith('data:image'):
             image_data = image_data.split(',')[1]
         
-        # Store the image in session data
-        image_type = 'additional' if is_additional else 'original'
-        session_data['images'].append({
-            'id': len(session_data['images']),
-            'url': f"data:image/jpeg;base64,{image_data}",
-            'type': image_type,
-            'timestamp': len(session_data['images'])
-        })
+        payload, status = run_poetic_analysis(image_data, is_additional, fresh)
+        return jsonify(payload), status
         
-        if client is None:
-            return jsonify({'error': 'OpenAI client not initialized. Please check that OPENAI_API_KEY is set correctly.'}), 500
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'שגיאה: {str(e)}'}), 500
+
+@app.route('/analyze-stream', methods=['POST'])
+def analyze_image_stream():
+    """
+    כמו /analyze, אבל מחזיר את הטקסט כ-Server-Sent Events תוך כדי היצירה
+
+    אירועים: token ({'text'}) לכל קטע טקסט, done ({'result'}) בסוף, error ({'error'}) בכישלון.
+    """
+    try:
+        data = request_data('image')
+        image_data = data.get('image')
+        is_additional = data.get('is_additional', False)
+        fresh = data.get('fresh', False)  # אופציונלי - True עוקף את מטמון התשובות
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.60,
-            max_tokens=1500,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "אתה סוכן מוזיקלי-פואטי הזוי, ציני ומצחיק. אתה רואה תמונות כאילו היו תווים, צבעים כצלילים, ותנועה כקצב. "
-                        "כל תיאור שאתה כותב נועד להעביר תחושת סאונד, מרקם, ואווירה, כמו פסקול רגשי שנולד מהחזות. "
-                        "אל תיקח את עצמך יותר מידי ברצינות תהיה פיוטי ומצחיק והזוי. "
-                        "אל תברח לגמרי מהתמונה מהתיאור שלך סוכן אחר צריך לייצר סאונד ותמונה חדשים"
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": " התיאור יהפוך לאחר מכן להנחייה ליצירת תמונה נוספת אבל אל תכתוב את זה. תאר את התמונה המצורפת כמוזיקה פיוטית מצחיקה וצינית בעברית."},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_data}"
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
+        if not image_data:
+            return jsonify({'error': 'לא נשלחה תמונה'}), 400
         
-        result = response.choices[0].message.content
-        if result is None:
-            result = "לא הצלחתי ליצור תיאור פואטי לתמונה"
+        # Remove data URL prefix if present
+        if isinstance(image_data, str) and image_data.startswith('data:image'):
+            image_data = image_data.split(',')[1]
         
-        # Store the text in session data
-        session_data['texts'].append({
-            'id': len(session_data['texts']),
-            'text': result,
-            'timestamp': len(session_data['texts'])
-        })
+        store_uploaded_image(image_data, is_additional)
         
-        return jsonify({'result': result})
+        cache_key = analysis_cache_key(image_data)
+        cached = upstream_lookup(cache_key, fresh)
+        client = get_client()
+        if cached is None and client is None:
+            return jsonify({'error': CLIENT_NOT_INITIALIZED}), 500
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה: {str(e)}'}), 500
+    
+    def generate():
+        # תשובה מהמטמון - קטע אחד ומיד done
+        if cached is not None:
+            store_analysis_text(cached)
+            yield sse_event('token', {'text': cached})
+            yield sse_event('done', {'result': cached, 'cached': True})
+            return
+        
+        parts = []
+        stream = None
+        # הקריאה נמדדת עד הקטע האחרון - כולל הזמן שה-stream נקרא
+        start, failed = time.perf_counter(), False
+        try:
+            stream = client.chat.completions.create(
+                messages=build_analysis_messages(image_data),
+                stream=True,
+                **ANALYSIS_PARAMS
+            )
+            for chunk in stream:
+                text = stream_chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield sse_event('token', {'text': text})
+        except Exception as e:
+            failed = True
+            yield sse_event('error', {'error': f'שגיאה: {str(e)}'})
+            return
+        finally:
+            # הלקוח התנתק או שהיצירה הסתיימה - סוגרים את החיבור ל-OpenAI
+            if stream is not None:
+                stream.close()
+            observe_upstream('chat_stream', time.perf_counter() - start, error=failed)
+        
+        yield sse_event('done', {'result': finish_streamed_analysis(parts, cache_key)})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def run_image_generation(prompt, is_additional=False, fresh=False):
+    """
+    יצירת תמונה מהטקסט הפואטי - משותף ל-/generate-image ול-/pipeline
+
+    Returns:
+        tuple: (payload, status)
+    """
+    # אותה הנחיה - אותה תמונה, בלי קריאה נוספת ל-DALL-E
+    cache_key = generation_cache_key(prompt)
+    cached = upstream_lookup(cache_key, fresh)
+    if cached is not None:
+        return cached_generation_response(cached, prompt, is_additional), 200
+    
+    # Generate new image based on the poetic text
+    try:
+        client = get_client()
+        if client is None:
+            return {'error': CLIENT_NOT_INITIALIZED}, 500
+            
+        with upstream('image'):
+            image_result = client.images.generate(prompt=prompt, **IMAGE_GENERATION_PARAMS)
+        
+        payload, status = generated_image_response(image_result, prompt, is_additional)
+        if status == 200:
+            upstream_store(cache_key, payload['generated_image_url'])
+        return payload, status
+            
+    except Exception as e:
+        return {'error': f'שגיאה ביצירת התמונה: {str(e)}'}, 500
 
 @app.route('/generate-image', methods=['POST'])
 def generate_image():
@@ -177,44 +778,13 @@ def generate_image():
         data = request.get_json()
         prompt = data.get('prompt')
         is_additional = data.get('is_additional', False)  # New parameter to identify additional images
+        fresh = data.get('fresh', False)  # אופציונלי - True עוקף את מטמון התשובות
         
         if not prompt:
             return jsonify({'error': 'לא נשלח טקסט להנחיית יצירת התמונה'}), 400
         
-        # Generate new image based on the poetic text
-        try:
-            if client is None:
-                return jsonify({'error': 'OpenAI client not initialized. Please check that OPENAI_API_KEY is set correctly.'}), 500
-                
-            image_result = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
-            
-            # Get the image URL
-            if image_result.data and len(image_result.data) > 0:
-                generated_image_url = image_result.data[0].url
-                if generated_image_url:
-                    # Store the generated image in session data
-                    image_type = 'additional_generated' if is_additional else 'generated'
-                    session_data['images'].append({
-                        'id': len(session_data['images']),
-                        'url': generated_image_url,
-                        'prompt': prompt,
-                        'type': image_type,
-                        'timestamp': len(session_data['images'])
-                    })
-                    return jsonify({'generated_image_url': generated_image_url})
-                else:
-                    return jsonify({'error': 'לא התקבל URL לתמונה'}), 500
-            else:
-                return jsonify({'error': 'לא התקבלו נתונים מהמודל'}), 500
-                
-        except Exception as e:
-            return jsonify({'error': f'שגיאה ביצירת התמונה: {str(e)}'}), 500
+        payload, status = run_image_generation(prompt, is_additional, fresh)
+        return jsonify(payload), status
         
     except Exception as e:
         return jsonify({'error': f'שגיאה: {str(e)}'}), 500
@@ -225,32 +795,35 @@ def analyze_colors():
     נקודת קצה לניתוח צבעים דומיננטיים בתמונה
     """
     try:
-        data = request.get_json()
+        data = request_data('image_url')
         image_url = data.get('image_url')
         num_colors = data.get('num_colors', 6)
         save_gradient = data.get('save_gradient', False)  # אופציונלי - שמירה קבועה
         output_dir = data.get('output_dir', 'color_results')  # אופציונלי - תיקיית שמירה
+        gradient_format = data.get('gradient_format', 'png')  # אופציונלי - png / css
+        gradient_space = data.get('gradient_space', 'rgb')  # אופציונלי - rgb / oklab
+        engine = choice_param(data, 'engine', 'kmeans', PALETTE_ENGINES)  # אופציונלי - kmeans / minibatch / median_cut / octree / histogram
+        use_cache = data.get('use_cache', True)  # אופציונלי - False עוקף את מטמון התוצאות
+        pixel_budget = number_param(data, 'pixel_budget', 22500, 1, MAX_PIXEL_BUDGET)  # אופציונלי - מספר הפיקסלים לדגימה
+        validate_artifact_options(data)
         
         if not image_url:
             return jsonify({'error': 'לא נשלחה תמונה'}), 400
         
-        # הורדת התמונה אם זה URL
-        import requests
-        import base64
-        
-        if image_url.startswith('http'):
+        # הורדת התמונה אם זה URL (דרך מטמון ההורדות המשותף)
+        if isinstance(image_url, str) and image_url.startswith('http'):
             try:
-                response = requests.get(image_url, timeout=10)
-                response.raise_for_status()
-                image_data = base64.b64encode(response.content).decode('utf-8')
+                image_data = download_image(image_url)
             except Exception as e:
                 return jsonify({'error': f'שגיאה בהורדת התמונה: {str(e)}'}), 500
         else:
-            # אם זה כבר base64
-            image_data = image_url
+            # base64 - פענוח חד-פעמי; העלאה בינארית כבר הגיעה כ-ImageSource
+            image_data = ImageSource.from_any(image_url)
         
         # ניתוח הצבעים (כולל גרדיאנט אוטומטי)
-        result = analyze_image_colors(image_data, num_colors, save_gradient, output_dir)
+        result = analyze_image_colors(image_data, num_colors, save_gradient, output_dir,
+                                      gradient_format=gradient_format, gradient_space=gradient_space,
+                                      engine=engine, use_cache=use_cache, pixel_budget=pixel_budget)
         
         if 'error' in result:
             return jsonify({'error': result['error']}), 500
@@ -262,107 +835,250 @@ def analyze_colors():
             result['harmony_analysis'] = harmony_result
         
         # Store the gradient in session data
-        session_data['gradients'].append({
-            'id': len(session_data['gradients']),
+        store_session_item('gradients', {
             'gradient_image': result.get('gradient_image', ''),
+            'gradient_css': result.get('gradient_css', ''),
             'colors_count': len(result.get('colors_rgb', [])),
-            'timestamp': len(session_data['gradients']),
             'type': 'single'
         })
         
-        return jsonify(result)
+        return jsonify(artifact_response(result, data))
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה בניתוח הצבעים: {str(e)}'}), 500
 
-@app.route('/analyze-colors-combined', methods=['POST'])
-def analyze_colors_combined():
+def _analyze_batch_item(image, options):
     """
-    נקודת קצה לניתוח צבעים משולב מהתמונה המקורית והתמונה שנוצרה
+    מנתח תמונה אחת מתוך אצווה - רץ ב-thread של מאגר העובדים
+    """
+    from color_utils import analyze_color_harmony
+    
+    result = analyze_image_colors(ImageSource.from_any(image), **options)
+    if 'error' not in result:
+        harmony_result = analyze_color_harmony(result['colors_rgb'])
+        if harmony_result:
+            result['harmony_analysis'] = harmony_result
+    return result
+
+@app.route('/analyze-colors-batch', methods=['POST'])
+def analyze_colors_batch():
+    """
+    נקודת קצה לניתוח צבעים של רשימת תמונות במקביל
+    
+    מחזירה NDJSON - שורה לכל תמונה ברגע שהיא מסתיימת (לא לפי הסדר),
+    ושורת סיכום בסוף.
     """
     try:
-        data = request.get_json()
-        original_image = data.get('original_image')
-        generated_image_url = data.get('generated_image_url')
-        num_colors = data.get('num_colors', 8)
+        data = request_data('images', list_fields=('images',))
+        images = data.get('images')
+        options = {
+            'num_colors': data.get('num_colors', 6),
+            'gradient_format': data.get('gradient_format', 'png'),
+            'gradient_space': data.get('gradient_space', 'rgb'),
+            'engine': choice_param(data, 'engine', 'kmeans', PALETTE_ENGINES),
+            'use_cache': data.get('use_cache', True),
+        }
+        validate_artifact_options(data)
         
-        if not original_image or not generated_image_url:
-            return jsonify({'error': 'חסרים דימויים לניתוח'}), 400
+        if not images or not isinstance(images, list):
+            return jsonify({'error': 'לא נשלחה רשימת תמונות'}), 400
+        if len(images) > BATCH_MAX_IMAGES:
+            return jsonify({'error': f'יותר מדי תמונות באצווה (מקסימום {BATCH_MAX_IMAGES})'}), 400
         
-        # הורדת התמונה שנוצרה
-        import requests
-        import base64
-        from io import BytesIO
+        # כל פריט יכול להיות מחרוזת (base64 / data URL / URL) או {'id': ..., 'image_url': ...}
+        items = []
+        for index, item in enumerate(images):
+            if isinstance(item, dict):
+                items.append((index, item.get('id', index), item.get('image_url') or item.get('image')))
+            else:
+                items.append((index, index, item))
         
-        try:
-            response = requests.get(generated_image_url, timeout=10)
-            response.raise_for_status()
+        executor = get_batch_executor()
+        futures = {
+            executor.submit(_analyze_batch_item, image, options): (index, item_id)
+            for index, item_id, image in items if image
+        }
+        missing = [(index, item_id) for index, item_id, image in items if not image]
+        
+        def generate():
+            errors = 0
+            for index, item_id in missing:
+                errors += 1
+                yield json.dumps({'index': index, 'id': item_id, 'error': 'לא נשלחה תמונה'}, ensure_ascii=False) + '\n'
             
-            # המרה ל-base64
-            generated_image_base64 = base64.b64encode(response.content).decode('utf-8')
+            for future in as_completed(futures):
+                index, item_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'error': f'שגיאה בניתוח הצבעים: {str(e)}'}
+                
+                if 'error' in result:
+                    errors += 1
+                    line = {'index': index, 'id': item_id, 'error': result['error']}
+                else:
+                    # Store the gradient in session data
+                    store_session_item('gradients', {
+                        'gradient_image': result.get('gradient_image', ''),
+                        'gradient_css': result.get('gradient_css', ''),
+                        'colors_count': len(result.get('colors_rgb', [])),
+                        'type': 'batch'
+                    })
+                    line = {'index': index, 'id': item_id, 'result': artifact_response(result, data)}
+                yield json.dumps(line, ensure_ascii=False) + '\n'
             
-        except Exception as e:
-            return jsonify({'error': f'שגיאה בהורדת התמונה שנוצרה: {str(e)}'}), 500
+            yield json.dumps({'done': True, 'count': len(items), 'errors': errors}) + '\n'
         
-        # ניתוח צבעים מהתמונה המקורית
-        original_result = analyze_image_colors(original_image, num_colors)
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'שגיאה בניתוח האצווה: {str(e)}'}), 500
+
+def download_generated_image(generated_image_url):
+    """
+    מוריד את התמונה שנוצרה ומחזיר ImageSource (הגרסה הסינכרונית)
+    
+    אותו URL יורד פעם אחת בלבד - הקריאות הבאות מגיעות ממטמון ההורדות.
+    """
+    # הבייטים עוברים ישירות לניתוח, בלי קידוד base64 ופענוח חוזר
+    return download_image(generated_image_url)
+
+def validate_colors_combined_options(data):
+    """
+    בודק את פרמטרי הניתוח המשולב (source_weight, engine) לפני הורדת התמונה שנוצרה - source_weight נשמר ב-data כ-float
+
+    Raises:
+        ParameterError: אם source_weight לא מספר בטווח 0..1, או שהמנוע לא ב-PALETTE_ENGINES
+    """
+    data['source_weight'] = number_param(data, 'source_weight', 0.5, 0, 1, cast=float)
+    choice_param(data, 'engine', 'kmeans', PALETTE_ENGINES)
+
+def colors_combined_result(data, generated_image):
+    """
+    ניתוח הצבעים המשולב אחרי שהתמונה שנוצרה כבר הורדה
+
+    Args:
+        data (dict): גוף הבקשה
+        generated_image (ImageSource): התמונה שנוצרה
+
+    Returns:
+        tuple: (payload, status) - התמונות כ-data URL, לפני artifact_response
+    """
+    original_image = data.get('original_image')
+    num_colors = data.get('num_colors', 8)
+    gradient_format = data.get('gradient_format', 'png')  # אופציונלי - png / css
+    gradient_space = data.get('gradient_space', 'rgb')  # אופציונלי - rgb / oklab
+    engine = data.get('engine', 'kmeans')  # אופציונלי - מנוע חילוץ הפלטה
+    use_cache = data.get('use_cache', True)  # אופציונלי - False עוקף את מטמון התוצאות
+    mode = data.get('mode', 'separate')  # אופציונלי - separate (פלטה לכל תמונה) / joint (אשכול משותף)
+    
+    if mode == 'joint':
+        # פלטה משותפת באשכול אחד, עם חלק כל תמונה בכל צבע
+        source_weight = data.get('source_weight', 0.5)  # אופציונלי - חלק המקורית בדגימה (0..1)
+        result = analyze_combined_colors(original_image, generated_image, num_colors, source_weight,
+                                         gradient_format, gradient_space, engine, use_cache=use_cache)
+        if 'error' in result:
+            return {'error': result['error']}, 500
+        result = dict(result)
+        combined_colors = result['colors_rgb']
+        source_labels = [
+            f"מקורית {shares['original']:.0%} · נוצרה {shares['generated']:.0%}" for shares in result['color_shares']
+        ]
+        # צבע "שייך" לתמונה שבה יש לו חלק גדול יותר
+        original_count = sum(1 for shares in result['color_shares'] if shares['original'] >= shares['generated'])
+        generated_count = len(combined_colors) - original_count
+        gradient_payload = {key: result[key] for key in ('gradient_image', 'gradient_css') if key in result}
+    elif mode == 'separate':
+        # ניתוח צבעים מהתמונה המקורית (בלי גרדיאנט - רק הגרדיאנט המשולב מוצג)
+        original_result = analyze_image_colors(original_image, num_colors, gradient_format=None, engine=engine,
+                                               use_cache=use_cache)
         if 'error' in original_result:
-            return jsonify({'error': f'שגיאה בניתוח התמונה המקורית: {original_result["error"]}'}), 500
+            return {'error': f'שגיאה בניתוח התמונה המקורית: {original_result["error"]}'}, 500
         
         # ניתוח צבעים מהתמונה שנוצרה
-        generated_result = analyze_image_colors(generated_image_base64, num_colors)
+        generated_result = analyze_image_colors(generated_image, num_colors, gradient_format=None, engine=engine,
+                                               use_cache=use_cache)
         if 'error' in generated_result:
-            return jsonify({'error': f'שגיאה בניתוח התמונה שנוצרה: {generated_result["error"]}'}), 500
+            return {'error': f'שגיאה בניתוח התמונה שנוצרה: {generated_result["error"]}'}, 500
         
         # שילוב הצבעים משני הדימויים
         combined_colors = original_result['colors_rgb'] + generated_result['colors_rgb']
+        original_count = len(original_result['colors_rgb'])
+        generated_count = len(generated_result['colors_rgb'])
+        source_labels = ["מקורית"] * original_count + ["נוצרה"] * generated_count
         
-        # יצירת גרדיאנט משולב
-        import tempfile
-        import os
+        # יצירת גרדיאנט משולב בזיכרון
+        gradient_payload = render_gradient_payload(combined_colors, gradient_format, gradient_space)
+        result = dict(gradient_payload)
+    else:
+        return {'error': f'מצב ניתוח לא מוכר: {mode}. אפשרויות: joint, separate'}, 400
+    
+    # ניתוח הרמוניה משולב
+    from color_utils import analyze_color_harmony, colors_to_hex
+    harmony_analysis = analyze_color_harmony(combined_colors)
+    
+    # יצירת תיאורים משולבים
+    combined_hex = colors_to_hex(combined_colors)
+    combined_descriptions = []
+    for i, (rgb, hex_color, source) in enumerate(zip(combined_colors, combined_hex, source_labels)):
+        description = f"צבע {i+1} ({source}): RGB({rgb[0]}, {rgb[1]}, {rgb[2]}) - {hex_color}"
+        combined_descriptions.append(description)
+    
+    result.update({
+        'colors_rgb': combined_colors,
+        'colors_hex': combined_hex,
+        'descriptions': combined_descriptions,
+        'num_colors': len(combined_colors),
+        'harmony_analysis': harmony_analysis,
+        'original_colors_count': original_count,
+        'generated_colors_count': generated_count,
+        'mode': mode
+    })
+    
+    # Store the gradient in session data
+    store_session_item('gradients', {
+        'gradient_image': gradient_payload.get('gradient_image', ''),
+        'gradient_css': gradient_payload.get('gradient_css', ''),
+        'colors_count': len(combined_colors)
+    })
+    
+    return result, 200
+
+def colors_combined_response(data, generated_image):
+    """
+    colors_combined_result עם התוצרים לפי artifacts / artifact_format / artifact_preset בבקשה
+    """
+    payload, status = colors_combined_result(data, generated_image)
+    return (artifact_response(payload, data) if status == 200 else payload), status
+
+@app.route('/analyze-colors-combined', methods=['POST'])
+def analyze_colors_combined():
+    """
+    נקודת קצה לניתוח צבעים משולב מהתמונה המקורית והתמונה שנוצרה
+    """
+    try:
+        data = request_data('original_image')
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            gradient_path = os.path.join(temp_dir, 'combined_gradient.png')
-            from color_utils import create_color_gradient
-            create_color_gradient(combined_colors, gradient_path)
-            
-            # קריאת הקובץ כ-base64
-            with open(gradient_path, 'rb') as f:
-                gradient_base64 = base64.b64encode(f.read()).decode('utf-8')
-        
-        # ניתוח הרמוניה משולב
-        from color_utils import analyze_color_harmony, colors_to_hex
-        harmony_analysis = analyze_color_harmony(combined_colors)
-        
-        # יצירת תיאורים משולבים
-        combined_hex = colors_to_hex(combined_colors)
-        combined_descriptions = []
-        for i, (rgb, hex_color) in enumerate(zip(combined_colors, combined_hex)):
-            source = "מקורית" if i < len(original_result['colors_rgb']) else "נוצרה"
-            description = f"צבע {i+1} ({source}): RGB({rgb[0]}, {rgb[1]}, {rgb[2]}) - {hex_color}"
-            combined_descriptions.append(description)
-        
-        result = {
-            'colors_rgb': combined_colors,
-            'colors_hex': combined_hex,
-            'descriptions': combined_descriptions,
-            'num_colors': len(combined_colors),
-            'gradient_image': f"data:image/png;base64,{gradient_base64}",
-            'harmony_analysis': harmony_analysis,
-            'original_colors_count': len(original_result['colors_rgb']),
-            'generated_colors_count': len(generated_result['colors_rgb'])
-        }
+        if not data.get('original_image') or not data.get('generated_image_url'):
+            return jsonify({'error': 'חסרים דימויים לניתוח'}), 400
+        validate_artifact_options(data)
+        validate_colors_combined_options(data)
         
-        # Store the gradient in session data
-        session_data['gradients'].append({
-            'id': len(session_data['gradients']),
-            'gradient_image': f"data:image/png;base64,{gradient_base64}",
-            'colors_count': len(combined_colors),
-            'timestamp': len(session_data['gradients'])
-        })
+        # הורדת התמונה שנוצרה
+        try:
+            generated_image = download_generated_image(data.get('generated_image_url'))
+        except Exception as e:
+            return jsonify({'error': f'שגיאה בהורדת התמונה שנוצרה: {str(e)}'}), 500
         
-        return jsonify(result)
+        payload, status = colors_combined_response(data, generated_image)
+        return jsonify(payload), status
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה בניתוח הצבעים המשולב: {str(e)}'}), 500
 
@@ -372,83 +1088,106 @@ def analyze_edges():
     נקודת קצה לניתוח קווי מתאר מתמונה אחת
     """
     try:
-        data = request.get_json()
+        data = request_data('image_url')
         image_url = data.get('image_url')
+        operator = data.get('operator', 'central')  # אופציונלי - central / sobel / scharr / canny
+        use_cache = data.get('use_cache', True)  # אופציונלי - False עוקף את מטמון התוצאות
+        tiled = data.get('tiled')  # אופציונלי - עיבוד ברצועות (ברירת מחדל: אוטומטי לפי גודל התמונה)
         
         if not image_url:
             return jsonify({'error': 'לא נשלחה תמונה'}), 400
+        if operator not in EDGE_OPERATORS:
+            return jsonify({'error': f"אופרטור לא מוכר: {operator}. אפשרויות: {', '.join(EDGE_OPERATORS)}"}), 400
+        validate_artifact_options(data)
         
         # ניתוח קווי המתאר
-        result = analyze_image_edges(image_url)
+        result = analyze_image_edges(image_url, operator, use_cache=use_cache, tiled=tiled)
         
         if 'error' in result:
             return jsonify({'error': result['error']}), 500
         
         # Store the edge image in session data
-        session_data['edge_images'].append({
-            'id': len(session_data['edge_images']),
+        store_session_item('edge_images', {
             'edge_image': result.get('edge_image', ''),
-            'timestamp': len(session_data['edge_images']),
             'type': 'single'
         })
         
-        return jsonify(result)
+        return jsonify(artifact_response(result, data))
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה בניתוח קווי המתאר: {str(e)}'}), 500
 
+def edges_combined_result(data, generated_image):
+    """
+    ניתוח קווי המתאר המשולבים אחרי שהתמונה שנוצרה כבר הורדה
+
+    Args:
+        data (dict): גוף הבקשה
+        generated_image (ImageSource): התמונה שנוצרה
+
+    Returns:
+        tuple: (payload, status) - התמונות כ-data URL, לפני artifact_response
+    """
+    blend_ratio = data.get('blend_ratio', 0.5)
+    save_image = data.get('save_image', False)
+    output_dir = data.get('output_dir', 'edge_results')
+    use_cache = data.get('use_cache', True)  # אופציונלי - False עוקף את מטמון התוצאות
+    tiled = data.get('tiled')  # אופציונלי - עיבוד ברצועות (ברירת מחדל: אוטומטי לפי גודל התמונות)
+    
+    # ניתוח קווי המתאר המשולבים
+    result = analyze_combined_edges(
+        data.get('original_image'), 
+        generated_image, 
+        blend_ratio, 
+        save_image, 
+        output_dir,
+        use_cache=use_cache,
+        tiled=tiled
+    )
+    
+    if 'error' in result:
+        return {'error': result['error']}, 500
+    
+    # Store the edge image in session data
+    store_session_item('edge_images', {
+        'edge_image': result.get('edge_image', ''),
+        'blend_ratio': blend_ratio
+    })
+    
+    return result, 200
+
+def edges_combined_response(data, generated_image):
+    """
+    edges_combined_result עם התוצרים לפי artifacts / artifact_format / artifact_preset בבקשה
+    """
+    payload, status = edges_combined_result(data, generated_image)
+    return (artifact_response(payload, data) if status == 200 else payload), status
+
 @app.route('/analyze-edges-combined', methods=['POST'])
 def analyze_edges_combined():
     """
     נקודת קצה לניתוח קווי מתאר משולבים מהתמונה המקורית והתמונה שנוצרה
     """
     try:
-        data = request.get_json()
-        original_image = data.get('original_image')
-        generated_image_url = data.get('generated_image_url')
-        blend_ratio = data.get('blend_ratio', 0.5)
-        save_image = data.get('save_image', False)
-        output_dir = data.get('output_dir', 'edge_results')
+        data = request_data('original_image')
         
-        if not original_image or not generated_image_url:
+        if not data.get('original_image') or not data.get('generated_image_url'):
             return jsonify({'error': 'חסרים דימויים לניתוח'}), 400
+        validate_artifact_options(data)
         
         # הורדת התמונה שנוצרה
-        import requests
-        import base64
-        
         try:
-            response = requests.get(generated_image_url, timeout=10)
-            response.raise_for_status()
-            
-            # המרה ל-base64
-            generated_image_base64 = base64.b64encode(response.content).decode('utf-8')
-            
+            generated_image = download_generated_image(data.get('generated_image_url'))
         except Exception as e:
             return jsonify({'error': f'שגיאה בהורדת התמונה שנוצרה: {str(e)}'}), 500
         
-        # ניתוח קווי המתאר המשולבים
-        result = analyze_combined_edges(
-            original_image, 
-            generated_image_base64, 
-            blend_ratio, 
-            save_image, 
-            output_dir
-        )
-        
-        if 'error' in result:
-            return jsonify({'error': result['error']}), 500
-        
-        # Store the edge image in session data
-        session_data['edge_images'].append({
-            'id': len(session_data['edge_images']),
-            'edge_image': result.get('edge_image', ''),
-            'blend_ratio': blend_ratio,
-            'timestamp': len(session_data['edge_images'])
-        })
-        
-        return jsonify(result)
+        payload, status = edges_combined_response(data, generated_image)
+        return jsonify(payload), status
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה בניתוח קווי המתאר: {str(e)}'}), 500
 
@@ -460,30 +1199,169 @@ def create_combined_gradient():
     try:
         data = request.get_json()
         colors = data.get('colors')
+        gradient_format = choice_param(data, 'gradient_format', 'png', GRADIENT_FORMATS)  # אופציונלי - png / css
+        gradient_space = choice_param(data, 'gradient_space', 'rgb', GRADIENT_SPACES)  # אופציונלי - rgb / oklab
+        width = number_param(data, 'width', 1200, 1, MAX_GRADIENT_SIZE)  # אופציונלי - 1..4096
+        height = number_param(data, 'height', 300, 1, MAX_GRADIENT_SIZE)  # אופציונלי - 1..4096
         
         if not colors:
             return jsonify({'error': 'לא נשלחו צבעים'}), 400
+        validate_artifact_options(data)
         
-        # יצירת גרדיאנט משולב
-        import tempfile
-        import os
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            gradient_path = os.path.join(temp_dir, 'combined_gradient.png')
-            from color_utils import create_color_gradient
-            create_color_gradient(colors, gradient_path)
-            
-            # קריאת הקובץ כ-base64
-            with open(gradient_path, 'rb') as f:
-                gradient_base64 = base64.b64encode(f.read()).decode('utf-8')
+        # יצירת גרדיאנט משולב בזיכרון
+        result = render_gradient_payload(colors, gradient_format, gradient_space, width, height)
+        result['num_colors'] = len(colors)
         
-        return jsonify({
-            'gradient_image': f"data:image/png;base64,{gradient_base64}",
-            'num_colors': len(colors)
-        })
+        return jsonify(artifact_response(result, data))
         
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'שגיאה ביצירת הגרדיאנט המשולב: {str(e)}'}), 500
 
+# שלבים שתלויים בשלב אחר - אם הוא נכשל הם מדולגים
+PIPELINE_DEPENDENTS = {
+    'poem': ('generate', 'colors_combined', 'edges_combined'),
+    'generate': ('colors_combined', 'edges_combined'),
+    'download': ('colors_combined', 'edges_combined'),
+}
+
+def _pipeline_stage(func, *args):
+    """
+    מריץ שלב אחד של ה-pipeline ב-thread
+
+    Returns:
+        tuple: (payload, זמן במילישניות)
+    """
+    start = time.perf_counter()
+    try:
+        payload, _ = func(*args)
+    except Exception as e:
+        payload = {'error': f'שגיאה: {str(e)}'}
+    return payload, int((time.perf_counter() - start) * 1000)
+
+@app.route('/pipeline', methods=['POST'])
+def pipeline():
+    """
+    נקודת קצה שמריצה את כל השרשרת בשרת: ניתוח פואטי -> יצירת תמונה -> צבעים -> קווי מתאר
+    
+    שלבים בלתי תלויים רצים במקביל (צבעים וקווי מתאר של המקור בזמן שהשיר נכתב).
+    מחזירה NDJSON - שורה לכל שלב ברגע שהוא מסתיים, ושורת סיכום בסוף.
+    """
+    try:
+        data = request_data('image')
+        image_data = data.get('image')
+        is_additional = data.get('is_additional', False)
+        fresh = data.get('fresh', False)  # אופציונלי - True עוקף את מטמון התשובות
+        options = {
+            'num_colors': data.get('num_colors', 6),
+            'gradient_format': data.get('gradient_format', 'png'),  # אופציונלי - png / css
+            'gradient_space': data.get('gradient_space', 'rgb'),  # אופציונלי - rgb / oklab
+            'engine': choice_param(data, 'engine', 'kmeans', PALETTE_ENGINES),  # אופציונלי - מנוע חילוץ הפלטה
+            'blend_ratio': data.get('blend_ratio', 0.5),
+            'use_cache': data.get('use_cache', True),  # אופציונלי - False עוקף את מטמון התוצאות
+            'tiled': data.get('tiled'),  # אופציונלי - קווי מתאר ברצועות (ברירת מחדל: לפי גודל התמונה)
+            'artifacts': data.get('artifacts', 'inline'),  # אופציונלי - inline / url
+            'artifact_format': data.get('artifact_format', 'png'),  # אופציונלי - png / webp
+            'artifact_preset': data.get('artifact_preset', 'default'),  # אופציונלי - preview / default / archive
+        }
+        operator = data.get('operator', 'central')  # אופציונלי - אופרטור קווי המתאר
+        
+        if not image_data:
+            return jsonify({'error': 'לא נשלחה תמונה'}), 400
+        if operator not in EDGE_OPERATORS:
+            return jsonify({'error': f"אופרטור לא מוכר: {operator}. אפשרויות: {', '.join(EDGE_OPERATORS)}"}), 400
+        # לפני שהתגובה הזורמת מתחילה - אחרי ה-200 אפשר רק לדווח שגיאה בשורה
+        validate_artifact_options(options)
+        
+        # Remove data URL prefix if present
+        if isinstance(image_data, str) and image_data.startswith('data:image'):
+            image_data = image_data.split(',')[1]
+        
+        # התמונה מפוענחת פעם אחת ומשותפת לכל השלבים
+        source = ImageSource.from_any(image_data)
+        
+    except ParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'שגיאה: {str(e)}'}), 500
+    
+    def colors_original():
+        # בלי גרדיאנט - אותו מפתח מטמון שהניתוח המשולב ישתמש בו
+        return analyze_image_colors(source, options['num_colors'], gradient_format=None, engine=options['engine'],
+                                    use_cache=options['use_cache']), 200
+    
+    def edges_original():
+        return analyze_image_edges(source, operator, use_cache=options['use_cache'], tiled=options['tiled']), 200
+    
+    def download(generated_image_url):
+        return {'image': download_generated_image(generated_image_url)}, 200
+    
+    def generate():
+        start = time.perf_counter()
+        executor = get_pipeline_executor()
+        pending = {}
+        
+        session_id = client_session_id()
+        
+        def submit(stage, func, *args):
+            # השלבים רצים ב-threads אחרים - התוכן נשמר בסשן של הלקוח שהתחיל את ה-pipeline
+            pending[executor.submit(run_in_session, session_id, _pipeline_stage, func, *args)] = stage
+        
+        submit('poem', run_poetic_analysis, image_data, is_additional, fresh)
+        submit('colors_original', colors_original)
+        submit('edges_original', edges_original)
+        
+        stages = 0
+        errors = 0
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = pending.pop(future)
+                payload, elapsed_ms = future.result()
+                
+                if 'error' in payload:
+                    stages += 1
+                    errors += 1
+                    yield json.dumps({'stage': stage, 'error': payload['error'], 'elapsed_ms': elapsed_ms},
+                                     ensure_ascii=False) + '\n'
+                    for dependent in PIPELINE_DEPENDENTS.get(stage, ()):
+                        stages += 1
+                        errors += 1
+                        yield json.dumps({'stage': dependent, 'error': f'דולג - השלב {stage} נכשל'},
+                                         ensure_ascii=False) + '\n'
+                    continue
+                
+                # השלבים הבאים מתחילים ברגע שהתלות שלהם מוכנה
+                if stage == 'poem':
+                    submit('generate', run_image_generation, payload['result'], is_additional, fresh)
+                elif stage == 'generate':
+                    submit('download', download, payload['generated_image_url'])
+                elif stage == 'download':
+                    # separate - פלטת המקורית היא אותו ניתוח של colors_original (מהמטמון)
+                    combined = dict(options, original_image=source, mode='separate')
+                    # התוצאות הגולמיות - artifact_response מוחל פעם אחת, בשליחה
+                    submit('colors_combined', colors_combined_result, combined, payload['image'])
+                    submit('edges_combined', edges_combined_result, combined, payload['image'])
+                    # ההורדה היא שלב פנימי - לא נשלחת ללקוח
+                    continue
+                
+                stages += 1
+                try:
+                    result = artifact_response(payload, options)
+                except Exception as e:
+                    # קידוד שנכשל הוא שגיאה של השלב - לא של כל התגובה
+                    errors += 1
+                    yield json.dumps({'stage': stage, 'error': f'שגיאה בקידוד התוצרים: {str(e)}',
+                                      'elapsed_ms': elapsed_ms}, ensure_ascii=False) + '\n'
+                    continue
+                yield json.dumps({'stage': stage, 'result': result, 'elapsed_ms': elapsed_ms},
+                                 ensure_ascii=False) + '\n'
+        
+        yield json.dumps({'done': True, 'stages': stages, 'errors': errors,
+                          'elapsed_ms': int((time.perf_counter() - start) * 1000)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+מקודד תוצרים משותף - כל תמונה שהשרת מחזיר (גרדיאנט, דוח, קווי מתאר) מקודדת כאן, ישר לזיכרון
+
+- פורמטים: PNG (רמת דחיסה לפי preset) ו-WebP ללא אובדן
+- מצבי פיקסל: 'RGB' לתמונות צבע, 'L' למפות קווי מתאר (ערוץ אחד), '1' למפות בינאריות
+  (Canny) - PNG של ביט לפיקסל, ארוז
+- presets: 'preview' (קידוד מהיר), 'default', 'archive' (הקובץ הקטן ביותר, קידוד איטי)
+
+המפיקים מקודדים ב-PNG וב-preset ברירת המחדל (זה מה שנשמר במטמון התוצאות);
+פורמט או preset אחרים מהבקשה מוחלים בשכבת התגובה עם transcode / encode_data_urls.
+"""
+
+import base64
+from io import BytesIO
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+try:
+    from PIL import Image
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+
+from metrics import stage, count_bytes_out
+
+ARTIFACT_FORMATS = ('png', 'webp')
+DEFAULT_ARTIFACT_FORMAT = 'png'
+DEFAULT_ARTIFACT_PRESET = 'default'
+
+# פרמטרי השמירה של Pillow לכל preset ופורמט.
+# ב-WebP ללא אובדן quality הוא מאמץ הדחיסה (לא איכות), ו-method הוא עומק החיפוש.
+# method 6 עם quality 100 הוא חיפוש ממצה - פי 10 יותר איטי מ-5 בלי חיסכון שנמדד
+ARTIFACT_PRESETS = {
+    'preview': {
+        'png': {'compress_level': 1},
+        'webp': {'lossless': True, 'quality': 0, 'method': 0},
+    },
+    'default': {
+        'png': {'compress_level': 6},
+        'webp': {'lossless': True, 'quality': 80, 'method': 4},
+    },
+    'archive': {
+        'png': {'compress_level': 9, 'optimize': True},
+        'webp': {'lossless': True, 'quality': 100, 'method': 5},
+    },
+}
+
+MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp'}
+
+
+def validate_encoding(image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    בודק פורמט ו-preset (למשל מפרמטרי בקשה)
+
+    Raises:
+        ValueError: אם אחד מהם לא מוכר
+    """
+    if image_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"פורמט לא נתמך: {image_format}. אפשרויות: {', '.join(ARTIFACT_FORMATS)}")
+    if preset not in ARTIFACT_PRESETS:
+        raise ValueError(f"preset לא מוכר: {preset}. אפשרויות: {', '.join(ARTIFACT_PRESETS)}")
+
+
+def png_compress_level(preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    רמת zlib של ה-preset - למקודד ה-PNG הזורם (tiled_edges)
+    """
+    return ARTIFACT_PRESETS[preset]['png']['compress_level']
+
+
+def _to_image(image, mode):
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.ascontiguousarray(image))
+    if mode is None or image.mode == mode:
+        return image
+    if mode == '1':
+        # סף ב-128 בלי dithering - מפה בינארית נשארת בדיוק כמו שהיא
+        return image.convert('L').point(lambda value: 255 if value >= 128 else 0, mode='1')
+    return image.convert(mode)
+
+
+def encode_image(image, image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET, mode=None):
+    """
+    מקודד תמונה לבייטים בזיכרון
+
+    Args:
+        image (np.ndarray / PIL.Image.Image): הפיקסלים - (H, W, 3) או (H, W) uint8
+        image_format (str): 'png' או 'webp'
+        preset (str): 'preview', 'default' או 'archive'
+        mode (str): מצב הפלט - 'RGB', 'L' או '1' (None - לפי הקלט)
+
+    Returns:
+        bytes: הקובץ המקודד
+    """
+    if Image is None:
+        raise RuntimeError('PIL library not available for artifact encoding')
+    validate_encoding(image_format, preset)
+    with stage('encode'):
+        image = _to_image(image, mode)
+        if image_format == 'webp' and image.mode not in ('RGB', 'RGBA', 'L'):
+            # ל-WebP אין ביט לפיקסל - הדחיסה ללא אובדן מטפלת היטב במפה בינארית גם ב-'L'
+            image = image.convert('L')
+        buffer = BytesIO()
+        image.save(buffer, format=image_format.upper(), **ARTIFACT_PRESETS[preset][image_format])
+    count_bytes_out(buffer.tell(), 'artifact')
+    return buffer.getvalue()
+
+
+def encode_edge_map(edges, image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET, binary=False):
+    """
+    מקודד מפת קווי מתאר בערוץ אחד - 'L', או ביט לפיקסל כשהמפה בינארית (Canny)
+
+    Args:
+        edges (np.ndarray): מפת קווי מתאר (H, W) uint8
+        binary (bool): המפה מכילה רק 0 ו-255
+
+    Returns:
+        bytes: הקובץ המקודד
+    """
+    return encode_image(edges, image_format, preset, '1' if binary else 'L')
+
+
+def to_data_url(data, image_format=DEFAULT_ARTIFACT_FORMAT):
+    """
+    Returns:
+        str: data URL של הקובץ (לתגובות inline)
+    """
+    return f"data:{MIME_TYPES[image_format]};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def transcode(data, image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    מקודד מחדש קובץ תמונה לפורמט / preset אחרים, בלי לשנות את מצב הפיקסלים
+
+    PNG ב-preset ברירת המחדל מוחזר כמו שהוא - כך המפיקים שומרים אותו.
+
+    Args:
+        data (bytes): קובץ התמונה (PNG)
+        image_format (str): 'png' או 'webp'
+        preset (str): 'preview', 'default' או 'archive'
+
+    Returns:
+        bytes: הקובץ בפורמט המבוקש
+    """
+    validate_encoding(image_format, preset)
+    if (image_format, preset) == (DEFAULT_ARTIFACT_FORMAT, DEFAULT_ARTIFACT_PRESET) or Image is None:
+        return data
+    with Image.open(BytesIO(data)) as img:
+        img.load()
+        return encode_image(img, image_format, preset)
+
+
+def is_image_data_url(value):
+    return isinstance(value, str) and value.startswith('data:image/') and ';base64,' in value[:64]
+
+
+def encode_data_urls(value, image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    מקודד מחדש כל data URL של תמונה בתוצאה (גם בתוך מילונים ורשימות)
+
+    Args:
+        value: תוצאת ניתוח (dict / list / ערך)
+        image_format (str): 'png' או 'webp'
+        preset (str): 'preview', 'default' או 'archive'
+
+    Returns:
+        העתק של התוצאה עם התמונות בפורמט המבוקש
+    """
+    if (image_format, preset) == (DEFAULT_ARTIFACT_FORMAT, DEFAULT_ARTIFACT_PRESET):
+        return value
+    if isinstance(value, list):
+        return [encode_data_urls(item, image_format, preset) for item in value]
+    if isinstance(value, dict):
+        return {key: encode_data_urls(item, image_format, preset) for key, item in value.items()}
+    if is_image_data_url(value):
+        return to_data_url(transcode(base64.b64decode(value.split(',', 1)[1]), image_format, preset), image_format)
+    return value
@@ -0,0 +1,471 @@
+"""
+מצב הגשה אסינכרוני (ASGI) לנקודות הקצה שממתינות לשירותים חיצוניים
+
+/analyze ו-/generate-image מבלות כמעט את כל הזמן בהמתנה ל-OpenAI, והנקודות
+המשולבות מחכות להורדת התמונה שנוצרה. תחת gunicorn עם workers סינכרוניים כל
+המתנה כזו תופסת worker שלם. כאן הן רצות כ-coroutines על event loop אחד
+(AsyncOpenAI ו-httpx.AsyncClient), והעבודה החישובית (ניתוח צבעים וקווי מתאר)
+עוברת ל-thread עם asyncio.to_thread כדי לא לחסום את ה-loop.
+
+כל שאר הנתיבים (דף הבית, ניתוחי צבעים, batch וכו') מועברים כמו שהם לאפליקציית
+ה-Flask דרך WsgiToAsgi - ההתנהגות שלהם לא משתנה. גם העלאות בינאריות (multipart / image/*)
+לנתיבים האסינכרוניים עוברות ל-Flask, שקורא אותן מה-stream.
+
+הרצה:
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+"""
+
+import json
+import time
+import asyncio
+from http.cookies import SimpleCookie
+
+from asgiref.wsgi import WsgiToAsgi
+
+# Import with error handling
+try:
+    import httpx
+except ImportError as e:
+    print(f"Warning: httpx import failed: {e}")
+    httpx = None
+
+import app as flask_module
+import image_downloader
+from lazy_imports import optional_import
+from metrics import upstream, observe_upstream
+from session_store import SESSION_COOKIE, session_store, resolve_session_id, bind_session, unbind_session
+
+MAX_BODY_BYTES = flask_module.app.config['MAX_CONTENT_LENGTH']
+DOWNLOAD_TIMEOUT = 10
+
+_openai_client = None
+_http_client = None
+# הורדות שרצות כרגע: url -> Task (כמו in-flight dedup של image_downloader)
+_inflight_downloads = {}
+
+
+def get_async_client():
+    """
+    לקוח AsyncOpenAI משותף - נוצר בשימוש הראשון, רק אם יש מפתח API וספריית openai מותקנת
+    """
+    global _openai_client
+    if _openai_client is None and flask_module.get_client() is not None:
+        _openai_client = optional_import('openai').AsyncOpenAI(api_key=flask_module.api_key)
+    return _openai_client
+
+
+def get_http_client():
+    """
+    לקוח httpx משותף להורדות (keep-alive בין בקשות)
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT, follow_redirects=True)
+    return _http_client
+
+
+async def close_clients():
+    global _openai_client, _http_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _fetch_image(url):
+    # קריאה בחלקים עם אותה תקרה כמו הצד הסינכרוני - גוף גדול מדי לא נקרא עד הסוף
+    chunks = []
+    size = 0
+    async with get_http_client().stream('GET', url) as response:
+        response.raise_for_status()
+        image_downloader.check_download_size(int(response.headers.get('content-length') or 0))
+        async for chunk in response.aiter_bytes(image_downloader.DOWNLOAD_CHUNK):
+            size += len(chunk)
+            image_downloader.check_download_size(size)
+            chunks.append(chunk)
+    # שמירה במטמון המשותף (כולל כתיבה לדיסק מעל הסף) - מחוץ ל-loop
+    return await asyncio.to_thread(image_downloader.store_download, url, chunks)
+
+
+async def download_generated_image(generated_image_url):
+    """
+    מוריד את התמונה שנוצרה בלי לחסום את ה-event loop
+
+    משתמש באותו מטמון הורדות כמו הצד הסינכרוני; בקשות מקבילות לאותו URL ממתינות להורדה אחת.
+
+    Returns:
+        ImageSource: התמונה שהורדה
+    """
+    source = image_downloader.cached_source(generated_image_url)
+    if source is not None:
+        return source
+
+    task = _inflight_downloads.get(generated_image_url)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_image(generated_image_url))
+        _inflight_downloads[generated_image_url] = task
+        task.add_done_callback(lambda _: _inflight_downloads.pop(generated_image_url, None))
+    # shield - ביטול בקשה אחת לא מבטל את ההורדה לבקשות האחרות שממתינות לה
+    return await asyncio.shield(task)
+
+
+async def analyze_image(data):
+    """
+    הגרסה האסינכרונית של /analyze - אותן הודעות ואותם פרמטרים כמו ב-app.py
+
+    Returns:
+        tuple: (payload, status)
+    """
+    try:
+        image_data = data.get('image')
+        is_additional = data.get('is_additional', False)
+        fresh = data.get('fresh', False)
+
+        if not image_data:
+            return {'error': 'לא נשלחה תמונה'}, 400
+
+        # Remove data URL prefix if present
+        if image_data.startswith('data:image'):
+            image_data = image_data.split(',')[1]
+
+        # שמירה בסשן (blob store / דיסק) ו-hash של עד 50MB - מחוץ ל-loop
+        await asyncio.to_thread(flask_module.store_uploaded_image, image_data, is_additional)
+
+        cache_key = await asyncio.to_thread(flask_module.analysis_cache_key, image_data)
+        cached = flask_module.upstream_lookup(cache_key, fresh)
+        if cached is not None:
+            flask_module.store_analysis_text(cached)
+            return {'result': cached, 'cached': True}, 200
+
+        client = get_async_client()
+        if client is None:
+            return {'error': flask_module.CLIENT_NOT_INITIALIZED}, 500
+
+        with upstream('chat'):
+            response = await client.chat.completions.create(
+                messages=flask_module.build_analysis_messages(image_data),
+                **flask_module.ANALYSIS_PARAMS
+            )
+
+        result = flask_module.analysis_text(response)
+        if response.choices[0].message.content is not None:
+            flask_module.upstream_store(cache_key, result)
+        flask_module.store_analysis_text(result)
+
+        return {'result': result}, 200
+
+    except Exception as e:
+        return {'error': f'שגיאה: {str(e)}'}, 500
+
+
+async def generate_image(data):
+    """
+    הגרסה האסינכרונית של /generate-image
+
+    Returns:
+        tuple: (payload, status)
+    """
+    prompt = data.get('prompt')
+    is_additional = data.get('is_additional', False)
+    fresh = data.get('fresh', False)
+
+    if not prompt:
+        return {'error': 'לא נשלח טקסט להנחיית יצירת התמונה'}, 400
+
+    cache_key = flask_module.generation_cache_key(prompt)
+    cached = flask_module.upstream_lookup(cache_key, fresh)
+    if cached is not None:
+        return flask_module.cached_generation_response(cached, prompt, is_additional), 200
+
+    try:
+        client = get_async_client()
+        if client is None:
+            return {'error': flask_module.CLIENT_NOT_INITIALIZED}, 500
+
+        with upstream('image'):
+            image_result = await client.images.generate(prompt=prompt, **flask_module.IMAGE_GENERATION_PARAMS)
+        payload, status = flask_module.generated_image_response(image_result, prompt, is_additional)
+        if status == 200:
+            flask_module.upstream_store(cache_key, payload['generated_image_url'])
+        return payload, status
+
+    except Exception as e:
+        return {'error': f'שגיאה ביצירת התמונה: {str(e)}'}, 500
+
+
+async def analyze_image_stream(data):
+    """
+    הגרסה האסינכרונית של /analyze-stream
+
+    Returns:
+        tuple (payload, status) לשגיאה לפני תחילת ה-stream, או async generator של אירועי SSE
+    """
+    try:
+        image_data = data.get('image')
+        is_additional = data.get('is_additional', False)
+        fresh = data.get('fresh', False)
+
+        if not image_data:
+            return {'error': 'לא נשלחה תמונה'}, 400
+
+        # Remove data URL prefix if present
+        if image_data.startswith('data:image'):
+            image_data = image_data.split(',')[1]
+
+        # שמירה בסשן (blob store / דיסק) ו-hash של עד 50MB - מחוץ ל-loop
+        await asyncio.to_thread(flask_module.store_uploaded_image, image_data, is_additional)
+
+        cache_key = await asyncio.to_thread(flask_module.analysis_cache_key, image_data)
+        cached = flask_module.upstream_lookup(cache_key, fresh)
+        client = get_async_client()
+        if cached is None and client is None:
+            return {'error': flask_module.CLIENT_NOT_INITIALIZED}, 500
+
+    except Exception as e:
+        return {'error': f'שגיאה: {str(e)}'}, 500
+
+    async def events():
+        # תשובה מהמטמון - קטע אחד ומיד done
+        if cached is not None:
+            flask_module.store_analysis_text(cached)
+            yield flask_module.sse_event('token', {'text': cached})
+            yield flask_module.sse_event('done', {'result': cached, 'cached': True})
+            return
+
+        parts = []
+        stream = None
+        start, failed = time.perf_counter(), False
+        try:
+            stream = await client.chat.completions.create(
+                messages=flask_module.build_analysis_messages(image_data),
+                stream=True,
+                **flask_module.ANALYSIS_PARAMS
+            )
+            async for chunk in stream:
+                text = flask_module.stream_chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield flask_module.sse_event('token', {'text': text})
+        except Exception as e:
+            failed = True
+            yield flask_module.sse_event('error', {'error': f'שגיאה: {str(e)}'})
+            return
+        finally:
+            # הלקוח התנתק או שהיצירה הסתיימה - סוגרים את החיבור ל-OpenAI
+            if stream is not None:
+                await stream.close()
+            observe_upstream('chat_stream', time.perf_counter() - start, error=failed)
+
+        yield flask_module.sse_event('done', {'result': flask_module.finish_streamed_analysis(parts, cache_key)})
+
+    return events()
+
+
+def _combined(handler, error_message, validate_options=None):
+    """
+    בונה handler לנקודה משולבת: הורדה אסינכרונית, ואז הניתוח עצמו ב-thread
+
+    validate_options (אם יש) בודק את פרמטרי הנקודה לפני ההורדה, כמו בנקודת ה-Flask.
+    """
+    async def run(data):
+        try:
+            if not data.get('original_image') or not data.get('generated_image_url'):
+                return {'error': 'חסרים דימויים לניתוח'}, 400
+            flask_module.validate_artifact_options(data)
+            if validate_options is not None:
+                validate_options(data)
+
+            # הורדת התמונה שנוצרה
+            try:
+                generated_image = await download_generated_image(data.get('generated_image_url'))
+            except Exception as e:
+                return {'error': f'שגיאה בהורדת התמונה שנוצרה: {str(e)}'}, 500
+
+            return await asyncio.to_thread(handler, data, generated_image)
+
+        except flask_module.ParameterError as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            return {'error': f'{error_message}: {str(e)}'}, 500
+    return run
+
+
+ASYNC_ROUTES = {
+    '/analyze': analyze_image,
+    '/analyze-stream': analyze_image_stream,
+    '/generate-image': generate_image,
+    '/analyze-colors-combined': _combined(flask_module.colors_combined_response, 'שגיאה בניתוח הצבעים המשולב',
+                                          flask_module.validate_colors_combined_options),
+    '/analyze-edges-combined': _combined(flask_module.edges_combined_response, 'שגיאה בניתוח קווי המתאר'),
+}
+
+
+async def _read_body(receive):
+    """
+    קורא את גוף הבקשה עד MAX_BODY_BYTES
+
+    Returns:
+        bytes או None אם הגוף חורג מהמגבלה
+    """
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body = message.get('body', b'')
+        size += len(body)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(body)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def _session_from_scope(scope):
+    """
+    מזהה הסשן מהעוגייה של הבקשה (כמו load_client_session בצד ה-Flask)
+
+    Returns:
+        tuple: (מזהה, כותרות להוספה לתגובה)
+    """
+    cookie = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            try:
+                cookie.load(value.decode('latin-1'))
+            except Exception:
+                pass
+    morsel = cookie.get(SESSION_COOKIE)
+    session_id, created = resolve_session_id(morsel.value if morsel else None)
+    if not created:
+        return session_id, []
+    set_cookie = SimpleCookie()
+    set_cookie[SESSION_COOKIE] = session_id
+    set_cookie[SESSION_COOKIE]['path'] = '/'
+    set_cookie[SESSION_COOKIE]['httponly'] = True
+    set_cookie[SESSION_COOKIE]['samesite'] = 'Lax'
+    if session_store.ttl:
+        set_cookie[SESSION_COOKIE]['max-age'] = int(session_store.ttl)
+    return session_id, [(b'set-cookie', set_cookie[SESSION_COOKIE].OutputString().encode('latin-1'))]
+
+
+async def _send_json(send, payload, status, extra_headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            # כמו CORS(app) בצד ה-Flask
+            (b'access-control-allow-origin', b'*'),
+        ] + list(extra_headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_sse(events, receive, send, extra_headers=()):
+    """
+    שולח אירועי SSE כל אחד ברגע שנוצר; אם הלקוח מתנתק - מבטל את היצירה
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'access-control-allow-origin', b'*'),
+        ] + [(k.lower().encode(), v.encode()) for k, v in flask_module.SSE_HEADERS.items()] + list(extra_headers),
+    })
+
+    async def pump():
+        async for event in events:
+            await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(_wait_disconnect(receive))
+    await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (pump_task, disconnect_task):
+        if not task.done():
+            task.cancel()
+    await asyncio.gather(pump_task, disconnect_task, return_exceptions=True)
+
+
+async def _handle_json(handler, scope, receive, send):
+    session_id, cookie_headers = _session_from_scope(scope)
+    # התוכן שנשמר בזמן הבקשה (גם ב-asyncio.to_thread) שייך לסשן של הלקוח
+    token = bind_session(session_id)
+    try:
+        await _handle_session_json(handler, receive, send, cookie_headers)
+    finally:
+        unbind_session(token)
+
+
+async def _handle_session_json(handler, receive, send, cookie_headers):
+    body = await _read_body(receive)
+    if body is None:
+        await _send_json(send, {'error': 'הבקשה גדולה מדי'}, 413, cookie_headers)
+        return
+    try:
+        data = json.loads(body or b'null')
+    except ValueError as e:
+        await _send_json(send, {'error': f'שגיאה: {str(e)}'}, 400, cookie_headers)
+        return
+    if not isinstance(data, dict):
+        await _send_json(send, {'error': 'גוף הבקשה חייב להיות אובייקט JSON'}, 400, cookie_headers)
+        return
+    result = await handler(data)
+    if isinstance(result, tuple):
+        await _send_json(send, *result, cookie_headers)
+    else:
+        await _send_sse(result, receive, send, cookie_headers)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+_wsgi_app = WsgiToAsgi(flask_module.app)
+
+
+def _is_json_request(scope):
+    """
+    רק גוף JSON מטופל כאן - העלאות multipart ו-image/* עוברות ל-Flask (request_data)
+    """
+    for name, value in scope.get('headers', []):
+        if name == b'content-type':
+            return value.split(b';', 1)[0].strip().lower() == b'application/json'
+    return True
+
+
+async def app(scope, receive, send):
+    """
+    אפליקציית ה-ASGI: נתיבי ה-I/O רצים כאן, כל השאר עובר ל-Flask
+    """
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get(scope.get('path'))
+    if scope['type'] == 'http' and scope['method'] == 'POST' and handler is not None and httpx is not None \
+            and _is_json_request(scope):
+        await _handle_json(handler, scope, receive, send)
+        return
+
+    await _wsgi_app(scope, receive, send)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+גודל וזמן קידוד של התוצרים: המסלול הישן (RGB דרך קובץ זמני) מול artifact_encoder
+בכל פורמט ו-preset
+
+שימוש:
+    python benchmarks/bench_artifacts.py [--size 1600] [--repeat 3]
+"""
+
+import os
+import argparse
+import tempfile
+
+from fixtures import synthetic_image, time_call
+import cv2
+
+from artifact_encoder import encode_image, encode_edge_map, ARTIFACT_FORMATS, ARTIFACT_PRESETS
+from edge_engine import compute_edge_map
+from gradient_renderer import render_gradient
+from report_renderer import render_view
+
+
+def legacy_edge_png(edges):
+    # כמו create_combined_edge_image לפני המקודד: 3 ערוצים, cv2.imwrite לקובץ זמני וקריאה חזרה
+    edges_rgb = cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB)
+    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
+        temp_path = tmp_file.name
+    cv2.imwrite(temp_path, edges_rgb)
+    with open(temp_path, 'rb') as f:
+        data = f.read()
+    os.unlink(temp_path)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='גודל וזמן קידוד של התוצרים')
+    parser.add_argument('--size', type=int, default=1600, help='רוחב התמונה (יחס 4:3)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    gray = cv2.cvtColor(synthetic_image((args.size, args.size * 3 // 4)), cv2.COLOR_RGB2GRAY)
+    colors = [[230, 57, 70], [241, 250, 238], [168, 218, 220], [69, 123, 157], [29, 53, 87]]
+    canny = cv2.Canny(gray, 100, 200)
+    artifacts = {
+        'canny edges': (canny, lambda image, image_format, preset: encode_edge_map(image, image_format, preset, True)),
+        'central edges': (compute_edge_map(gray), encode_edge_map),
+        'gradient': (render_gradient(colors, 1200, 300), encode_image),
+        'report pie': (render_view('pie', colors), encode_image),
+    }
+
+    print(f"{'artifact':<15}{'encoding':<16}{'KB':>9}{'ms':>9}")
+    seconds = time_call(lambda: legacy_edge_png(canny), args.repeat)
+    print(f"{'canny edges':<15}{'legacy rgb':<16}{len(legacy_edge_png(canny)) / 1024:>9.1f}{seconds * 1000:>9.1f}")
+    for name, (image, encode) in artifacts.items():
+        for image_format in ARTIFACT_FORMATS:
+            for preset in ARTIFACT_PRESETS:
+                data = encode(image, image_format, preset)
+                seconds = time_call(lambda: encode(image, image_format, preset), args.repeat)
+                print(f"{name:<15}{f'{image_format}/{preset}':<16}{len(data) / 1024:>9.1f}{seconds * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+תפוקה של נקודות הקצה שממתינות ל-OpenAI: workers סינכרוניים מול מצב ASGI
+
+שרת OpenAI מדומה (מקומי) עונה ל-/v1/models, /v1/chat/completions ו-/v1/images/generations
+אחרי השהיה קבועה, כך שנמדדת רק ההמתנה ל-upstream ולא הרשת.
+
+- sync: W threads, כל אחד מחקה worker סינכרוני של gunicorn (test_client של Flask)
+- asgi: כל הבקשות במקביל על event loop אחד (httpx.ASGITransport מול asgi_app)
+
+שימוש:
+    python benchmarks/bench_async_serving.py [--requests 64] [--latency 0.25] [--workers 4]
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import fixtures  # noqa: F401 - מוסיף את שורש הפרויקט ל-sys.path
+
+UPSTREAM_LATENCY = 0.25
+# stream=True: מספר הקטעים וההשהיה בין קטע לקטע
+STREAM_TOKENS = 60
+TOKEN_INTERVAL = 0.02
+
+RESPONSES = {
+    '/v1/models': lambda: {'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model', 'created': 0,
+                                                         'owned_by': 'stub'}]},
+    '/v1/chat/completions': lambda: {
+        'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o-mini',
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': 'תיאור פואטי מדומה'}}],
+    },
+    '/v1/images/generations': lambda: {'created': 0, 'data': [{'url': 'https://example.com/generated.png'}]},
+}
+
+
+class StubUpstream(BaseHTTPRequestHandler):
+    """שרת OpenAI מדומה - משהה ומחזיר תשובה קבועה"""
+
+    def _reply(self):
+        length = int(self.headers.get('content-length') or 0)
+        request = json.loads(self.rfile.read(length)) if length else {}
+        if self.path != '/v1/models':
+            time.sleep(UPSTREAM_LATENCY)
+        if request.get('stream'):
+            self._stream()
+            return
+        if self.path == '/v1/chat/completions':
+            # תשובה מלאה מגיעה רק אחרי שכל הקטעים נוצרו
+            time.sleep(STREAM_TOKENS * TOKEN_INTERVAL)
+        body = json.dumps(RESPONSES[self.path]()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.end_headers()
+        for i in range(STREAM_TOKENS):
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'gpt-4o-mini',
+                     'choices': [{'index': 0, 'delta': {'content': f'מילה{i} '}, 'finish_reason': None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(TOKEN_INTERVAL)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # ברירת המחדל (5) מפילה חיבורים כשכל הבקשות מגיעות יחד
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def start_upstream():
+    server = StubServer(('127.0.0.1', 0), StubUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def request_bodies(count):
+    bodies = []
+    for i in range(count):
+        if i % 2 == 0:
+            bodies.append(('/analyze', {'image': 'aGVsbG8='}))
+        else:
+            bodies.append(('/generate-image', {'prompt': f'prompt {i}'}))
+    return bodies
+
+
+def run_sync(flask_app, bodies, workers):
+    """W workers סינכרוניים - כל worker מטפל בבקשה אחת בכל רגע"""
+    local = threading.local()
+
+    def call(item):
+        if not hasattr(local, 'client'):
+            local.client = flask_app.test_client()
+        path, body = item
+        return local.client.post(path, json=body).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = list(pool.map(call, bodies))
+    return time.perf_counter() - start, statuses
+
+
+async def run_async(asgi, bodies):
+    """כל הבקשות במקביל על event loop אחד"""
+    import httpx
+    transport = httpx.ASGITransport(app=asgi)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path, json=body) for path, body in bodies))
+        elapsed = time.perf_counter() - start
+    return elapsed, [r.status_code for r in responses]
+
+
+def main():
+    global UPSTREAM_LATENCY
+    parser = argparse.ArgumentParser(description='תפוקת sync מול ASGI לנקודות הקצה של OpenAI')
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=UPSTREAM_LATENCY)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    UPSTREAM_LATENCY = args.latency
+
+    server = start_upstream()
+    os.environ['OPENAI_API_KEY'] = 'sk-bench-stub-key'
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/v1'
+    # כל בקשה צריכה להגיע ל-upstream (בלי מטמון התשובות)
+    os.environ['ANALYSIS_CACHE_DISABLED'] = '1'
+
+    import app as flask_module
+    import asgi_app
+
+    bodies = request_bodies(args.requests)
+    print(f"{args.requests} בקשות, השהיית upstream {args.latency:.2f}s, {args.workers} workers סינכרוניים\n")
+
+    sync_time, sync_statuses = run_sync(flask_module.app, bodies, args.workers)
+    async_time, async_statuses = asyncio.run(run_async(asgi_app.app, bodies))
+    assert set(sync_statuses) == {200} and set(async_statuses) == {200}, (sync_statuses, async_statuses)
+
+    print(f"{'mode':<8}{'seconds':>10}{'req/s':>10}")
+    print(f"{'sync':<8}{sync_time:>10.2f}{args.requests / sync_time:>10.1f}")
+    print(f"{'asgi':<8}{async_time:>10.2f}{args.requests / async_time:>10.1f}")
+    print(f"\nשיפור: x{sync_time / async_time:.1f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ניתוח צבעים משולב: פלטה לכל תמונה (separate) מול אשכול משותף אחד (joint)
+
+התמונה המקורית היא JPEG של טלפון והתמונה שנוצרה PNG של 1024x1024 - כמו בזרימה של
+ה-frontend. נמדד colors_combined_response עצמו (בלי ההורדה), בלי מטמון.
+
+שימוש:
+    python benchmarks/bench_combined.py [--colors 8] [--repeat 5]
+"""
+
+import os
+import argparse
+from io import BytesIO
+
+from fixtures import synthetic_image, time_call
+from PIL import Image
+
+os.environ['ANALYSIS_POOL_WORKERS'] = '0'
+
+from image_source import ImageSource  # noqa: E402
+
+
+def encode(size, seed, image_format):
+    buffer = BytesIO()
+    Image.fromarray(synthetic_image(size, seed=seed)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='separate מול joint בניתוח הצבעים המשולב')
+    parser.add_argument('--colors', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import app as flask_module
+
+    original = encode((4032, 3024), 0, 'JPEG')
+    generated = encode((1024, 1024), 3, 'PNG')
+
+    def run(mode):
+        data = {'original_image': ImageSource(original), 'num_colors': args.colors, 'use_cache': False,
+                'mode': mode}
+        with flask_module.app.test_request_context():
+            payload, status = flask_module.colors_combined_response(data, ImageSource(generated))
+        assert status == 200, payload
+        return payload
+
+    # חימום - ייבוא scikit-learn
+    run('joint')
+
+    print(f"מקורית JPEG 4032x3024, שנוצרה PNG 1024x1024, {args.colors} צבעים\n")
+    print(f"{'mode':<10}{'seconds':>9}{'colors':>8}")
+    results = {}
+    for mode in ('separate', 'joint'):
+        results[mode] = time_call(lambda: run(mode), args.repeat)
+        print(f"{mode:<10}{results[mode]:>9.3f}{run(mode)['num_colors']:>8}")
+
+    print(f"\njoint מול separate: x{results['separate'] / results['joint']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת מהירות מנוע קווי המתאר הווקטורי מול הלולאה הישנה
+
+שימוש:
+    python benchmarks/bench_edges.py [--sizes 128 256 512 1024] [--reference-max 512]
+"""
+
+import argparse
+
+from fixtures import synthetic_image, time_call
+from PIL import Image
+import numpy as np
+
+from edge_engine import compute_edge_map, reference_edge_map, EDGE_OPERATORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='מדידת מנוע קווי המתאר')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[128, 256, 512, 1024])
+    parser.add_argument('--reference-max', type=int, default=512,
+                        help='הגודל המקסימלי שעליו מריצים את הלולאה הישנה (איטית מאוד)')
+    args = parser.parse_args()
+
+    print(f"{'size':>6} | {'loop (s)':>9} | " + ' | '.join(f'{op:>9}' for op in EDGE_OPERATORS) + ' | speedup')
+    for size in args.sizes:
+        gray = np.array(Image.fromarray(synthetic_image(size)).convert('L'))
+
+        timings = {op: time_call(lambda op=op: compute_edge_map(gray, op)) for op in EDGE_OPERATORS}
+
+        if size <= args.reference_max:
+            loop_time = time_call(lambda: reference_edge_map(gray), repeat=1)
+            assert np.array_equal(reference_edge_map(gray), compute_edge_map(gray)), 'הפלט אינו זהה!'
+            loop_str = f'{loop_time:9.3f}'
+            speedup = f"{loop_time / timings['central']:7.0f}x"
+        else:
+            loop_str = f"{'-':>9}"
+            speedup = '-'
+
+        print(f'{size:>6} | {loop_str} | ' + ' | '.join(f'{timings[op]:9.4f}' for op in EDGE_OPERATORS) + f' | {speedup}')
+
+
+if __name__ == '__main__':
+    main()
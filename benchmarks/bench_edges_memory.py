@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שיא הזיכרון של ניתוח קווי מתאר: תמונה שלמה מול עיבוד ברצועות (tiled_edges)
+
+כל מדידה רצה בתהליך חדש, ונמדד הפרש ה-RSS המקסימלי (VmHWM) מרגע שהקובץ כבר
+בזיכרון ועד סוף הניתוח - כולל הפענוח, שאינו נראה ל-tracemalloc (ההקצאות של Pillow).
+(ru_maxrss לא מתאים כאן - הוא עובר בירושה מהתהליך שהריץ את ה-fork.)
+
+שימוש:
+    python benchmarks/bench_edges_memory.py [--sizes 2000 4000 6000] [--budget 64] [--operator central]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from io import BytesIO
+
+from fixtures import synthetic_image
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = 'BENCH_RESULT '
+
+CHILD = r'''
+def peak_rss():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+
+import json
+import time
+import color_utils
+from image_source import ImageSource
+
+# חימום - ייבוא OpenCV לפני המדידה
+color_utils.analyze_combined_edges(ImageSource({small!r}), ImageSource({small!r}), use_cache=False, tiled=False)
+
+with open({path!r}, 'rb') as f:
+    data = f.read()
+with open({path2!r}, 'rb') as f:
+    data2 = f.read()
+before = peak_rss()
+start = time.perf_counter()
+if {combined!r}:
+    result = color_utils.analyze_combined_edges(ImageSource(data), ImageSource(data2), use_cache=False,
+                                                tiled={tiled!r})
+else:
+    result = color_utils.analyze_image_edges(ImageSource(data), {operator!r}, use_cache=False, tiled={tiled!r})
+elapsed = time.perf_counter() - start
+assert 'error' not in result, result
+after = peak_rss()
+print({marker!r} + json.dumps({{'peak_mb': (after - before) / 1024, 'seconds': elapsed}}))
+'''
+
+
+def encode(size, seed, image_format):
+    buffer = BytesIO()
+    Image.fromarray(synthetic_image(size, seed=seed)).save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+
+def run_child(path, path2, small, combined, tiled, operator, budget):
+    code = CHILD.format(path=path, path2=path2, small=small, combined=combined, tiled=tiled, operator=operator,
+                        marker=MARKER)
+    env = dict(os.environ, EDGE_MEMORY_BUDGET_MB=str(budget), ANALYSIS_POOL_WORKERS='0')
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(MARKER)]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"המדידה נכשלה:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+    return json.loads(lines[-1][len(MARKER):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='שיא זיכרון: תמונה שלמה מול רצועות')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 6000], help='רוחב תמונת JPEG (יחס 4:3)')
+    parser.add_argument('--budget', type=int, default=64, help='EDGE_MEMORY_BUDGET_MB')
+    parser.add_argument('--operator', default='central')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        small = os.path.join(tmp, 'small.png')
+        with open(small, 'wb') as f:
+            f.write(encode(64, 0, 'PNG'))
+
+        print(f"{'input':<16}{'analysis':<10}{'mode':<7}{'peak MB':>9}{'seconds':>9}")
+        for width in args.sizes:
+            size = (width, width * 3 // 4)
+            paths = []
+            for seed in (0, 1):
+                paths.append(os.path.join(tmp, f'{width}_{seed}.jpg'))
+                with open(paths[-1], 'wb') as f:
+                    f.write(encode(size, seed, 'JPEG'))
+            for combined in (False, True):
+                for tiled in (False, True):
+                    result = run_child(paths[0], paths[1], small, combined, tiled, args.operator, args.budget)
+                    print(f"{f'{size[0]}x{size[1]}':<16}{'combined' if combined else 'single':<10}"
+                          f"{'tiled' if tiled else 'full':<7}{result['peak_mb']:>9.1f}{result['seconds']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+זמן עלייה קר של worker: ייבוא app.py (או asgi_app.py) בתהליך Python חדש
+
+כל ריצה היא תהליך נפרד - כמו worker חדש של gunicorn אחרי אתחול. נמדדים:
+- import: זמן הייבוא של המודול
+- first_request: הבקשה הראשונה לניתוח צבעים (כאן נטענות הספריות הכבדות בעצלות)
+- total: זמן התהליך כולו, כולל עליית המפרש
+
+המפתח של OpenAI מדומה וה-BASE_URL מפנה לכתובת שלא עונה, כך שכל פנייה לרשת
+בזמן הייבוא הייתה מופיעה כהמתנה ארוכה (או כישלון) - העלייה חייבת לעבוד גם offline.
+
+שימוש:
+    python benchmarks/bench_import_time.py [--runs 5] [--module app] [--budget 1.0] [--top 10]
+
+עם --budget הסקריפט נכשל (exit 1) אם חציון זמן הייבוא עובר את התקציב בשניות.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+import fixtures  # noqa: F401 - מוסיף את שורש הפרויקט ל-sys.path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = 'BENCH_RESULT '
+
+CHILD = r'''
+import io
+import json
+import time
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter() - start
+
+first_request = None
+if {module!r} == 'app':
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 30, 30)).save(buffer, format='PNG')
+    request_start = time.perf_counter()
+    response = target.app.test_client().post('/analyze-colors', data=buffer.getvalue(), content_type='image/png',
+                                              query_string={{'use_cache': 'false', 'gradient_format': 'css'}})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    first_request = time.perf_counter() - request_start
+
+print({marker!r} + json.dumps({{'import': imported, 'first_request': first_request}}))
+'''
+
+
+def child_env():
+    env = dict(os.environ)
+    env['OPENAI_API_KEY'] = 'sk-bench-offline-key'
+    # כתובת שלא מנותבת - פנייה לרשת בזמן הייבוא הייתה נתקעת כאן
+    env['OPENAI_BASE_URL'] = 'http://10.255.255.1:9/v1'
+    env['ANALYSIS_POOL_WORKERS'] = '0'
+    env.pop('OPENAI_HEALTH_CHECK', None)
+    env.pop('ANALYSIS_PRELOAD', None)
+    return env
+
+
+def run_once(module, timeout):
+    """
+    Returns:
+        dict: import / first_request / total בשניות
+    """
+    code = CHILD.format(module=module, marker=MARKER)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=child_env(), capture_output=True,
+                               text=True, timeout=timeout)
+    total = time.perf_counter() - start
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(MARKER)]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"הייבוא נכשל:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+    result = json.loads(lines[-1][len(MARKER):])
+    result['total'] = total
+    return result
+
+
+def top_imports(module, count):
+    """
+    המודולים היקרים ביותר בייבוא (לפי -X importtime, זמן מצטבר של מודולים ברמה העליונה)
+
+    Returns:
+        list: (שם, מילישניות)
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                               env=child_env(), capture_output=True, text=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # רק מודולים שיובאו ישירות מהמודול הנבדק (הזחה של רמה אחת)
+        if name.startswith('   ') and not name.startswith('    ') and cumulative.strip().isdigit():
+            entries.append((name.strip(), int(cumulative) / 1000))
+    return sorted(entries, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='זמן עלייה קר של worker')
+    parser.add_argument('--module', default='app', choices=('app', 'asgi_app'))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='תקציב לחציון זמן הייבוא בשניות')
+    parser.add_argument('--top', type=int, default=10, help='מספר המודולים היקרים להצגה')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    runs = [run_once(args.module, args.timeout) for _ in range(args.runs)]
+
+    print(f"import {args.module}: {args.runs} תהליכים חדשים (offline)\n")
+    print(f"{'metric':<15}{'median':>9}{'max':>9}")
+    for metric in ('import', 'first_request', 'total'):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        if values:
+            print(f"{metric:<15}{statistics.median(values):>9.3f}{max(values):>9.3f}")
+
+    if args.top:
+        print(f"\nהמודולים היקרים בייבוא (ms, מצטבר):")
+        for name, ms in top_imports(args.module, args.top):
+            print(f"  {name:<24}{ms:>9.1f}")
+
+    median_import = statistics.median(run['import'] for run in runs)
+    if args.budget is not None and median_import > args.budget:
+        print(f"\n❌ חציון הייבוא {median_import:.3f}s חורג מהתקציב {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
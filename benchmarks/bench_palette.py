@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+השוואת זמן ואיכות בין מנועי חילוץ הפלטה
+
+האיכות נמדדת כמרחק RGB ממוצע של כל פיקסל לצבע הקרוב ביותר בפלטה
+(נמוך = טוב), ומוצגת גם ביחס ל-KMeans המלא.
+
+שימוש:
+    python benchmarks/bench_palette.py [--colors 6] [--seeds 0 1 2]
+"""
+
+import argparse
+
+from fixtures import synthetic_image, time_call
+from PIL import Image
+import numpy as np
+
+from palette_engines import extract_palette, palette_error, PALETTE_ENGINES
+
+
+def sample_pixels(seed):
+    """מכין 22,500 פיקסלים כמו extract_dominant_colors (150x150)"""
+    img = Image.fromarray(synthetic_image(512, seed=seed)).resize((150, 150))
+    return np.array(img).reshape(-1, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='השוואת מנועי פלטה')
+    parser.add_argument('--colors', type=int, default=6)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    args = parser.parse_args()
+
+    samples = [sample_pixels(seed) for seed in args.seeds]
+    results = {}
+    for engine in PALETTE_ENGINES:
+        latencies, errors = [], []
+        for pixels in samples:
+            latencies.append(time_call(lambda: extract_palette(pixels, args.colors, engine)))
+            errors.append(palette_error(pixels, extract_palette(pixels, args.colors, engine)))
+        results[engine] = (np.mean(latencies), np.mean(errors))
+
+    base_latency, base_error = results['kmeans']
+    print(f"{'engine':>11} | {'latency ms':>10} | {'speedup':>7} | {'error':>6} | {'vs kmeans':>9}")
+    for engine, (latency, error) in results.items():
+        print(f'{engine:>11} | {latency * 1000:10.1f} | {base_latency / latency:6.1f}x | '
+              f'{error:6.2f} | {100 * (error / base_error - 1):+8.1f}%')
+
+
+if __name__ == '__main__':
+    main()
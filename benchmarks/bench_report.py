@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+דוח צבעים מלא (5 תצוגות): matplotlib מול ה-backend הרסטרי (NumPy/Pillow)
+
+matplotlib רץ תמיד בסדרה (pyplot אינו thread-safe), הרסטרי בסדרה ובמקביל.
+הקבצים נכתבים לתיקייה זמנית, כך שנמדד גם קידוד ה-PNG והכתיבה לדיסק.
+
+שימוש:
+    python benchmarks/bench_report.py [--colors 8] [--scale 1.0] [--repeat 3]
+"""
+
+import argparse
+import tempfile
+
+from fixtures import time_call
+import numpy as np
+
+from color_utils import generate_color_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='matplotlib מול רינדור רסטרי לדוח הצבעים')
+    parser.add_argument('--colors', type=int, default=8)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    colors = np.random.RandomState(0).randint(0, 256, (args.colors, 3)).tolist()
+    runs = (
+        ('matplotlib', 'matplotlib', False),
+        ('raster', 'raster', False),
+        ('raster-parallel', 'raster', True),
+    )
+
+    with tempfile.TemporaryDirectory() as save_dir:
+        # חימום - ייבוא matplotlib וטעינת הגופנים לא נכנסים למדידה
+        for _, backend, parallel in runs:
+            generate_color_report(colors, save_dir, backend=backend, scale=args.scale, parallel=parallel)
+
+        print(f"\n{args.colors} צבעים, scale={args.scale}\n")
+        print(f"{'backend':<17}{'seconds':>9}")
+        results = {}
+        for name, backend, parallel in runs:
+            results[name] = time_call(lambda: generate_color_report(colors, save_dir, backend=backend,
+                                                                    scale=args.scale, parallel=parallel),
+                                      args.repeat)
+            print(f"{name:<17}{results[name]:>9.3f}")
+
+    print(f"\nraster מול matplotlib: x{results['matplotlib'] / results['raster-parallel']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
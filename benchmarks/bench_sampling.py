@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+עקומת דיוק מול תקציב לדגימת הפיקסלים, ועלות תמונת טלפון מול תמונה ממוזערת
+
+הדיוק נמדד כמרחק RGB ממוצע של פיקסלי הערכה (ברזולוציה מלאה) לפלטה שחולצה,
+ביחס לפלטת ייחוס מ-KMeans על 200,000 פיקסלים.
+
+שימוש:
+    python benchmarks/bench_sampling.py [--colors 6] [--budgets 1000 2500 5000 10000 22500 50000]
+"""
+
+import argparse
+from io import BytesIO
+
+from fixtures import synthetic_image, time_call
+from PIL import Image
+import numpy as np
+
+from image_source import ImageSource
+from palette_engines import extract_palette, palette_error
+from pixel_sampling import sample_pixels
+
+
+def jpeg_bytes(size, seed=0):
+    buffer = BytesIO()
+    Image.fromarray(synthetic_image(size, seed=seed)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def legacy_pixels(data):
+    """הדרך הקודמת: פענוח מלא ומעיכה ל-150x150"""
+    img = Image.open(BytesIO(data)).convert('RGB').resize((150, 150))
+    return np.array(img).reshape(-1, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='דיוק מול תקציב דגימה')
+    parser.add_argument('--colors', type=int, default=6)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[1000, 2500, 5000, 10000, 22500, 50000])
+    args = parser.parse_args()
+
+    photo = jpeg_bytes((4032, 3024))
+    full = np.asarray(Image.open(BytesIO(photo)).convert('RGB')).reshape(-1, 3)
+    rng = np.random.RandomState(1)
+    evaluation = full[rng.choice(len(full), 20000, replace=False)]
+    reference = extract_palette(full[rng.choice(len(full), 200000, replace=False)], args.colors)
+    reference_error = palette_error(evaluation, reference)
+
+    print(f'photo 4032x3024 JPEG, reference error {reference_error:.2f}')
+    print(f"{'method':>14} | {'sample ms':>9} | {'total ms':>8} | {'error':>6} | {'vs ref':>7}")
+
+    def report(name, sampler):
+        sample_time = time_call(lambda: sampler(ImageSource(photo)))
+        total_time = time_call(lambda: extract_palette(sampler(ImageSource(photo)), args.colors))
+        error = palette_error(evaluation, extract_palette(sampler(ImageSource(photo)), args.colors))
+        print(f'{name:>14} | {sample_time * 1000:9.1f} | {total_time * 1000:8.1f} | '
+              f'{error:6.2f} | {100 * (error / reference_error - 1):+6.1f}%')
+
+    report('legacy 150x150', lambda src: legacy_pixels(src.raw_bytes))
+    for budget in args.budgets:
+        report(f'budget {budget}', lambda src, budget=budget: sample_pixels(src, budget))
+
+    # אותו תקציב - תמונת טלפון מול תמונה ממוזערת
+    thumb = jpeg_bytes((400, 300))
+    print('\ncost at the default budget:')
+    for name, data in (('thumbnail 400x300', thumb), ('phone 4032x3024', photo)):
+        t = time_call(lambda: sample_pixels(ImageSource(data)))
+        t_legacy = time_call(lambda: legacy_pixels(data))
+        print(f'{name:>18}: budgeted {t * 1000:6.1f} ms, legacy {t_legacy * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
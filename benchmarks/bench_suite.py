@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+חבילת מדידה לנתיבים החמים של color_utils: אחוזוני זמן ושיא זיכרון, מול baseline ב-JSON
+
+כל מקרה רץ על תמונות סינתטיות בכמה גדלים ובשני סוגים:
+    synthetic  גרפיקה חלקה (גרדיאנטים וצורות), מקודדת כ-PNG
+    photo      אותה תמונה עם רעש צילום, מקודדת כ-JPEG
+כל קריאה מקבלת ImageSource חדש ו-use_cache=False, כך שהפענוח נמדד בכל פעם.
+
+שיא הזיכרון הוא עליית ה-RSS המקסימלי (VmHWM, מאופס דרך /proc/self/clear_refs) בריצה
+נפרדת - כולל הקצאות של Pillow ו-OpenCV. לפני המדידה malloc_trim מחזיר למערכת את מה
+שכבר שוחרר, אחרת הריצה "נהנית" מזיכרון של המקרה הקודם ונמדד 0. בלי /proc נמדד שיא
+tracemalloc (NumPy ופייתון בלבד).
+
+ה-baseline תלוי במכונה - שומרים אותו על הענף הראשי ומשווים אליו את הענף:
+    python benchmarks/bench_suite.py --save-baseline
+    python benchmarks/bench_suite.py --compare --max-latency-regression 0.25 --max-memory-regression 0.25
+עם --compare הסקריפט נכשל (exit 1) אם מקרה כלשהו חורג מהסף.
+
+שימוש:
+    python benchmarks/bench_suite.py [--sizes 256 1024 4096] [--kinds synthetic photo] [--cases edges harmony]
+                                     [--repeat 7] [--max-seconds 10] [--output results.json]
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import ctypes
+import argparse
+import contextlib
+import platform
+import tempfile
+import tracemalloc
+from io import BytesIO
+from datetime import datetime, timezone
+
+from fixtures import synthetic_image
+import numpy as np
+from PIL import Image
+
+from image_source import ImageSource
+from color_utils import (
+    extract_dominant_colors, create_color_gradient, analyze_image_edges,
+    create_combined_edge_image, analyze_color_harmony, generate_color_report
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# סוג התמונה -> (רעש, פורמט הקובץ)
+FIXTURE_KINDS = {
+    'synthetic': (0, 'PNG'),
+    'photo': (12, 'JPEG'),
+}
+
+# מדדים שנבדקים מול ה-baseline
+LATENCY_METRIC = 'p50_ms'
+MEMORY_METRIC = 'peak_mb'
+
+
+def encode_fixture(size, kind, seed=0):
+    noise, image_format = FIXTURE_KINDS[kind]
+    buffer = BytesIO()
+    Image.fromarray(synthetic_image(size, seed=seed, noise=noise)).save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+
+def palette(count, seed=0):
+    return np.random.RandomState(seed).randint(0, 256, (count, 3)).tolist()
+
+
+def build_cases(sizes, kinds, report_dir):
+    """
+    כל המקרים למדידה
+
+    Returns:
+        dict: שם המקרה -> פונקציה ללא ארגומנטים
+    """
+    cases = {}
+    for kind in kinds:
+        for size in sizes:
+            first, second = encode_fixture(size, kind, 0), encode_fixture(size, kind, 1)
+            label = f'{kind}-{size}'
+            cases[f'extract_dominant_colors[{label}]'] = \
+                lambda data=first: extract_dominant_colors(ImageSource(data), 8)
+            cases[f'analyze_image_edges[{label}]'] = \
+                lambda data=first: analyze_image_edges(ImageSource(data), use_cache=False)
+            cases[f'create_combined_edge_image[{label}]'] = \
+                lambda data=first, other=second: create_combined_edge_image(ImageSource(data), ImageSource(other))
+
+    # לא תלויים בתמונה - רק במספר הצבעים
+    for count in (8, 256):
+        colors = palette(count)
+        cases[f'analyze_color_harmony[{count}-colors]'] = lambda colors=colors: analyze_color_harmony(colors)
+    colors = palette(8)
+    cases['create_color_gradient[1200x300]'] = lambda: create_color_gradient(colors)
+    cases['generate_color_report[8-colors]'] = lambda: generate_color_report(colors, report_dir)
+    return cases
+
+
+def _status_kb(key):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(key))
+
+
+def _trim_heap():
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _reset_peak_rss():
+    """
+    מאפס את VmHWM לגודל ה-RSS הנוכחי (Linux 4.0+)
+
+    Returns:
+        bool: האם האיפוס נתמך
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure_peak_mb(func):
+    """
+    שיא הזיכרון של קריאה אחת, מעל הזיכרון שכבר תפוס לפניה
+
+    Returns:
+        tuple: (MB, 'rss' או 'tracemalloc')
+    """
+    gc.collect()
+    _trim_heap()
+    if _reset_peak_rss():
+        before = _status_kb('VmRSS')
+        func()
+        return (_status_kb('VmHWM') - before) / 1024, 'rss'
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024, 'tracemalloc'
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, repeat, max_seconds):
+    """
+    מריץ את המקרה: חימום, עד repeat חזרות מתוזמנות (לפחות 3, או עד שעובר max_seconds), ומדידת זיכרון
+
+    Returns:
+        dict: אחוזוני זמן (ms), ממוצע, מספר ריצות ושיא זיכרון
+    """
+    func()
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    while len(timings) < repeat and (len(timings) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    p50, p90, p99 = np.percentile(timings, (50, 90, 99))
+    peak_mb, memory_method = measure_peak_mb(func)
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(timings)), 3),
+        'runs': len(timings),
+        'peak_mb': round(peak_mb, 2),
+        'memory_method': memory_method,
+    }
+
+
+def environment():
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, max_latency_regression, max_memory_regression, memory_slack_mb):
+    """
+    משווה תוצאות ל-baseline
+
+    זמן נחשב רגרסיה כשה-p50 גדל ביותר מ-max_latency_regression (יחס, 0.25 = 25%).
+    זיכרון נחשב רגרסיה כשהשיא גדל ביותר מ-max_memory_regression וגם ביותר מ-memory_slack_mb,
+    כדי שרעש של מגה-בייט בודד במקרים קטנים לא יכשיל את הריצה.
+
+    Returns:
+        list: (שם המקרה, המדד, ערך ב-baseline, ערך נוכחי) לכל רגרסיה
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current[LATENCY_METRIC] > previous[LATENCY_METRIC] * (1 + max_latency_regression):
+            regressions.append((name, LATENCY_METRIC, previous[LATENCY_METRIC], current[LATENCY_METRIC]))
+        growth = current[MEMORY_METRIC] - previous[MEMORY_METRIC]
+        if (current.get('memory_method') == previous.get('memory_method') and growth > memory_slack_mb
+                and current[MEMORY_METRIC] > previous[MEMORY_METRIC] * (1 + max_memory_regression)):
+            regressions.append((name, MEMORY_METRIC, previous[MEMORY_METRIC], current[MEMORY_METRIC]))
+    return regressions
+
+
+def _change(current, previous):
+    if not previous:
+        return f"{'-':>8}"
+    return f"{(current / previous - 1) * 100:>+7.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='חבילת מדידה לנתיבים החמים של color_utils')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[256, 1024, 4096], help='צלע התמונה')
+    parser.add_argument('--kinds', nargs='+', default=list(FIXTURE_KINDS), choices=list(FIXTURE_KINDS))
+    parser.add_argument('--cases', nargs='+', default=None, help='רק מקרים ששמם מכיל אחת מהמחרוזות')
+    parser.add_argument('--repeat', type=int, default=7, help='מספר החזרות המקסימלי לכל מקרה')
+    parser.add_argument('--max-seconds', type=float, default=10, help='זמן מקסימלי לחזרות של מקרה אחד')
+    parser.add_argument('--output', default=None, help='קובץ JSON לתוצאות הריצה')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='קובץ ה-baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='שמירת התוצאות כ-baseline')
+    parser.add_argument('--compare', action='store_true', help='השוואה ל-baseline וכישלון ברגרסיה')
+    parser.add_argument('--max-latency-regression', type=float, default=0.25)
+    parser.add_argument('--max-memory-regression', type=float, default=0.25)
+    parser.add_argument('--memory-slack-mb', type=float, default=2.0)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    with tempfile.TemporaryDirectory() as report_dir:
+        cases = build_cases(args.sizes, args.kinds, report_dir)
+        if args.cases:
+            cases = {name: func for name, func in cases.items() if any(part in name for part in args.cases)}
+
+        print(f"{'case':<46}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak MB':>9}{'runs':>6}"
+              + (f"{'Δp50':>9}{'Δpeak':>9}" if baseline else ''))
+        for name, func in cases.items():
+            # ההדפסות של הפונקציות (למשל "הגרף נשמר ב") לא נכנסות לטבלה
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = measure(func, args.repeat, args.max_seconds)
+            results[name] = result
+            line = (f"{name:<46}{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                    f"{result['peak_mb']:>9.1f}{result['runs']:>6}")
+            if baseline:
+                previous = baseline.get(name, {})
+                line += (f" {_change(result[LATENCY_METRIC], previous.get(LATENCY_METRIC))}"
+                         f" {_change(result[MEMORY_METRIC], previous.get(MEMORY_METRIC))}")
+            print(line, flush=True)
+
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ ה-baseline נשמר ב-{args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.max_latency_regression, args.max_memory_regression,
+                              args.memory_slack_mb)
+        if regressions:
+            print(f"\n❌ {len(regressions)} רגרסיות מול {args.baseline}:")
+            for name, metric, previous, current in regressions:
+                print(f"   {name}: {metric} {previous} -> {current}")
+            sys.exit(1)
+        print(f"\n✅ אין רגרסיות מול {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+זמן עד הטוקן הראשון: /analyze (תשובה מלאה) מול /analyze-stream (SSE)
+
+משתמש בשרת OpenAI המדומה של bench_async_serving: השהיה עד הטוקן הראשון,
+ואחריה STREAM_TOKENS קטעים במרווח TOKEN_INTERVAL.
+
+שימוש:
+    python benchmarks/bench_ttft.py [--latency 0.25] [--tokens 60] [--interval 0.02] [--repeat 5]
+"""
+
+import os
+import time
+import argparse
+import statistics
+
+import bench_async_serving as stub
+
+
+def measure(client, path, body):
+    """
+    Returns:
+        tuple: (זמן עד הבייטים הראשונים של התוכן, זמן כולל)
+    """
+    start = time.perf_counter()
+    first = None
+    with client.post(path, json=body, buffered=False) as response:
+        for chunk in response.response:
+            if chunk and first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='זמן עד הטוקן הראשון')
+    parser.add_argument('--latency', type=float, default=stub.UPSTREAM_LATENCY)
+    parser.add_argument('--tokens', type=int, default=stub.STREAM_TOKENS)
+    parser.add_argument('--interval', type=float, default=stub.TOKEN_INTERVAL)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    stub.UPSTREAM_LATENCY = args.latency
+    stub.STREAM_TOKENS = args.tokens
+    stub.TOKEN_INTERVAL = args.interval
+
+    server = stub.start_upstream()
+    os.environ['OPENAI_API_KEY'] = 'sk-bench-stub-key'
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_port}/v1'
+    # כל בקשה צריכה להגיע ל-upstream
+    os.environ['ANALYSIS_CACHE_DISABLED'] = '1'
+
+    import app as flask_module
+    client = flask_module.app.test_client()
+    body = {'image': 'aGVsbG8='}
+
+    print(f"upstream: {args.latency:.2f}s עד הטוקן הראשון, {args.tokens} קטעים כל {args.interval:.3f}s\n")
+    print(f"{'endpoint':<18}{'ttft (s)':>10}{'total (s)':>11}")
+    for path in ('/analyze', '/analyze-stream'):
+        runs = [measure(client, path, body) for _ in range(args.repeat)]
+        ttft = statistics.median(r[0] for r in runs)
+        total = statistics.median(r[1] for r in runs)
+        print(f"{path:<18}{ttft:>10.3f}{total:>11.3f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+העלאת תמונה: base64 בתוך JSON מול multipart מול גוף גולמי image/*
+
+לכל פורמט נמדדים זמן הבקשה לנקודת הקצה /analyze-colors ושיא הזיכרון של Python
+(tracemalloc) בזמן הטיפול בה. גוף הבקשה נבנה לפני המדידה, כך שנמדד רק הצד של השרת:
+קריאת הגוף, פענוחו, הבייטים של התמונה והניתוח עצמו (זהה בשלושת הפורמטים).
+
+שימוש:
+    python benchmarks/bench_upload.py [--size 3000] [--repeat 3]
+"""
+
+import os
+import io
+import json
+import time
+import argparse
+import tracemalloc
+
+from fixtures import synthetic_image, to_base64
+
+# הניתוח רץ בתהליך הזה - כדי ש-tracemalloc יראה את כל ההקצאות
+os.environ.setdefault('ANALYSIS_POOL_MIN_PIXELS', str(10 ** 12))
+os.environ['ANALYSIS_CACHE_DISABLED'] = '1'
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+OPTIONS = {'num_colors': 6, 'gradient_format': 'css', 'use_cache': False}
+
+
+def build_environ(mode, image_b64, image_bytes):
+    """
+    Returns:
+        dict: environ WSGI מוכן (הגוף כבר מקודד)
+    """
+    if mode == 'json':
+        builder = EnvironBuilder(path='/analyze-colors', method='POST',
+                                 data=json.dumps(dict(OPTIONS, image_url=image_b64)),
+                                 content_type='application/json')
+    elif mode == 'multipart':
+        form = {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in OPTIONS.items()}
+        form['image_url'] = (io.BytesIO(image_bytes), 'image.png', 'image/png')
+        builder = EnvironBuilder(path='/analyze-colors', method='POST', data=form)
+    else:
+        builder = EnvironBuilder(path='/analyze-colors', method='POST', query_string=OPTIONS,
+                                 data=image_bytes, content_type='image/png')
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    # כמו socket אמיתי: כל קריאה מקצה בייטים חדשים (BytesIO היה מחזיר את הבאפר הקיים בלי העתקה)
+    environ['wsgi.input'] = io.BufferedReader(environ['wsgi.input'])
+    return environ
+
+
+def measure(client, mode, image_b64, image_bytes, repeat):
+    """
+    Returns:
+        tuple: (זמן מינימלי בשניות, שיא זיכרון מקסימלי בבייטים)
+    """
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        environ = build_environ(mode, image_b64, image_bytes)
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.open(environ)
+        elapsed = time.perf_counter() - start
+        _, run_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert response.status_code == 200, response.get_data(as_text=True)
+        best = min(best, elapsed)
+        peak = max(peak, run_peak)
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON/base64 מול multipart מול image/*')
+    parser.add_argument('--size', type=int, default=3000, help='צלע התמונה הסינתטית בפיקסלים')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    import base64
+    import app as flask_module
+    client = flask_module.app.test_client()
+
+    image_b64 = to_base64(synthetic_image(args.size))
+    image_bytes = base64.b64decode(image_b64)
+    print(f"תמונה {args.size}x{args.size}: PNG {len(image_bytes) / 2**20:.1f}MB, "
+          f"base64 {len(image_b64) / 2**20:.1f}MB\n")
+
+    # חימום - ייבוא מודולים ואתחול מטמונים לא נכנסים למדידה
+    measure(client, 'raw', image_b64, image_bytes, 1)
+
+    print(f"{'mode':<11}{'seconds':>9}{'peak MB':>10}")
+    results = {}
+    for mode in ('json', 'multipart', 'raw'):
+        results[mode] = measure(client, mode, image_b64, image_bytes, args.repeat)
+        elapsed, peak = results[mode]
+        print(f"{mode:<11}{elapsed:>9.3f}{peak / 2**20:>10.1f}")
+
+    json_time, json_peak = results['json']
+    raw_time, raw_peak = results['raw']
+    print(f"\nimage/* מול JSON: זמן x{json_time / raw_time:.2f}, זיכרון x{json_peak / raw_peak:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+כלים משותפים לסקריפטי המדידה: תמונות סינתטיות ומדידת זמן
+"""
+
+import os
+import sys
+import time
+import base64
+from io import BytesIO
+
+# גישה למודולים של הפרויקט מתוך תיקיית benchmarks
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+
+def synthetic_image(size, seed=0, noise=12):
+    """
+    יוצר תמונה סינתטית "דמוית צילום": גרדיאנטים, צורות ורעש
+
+    Args:
+        size (int or tuple): צלע התמונה או (רוחב, גובה)
+        seed (int): זרע לרעש
+        noise (float): סטיית התקן של רעש הצילום (0 - גרפיקה חלקה)
+
+    Returns:
+        np.ndarray: מערך RGB מסוג uint8
+    """
+    width, height = (size, size) if isinstance(size, int) else size
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.empty((height, width, 3), dtype=np.float32)
+    img[..., 0] = 255 * x / max(width - 1, 1)
+    img[..., 1] = 255 * y / max(height - 1, 1)
+    img[..., 2] = 128 + 100 * np.sin(x / 37.0) * np.cos(y / 23.0)
+
+    # עיגול ומלבן עם קצוות חדים
+    mask = (x - width / 2) ** 2 + (y - height / 2) ** 2 <= (min(width, height) / 4) ** 2
+    img[mask] = (30, 30, 60)
+    img[height // 8:height // 3, width // 8:width // 3] = (220, 40, 40)
+
+    if noise:
+        img += rng.normal(0, noise, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def to_base64(img_array, format='PNG'):
+    """
+    ממיר מערך RGB למחרוזת base64 של קובץ תמונה
+
+    Args:
+        img_array (np.ndarray): מערך RGB
+        format (str): פורמט הקובץ
+
+    Returns:
+        str: נתוני base64
+    """
+    buffer = BytesIO()
+    Image.fromarray(img_array).save(buffer, format=format)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def time_call(func, repeat=3):
+    """
+    מודד את זמן הריצה הטוב ביותר של פונקציה
+
+    Args:
+        func (callable): הפונקציה למדידה (ללא ארגומנטים)
+        repeat (int): מספר חזרות
+
+    Returns:
+        float: הזמן המינימלי בשניות
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,260 @@
+"""
+מאגר blobs לפי תוכן (content-addressed) על הדיסק המקומי
+
+כל תוצר (תמונה שהועלתה, גרדיאנט, תמונת קווי מתאר) נשמר פעם אחת בקובץ ששמו
+ה-SHA-256 של הבייטים. בסשן נשמרים רק ה-hash והמטא-דאטה, והבייטים עצמם מוגשים
+ב-/blob/<hash>. הכתיבה אטומית (קובץ זמני + rename), כך שכמה workers יכולים
+לחלוק את אותה תיקייה.
+
+הגדרות (משתני סביבה):
+    BLOB_STORE_DIR        תיקיית המאגר (ברירת מחדל: poetic-blobs בתיקייה הזמנית של המערכת)
+    BLOB_STORE_MAX_BYTES  נפח מקסימלי - מעבר לו נמחקים הקבצים שלא נקראו הכי הרבה זמן (ברירת מחדל: 1GB)
+
+הפינוי יורד עד 90% מהנפח (low_water), כך שסריקת התיקייה רצה פעם לכל כמה כתיבות ולא בכל put,
+ולא מוחק blobs שהסשנים החיים עוד מפנים אליהם (referenced).
+"""
+
+import os
+import re
+import base64
+import tempfile
+import threading
+
+from analysis_cache import content_hash
+from artifact_encoder import transcode, is_image_data_url, DEFAULT_ARTIFACT_FORMAT, DEFAULT_ARTIFACT_PRESET
+
+_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# חתימות הקבצים הנפוצים - לזיהוי ה-Content-Type בלי לפתוח את התמונה
+_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+
+def sniff_content_type(head):
+    """
+    מזהה את סוג הקובץ לפי הבייטים הראשונים
+
+    Args:
+        head (bytes): לפחות 12 הבייטים הראשונים
+
+    Returns:
+        str: Content-Type
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return 'application/octet-stream'
+
+
+def is_blob_hash(value):
+    return isinstance(value, str) and bool(_HASH_PATTERN.match(value))
+
+
+def blob_url(blob_hash):
+    return f"/blob/{blob_hash}"
+
+
+class BlobStore:
+    """
+    קבצים לפי hash בתיקייה אחת (מחולקת לתתי-תיקיות לפי שני התווים הראשונים)
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, low_water=0.9, referenced=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        # מחזירה את ה-hashes שעוד בשימוש (למשל בסשנים) - הם לא נמחקים בפינוי
+        self.referenced = referenced
+        self.writes = 0
+        self.deduplicated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._bytes = None
+        # הפינוי הבא רץ רק מעל הנפח הזה (מעל max_bytes אם הפינוי הקודם נעצר ב-blobs שבשימוש)
+        self._evict_at = max_bytes
+
+    def path(self, blob_hash):
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def put(self, data):
+        """
+        שומר בייטים ומחזיר את ה-hash שלהם - תוכן שכבר קיים לא נכתב שוב
+
+        Args:
+            data (bytes): התוכן
+
+        Returns:
+            str: SHA-256 hex
+        """
+        blob_hash = content_hash(data)
+        path = self.path(blob_hash)
+        if os.path.exists(path):
+            with self._lock:
+                self.deduplicated += 1
+            return blob_hash
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.writes += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+        self._enforce_budget()
+        return blob_hash
+
+    def open(self, blob_hash):
+        """
+        Returns:
+            tuple: (נתיב הקובץ, Content-Type), או None אם ה-blob לא קיים
+        """
+        if not is_blob_hash(blob_hash):
+            return None
+        path = self.path(blob_hash)
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(12)
+            # סימון שימוש - הפינוי מוחק קודם את מה שלא נקרא הכי הרבה זמן
+            os.utime(path)
+        except OSError:
+            return None
+        return path, sniff_content_type(head)
+
+    def get(self, blob_hash):
+        """
+        Returns:
+            bytes או None
+        """
+        found = self.open(blob_hash)
+        if found is None:
+            return None
+        with open(found[0], 'rb') as f:
+            return f.read()
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if is_blob_hash(name):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat
+
+    def _over_budget(self):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(stat.st_size for _, stat in self._files())
+            return self._bytes > max(self.max_bytes, self._evict_at)
+
+    def _enforce_budget(self):
+        if not self._over_budget():
+            return
+        # מחוץ לנעילה של המאגר - referenced נועלת את מאגר הסשנים
+        pinned = set(self.referenced()) if self.referenced is not None else set()
+        target = self.max_bytes * self.low_water
+        with self._lock:
+            files = sorted(self._files(), key=lambda item: item[1].st_mtime)
+            # הסריקה מסנכרנת גם כתיבות של workers אחרים לאותה תיקייה
+            self._bytes = sum(stat.st_size for _, stat in files)
+            for path, stat in files:
+                if self._bytes <= target:
+                    break
+                if os.path.basename(path) in pinned:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._bytes -= stat.st_size
+                self.evictions += 1
+            # לא הגענו ליעד (הכל בשימוש) - לא סורקים שוב עד שייכתבו עוד max_bytes - target
+            self._evict_at = self._bytes + self.max_bytes - target if self._bytes > target else self.max_bytes
+
+    def stats(self):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(stat.st_size for _, stat in self._files())
+            return {
+                'root': self.root,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'writes': self.writes,
+                'deduplicated': self.deduplicated,
+                'evictions': self.evictions,
+            }
+
+
+def externalize_data_urls(item, store):
+    """
+    מעביר למאגר כל ערך data URL (או בייטים מהעלאה בינארית) בפריט, ומשאיר במקומו את כתובת ה-blob
+
+    לכל שדה שהועבר נוסף שדה '<שם>_hash' עם ה-hash של התוכן.
+
+    Args:
+        item (dict): פריט סשן
+        store (BlobStore): המאגר
+
+    Returns:
+        dict: פריט חדש בלי base64
+    """
+    result = {}
+    for key, value in item.items():
+        if isinstance(value, (bytes, bytearray)):
+            blob_hash = store.put(bytes(value))
+            result[key] = blob_url(blob_hash)
+            result[f'{key}_hash'] = blob_hash
+        elif isinstance(value, str) and value.startswith('data:') and ';base64,' in value[:64]:
+            blob_hash = store.put(base64.b64decode(value.split(',', 1)[1]))
+            result[key] = blob_url(blob_hash)
+            result[f'{key}_hash'] = blob_hash
+        else:
+            result[key] = value
+    return result
+
+
+
+def artifact_urls(value, store, image_format=DEFAULT_ARTIFACT_FORMAT, preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    מחליף כל data URL של תמונה בתוצאה (גם בתוך מילונים ורשימות) בכתובת ה-blob שלו
+
+    כמו externalize_data_urls, לכל מפתח שהוחלף נוסף '<שם>_hash' - ה-ETag של הקובץ.
+
+    Args:
+        value: תוצאת ניתוח (dict / list / ערך)
+        store (BlobStore): המאגר
+        image_format (str): 'png' או 'webp'
+        preset (str): preset הקידוד (ראו artifact_encoder)
+
+    Returns:
+        העתק של התוצאה עם כתובות /blob/<hash> במקום base64
+    """
+    if isinstance(value, list):
+        return [artifact_urls(item, store, image_format, preset) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        if is_image_data_url(item):
+            blob_hash = store.put(transcode(base64.b64decode(item.split(',', 1)[1]), image_format, preset))
+            result[key] = blob_url(blob_hash)
+            result[f'{key}_hash'] = blob_hash
+        else:
+            result[key] = artifact_urls(item, store, image_format, preset)
+    return result
+
+
+blob_store = BlobStore(
+    root=os.getenv('BLOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'poetic-blobs')),
+    max_bytes=int(os.getenv('BLOB_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+)
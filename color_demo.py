@@ -52,6 +52,12 @@ def demo_color_analysis(image_path):
     
     if harmony['complementary']:
         print(f"  🔄 צבעים משלימים: {len(harmony['complementary'])} זוגות")
+    if harmony['analogous']:
+        print(f"  〰️  צבעים אנלוגיים: {len(harmony['analogous'])} זוגות")
+    if harmony['triadic']:
+        print(f"  🔺 צבעים טריאדיים: {len(harmony['triadic'])} שלשות")
+    if harmony['monochromatic']:
+        print(f"  🎚️  קבוצות מונוכרומטיות: {len(harmony['monochromatic'])}")
     
     print(f"\n🌈 הגרדיאנט נוצר אוטומטית!")
     print(f"📊 התמונה נשלחת ב-base64 בשדה 'gradient_image'")
@@ -103,7 +109,10 @@ def demo_api_usage():
     print("     'gradient_image': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAA...',")
     print("     'harmony_analysis': {")
     print("       'color_temperatures': {'warm': 2, 'cool': 3, 'neutral': 1},")
-    print("       'complementary': [[0, 3], [1, 4]]")
+    print("       'complementary': [[0, 3], [1, 4]],")
+    print("       'analogous': [[1, 2]],")
+    print("       'triadic': [[0, 2, 4]],")
+    print("       'monochromatic': [[3, 5]]")
     print("     }")
     print("   }")
 
@@ -16,41 +16,35 @@ except ImportError as e:
     print(f"Warning: numpy import failed: {e}")
     np = None
 
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-GUI backend to prevent crashes
-    matplotlib.rcParams['backend'] = 'Agg'  # Force Agg backend
-    import matplotlib.pyplot as plt
-except ImportError as e:
-    print(f"Warning: matplotlib import failed: {e}")
-    matplotlib = None
-    plt = None
-
-try:
-    from sklearn.cluster import KMeans
-except ImportError as e:
-    print(f"Warning: sklearn import failed: {e}")
-    KMeans = None
-
-import base64
-from io import BytesIO
-import colorsys
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-# Import OpenCV with error handling
-try:
-    import cv2
-except ImportError as e:
-    print(f"Warning: OpenCV import failed: {e}")
-    cv2 = None
+# matplotlib ו-OpenCV נטענים רק בשימוש הראשון (MPLBACKEND כבר קובע Agg)
+from lazy_imports import optional_import
+from edge_engine import compute_edge_map, DEFAULT_EDGE_OPERATOR, BINARY_EDGE_OPERATORS
+from artifact_encoder import encode_edge_map, to_data_url
+from metrics import stage
+from tiled_edges import should_tile, decode_gray, tiled_edge_png, tiled_combined_edge_png
+from palette_engines import extract_palette, assign_pixels, DEFAULT_PALETTE_ENGINE
+from analysis_cache import analysis_cache, cache_enabled, make_key
+from image_source import ImageSource
+from pixel_sampling import sample_pixels, pooled_sample, DEFAULT_PIXEL_BUDGET
+from gradient_renderer import (
+    render_gradient_png, gradient_to_css,
+    DEFAULT_GRADIENT_WIDTH, DEFAULT_GRADIENT_HEIGHT
+)
+from report_renderer import render_view_png, REPORT_BACKENDS, DEFAULT_REPORT_BACKEND
 
-def extract_dominant_colors(image_path, num_colors=5):
+def extract_dominant_colors(image_path, num_colors=5, engine=DEFAULT_PALETTE_ENGINE,
+                            pixel_budget=DEFAULT_PIXEL_BUDGET):
     """
     מחלץ צבעים דומיננטיים מתמונה
     
     Args:
-        image_path (str): נתיב לתמונה או נתוני base64
+        image_path (str/bytes/ImageSource): נתיב לתמונה, נתוני base64, בייטי הקובץ או ImageSource
         num_colors (int): מספר הצבעים לחילוץ
+        engine (str): מנוע החילוץ - 'kmeans', 'minibatch', 'median_cut', 'octree' או 'histogram'
+        pixel_budget (int): מספר הפיקסלים המקסימלי שנדגם מהתמונה
     
     Returns:
         list: רשימת צבעים ב-RGB
@@ -60,44 +54,14 @@ def extract_dominant_colors(image_path, num_colors=5):
         return []
     if np is None:
         return []
-    if KMeans is None:
-        return []
         
     try:
-        # בדיקה אם זה נתיב קובץ או base64
-        if os.path.exists(image_path):
-            img = Image.open(image_path)
-        elif image_path.startswith('data:image'):
-            # הסרת ה-prefix של data URL
-            image_data = image_path.split(',')[1]
-            img_bytes = base64.b64decode(image_data)
-            img = Image.open(BytesIO(img_bytes))
-        else:
-            # נסה לטפל כנתוני base64 רגילים
-            img_bytes = base64.b64decode(image_path)
-            img = Image.open(BytesIO(img_bytes))
-        
-        if img is None:
-            raise ValueError("לא הצלחתי לטעון את התמונה")
-        
-        # המרה ל-RGB
-        img = img.convert('RGB')
-        
-        # שינוי גודל לתמונה קטנה יותר לביצועים טובים יותר
-        img = img.resize((150, 150))
+        # דגימה שכבתית בתקציב קבוע, מפענוח מוקטן ששומר על יחס הרוחב-גובה
+        pixels = sample_pixels(ImageSource.from_any(image_path), pixel_budget)
         
-        # המרה למערך numpy
-        img_array = np.array(img)
-        
-        # שינוי צורה למערך של פיקסלים
-        img_reshaped = img_array.reshape((-1, 3))
-        
-        # חילוץ צבעים דומיננטיים עם K-means
-        kmeans = KMeans(n_clusters=num_colors, n_init='auto', random_state=42)
-        kmeans.fit(img_reshaped)
-        
-        # קבלת הצבעים המרכזיים
-        colors = kmeans.cluster_centers_.astype(int)
+        # חילוץ צבעים דומיננטיים עם המנוע שנבחר
+        with stage('palette'):
+            colors = extract_palette(pixels, num_colors, engine)
         
         return colors.tolist()
         
@@ -121,15 +85,52 @@ def colors_to_hex(colors):
         hex_colors.append(hex_color)
     return hex_colors
 
-def plot_colors(colors, save_path=None):
+def _render_raster_view(view, colors, save_path, scale, message):
+    """
+    מרנדר תצוגה של הדוח עם ה-backend הרסטרי (NumPy/Pillow) ושומר אותה אם התבקש
+
+    Returns:
+        bytes: קובץ ה-PNG של התצוגה
+    """
+    png_bytes = render_view_png(view, colors, scale)
+    if save_path:
+        with open(save_path, 'wb') as f:
+            f.write(png_bytes)
+        print(f"{message}: {save_path}")
+    return png_bytes
+
+def _display_backend(backend, save_path):
+    """
+    ה-backend של תצוגה בודדת: בלי save_path ובלי backend מפורש הגרף מוצג בחלון, כמו תמיד
+    """
+    if backend is not None:
+        return backend
+    return DEFAULT_REPORT_BACKEND if save_path else 'matplotlib'
+
+def plot_colors(colors, save_path=None, backend=None, scale=1.0):
     """
     מציג גרף של הצבעים הדומיננטיים
     
     Args:
         colors (list): רשימת צבעים
         save_path (str): נתיב לשמירת הגרף (אופציונלי)
+        backend (str): 'raster' (NumPy/Pillow) או 'matplotlib' (איכות הדפסה). ברירת מחדל: raster כשיש
+                       save_path, ובלי save_path - matplotlib שמציג את הגרף בחלון (plt.show)
+        scale (float): פקטור הרזולוציה של backend הרסטרי
+
+    Returns:
+        bytes: קובץ PNG ב-backend הרסטרי (None ב-matplotlib או בשגיאה)
     """
+    backend = _display_backend(backend, save_path)
+    if backend == 'raster':
+        try:
+            return _render_raster_view('bars', colors, save_path, scale, "הגרף נשמר ב")
+        except Exception as e:
+            print(f"שגיאה ביצירת הגרף: {str(e)}")
+            return None
+
     # Check if matplotlib is available
+    plt = optional_import('matplotlib.pyplot', 'matplotlib')
     if plt is None or np is None:
         print("Warning: matplotlib or numpy not available for plotting")
         return
@@ -155,22 +156,64 @@ def plot_colors(colors, save_path=None):
     except Exception as e:
         print(f"שגיאה ביצירת הגרף: {str(e)}")
 
-def analyze_image_colors(image_data, num_colors=6, save_gradient=False, output_dir="color_results"):
+def render_gradient_payload(colors, gradient_format='png', space='rgb',
+                            width=DEFAULT_GRADIENT_WIDTH, height=DEFAULT_GRADIENT_HEIGHT):
+    """
+    מייצר את שדות הגרדיאנט לתגובת ה-API
+    
+    Args:
+        colors (list): רשימת צבעים ב-RGB
+        gradient_format (str): 'png' (תמונה ב-base64), 'css' (מחרוזת linear-gradient) או None (ללא גרדיאנט)
+        space (str): מרחב האינטרפולציה - 'rgb' או 'oklab'
+        width (int): רוחב הגרדיאנט בפיקסלים
+        height (int): גובה הגרדיאנט בפיקסלים
+    
+    Returns:
+        dict: {'gradient_image': data URL} או {'gradient_css': str} או {}
+    """
+    if gradient_format is None:
+        return {}
+    if gradient_format == 'css':
+        return {'gradient_css': gradient_to_css(colors, space)}
+    if gradient_format == 'png':
+        return {'gradient_image': to_data_url(render_gradient_png(colors, width, height, space))}
+    raise ValueError(f"פורמט גרדיאנט לא מוכר: {gradient_format}")
+
+def analyze_image_colors(image_data, num_colors=6, save_gradient=False, output_dir="color_results",
+                         gradient_format='png', gradient_space='rgb', engine=DEFAULT_PALETTE_ENGINE,
+                         use_cache=True, pixel_budget=DEFAULT_PIXEL_BUDGET):
     """
     פונקציה ראשית לניתוח צבעים של תמונה
     
     Args:
-        image_data (str): נתוני התמונה (base64 או נתיב)
+        image_data (str/bytes/ImageSource): נתוני התמונה (base64, נתיב, בייטים או ImageSource)
         num_colors (int): מספר צבעים לחילוץ
         save_gradient (bool): האם לשמור את הגרדיאנט כקובץ
         output_dir (str): תיקייה לשמירת הקבצים
+        gradient_format (str): 'png', 'css' או None (ללא גרדיאנט)
+        gradient_space (str): מרחב האינטרפולציה של הגרדיאנט - 'rgb' או 'oklab'
+        engine (str): מנוע חילוץ הפלטה (ראו palette_engines)
+        use_cache (bool): האם להשתמש במטמון התוצאות
+        pixel_budget (int): מספר הפיקסלים המקסימלי לדגימה
     
     Returns:
         dict: תוצאות הניתוח
     """
     try:
+        source = ImageSource.from_any(image_data)
+        
+        # בדיקה במטמון (לא כשיש שמירה לדיסק)
+        cache_key = None
+        if use_cache and cache_enabled() and not save_gradient:
+            cache_key = make_key(source.content_hash, op='colors', num_colors=num_colors, engine=engine,
+                                 gradient_format=gradient_format, gradient_space=gradient_space,
+                                 pixel_budget=pixel_budget)
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # חילוץ צבעים
-        colors = extract_dominant_colors(image_data, num_colors)
+        colors = extract_dominant_colors(source, num_colors, engine, pixel_budget)
         
         if not colors:
             return {'error': 'לא הצלחתי לחלץ צבעים מהתמונה'}
@@ -184,57 +227,130 @@ def analyze_image_colors(image_data, num_colors=6, save_gradient=False, output_d
             description = f"צבע {i+1}: RGB({rgb[0]}, {rgb[1]}, {rgb[2]}) - {hex_color}"
             color_descriptions.append(description)
         
-        # יצירת גרדיאנט
-        import tempfile
-        import os
-        from datetime import datetime
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            gradient_path = os.path.join(temp_dir, 'color_gradient.png')
-            create_color_gradient(colors, gradient_path)
-            
-            # קריאת הקובץ כ-base64
-            with open(gradient_path, 'rb') as f:
-                import base64
-                gradient_base64 = base64.b64encode(f.read()).decode('utf-8')
-            
-            # שמירה קבועה אם נדרש
-            saved_gradient_path = None
-            if save_gradient:
-                os.makedirs(output_dir, exist_ok=True)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                saved_gradient_path = os.path.join(output_dir, f'gradient_{timestamp}.png')
-                
-                # העתקת הקובץ
-                import shutil
-                shutil.copy2(gradient_path, saved_gradient_path)
-                print(f"✅ הגרדיאנט נשמר ב: {saved_gradient_path}")
-        
         result = {
             'colors_rgb': colors,
             'colors_hex': hex_colors,
             'descriptions': color_descriptions,
-            'num_colors': len(colors),
-            'gradient_image': f"data:image/png;base64,{gradient_base64}"
+            'num_colors': len(colors)
         }
         
-        if saved_gradient_path:
+        # יצירת גרדיאנט בזיכרון
+        result.update(render_gradient_payload(colors, gradient_format, gradient_space))
+        
+        # שמירה קבועה אם נדרש
+        if save_gradient:
+            from datetime import datetime
+            os.makedirs(output_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            saved_gradient_path = os.path.join(output_dir, f'gradient_{timestamp}.png')
+            create_color_gradient(colors, saved_gradient_path, space=gradient_space)
+            print(f"✅ הגרדיאנט נשמר ב: {saved_gradient_path}")
             result['saved_gradient_path'] = saved_gradient_path
         
+        if cache_key is not None:
+            analysis_cache.put(cache_key, result)
+        
         return result
         
     except Exception as e:
         return {'error': f'שגיאה בניתוח הצבעים: {str(e)}'}
 
-def create_color_palette(colors, save_path=None):
+def analyze_combined_colors(image1_data, image2_data, num_colors=8, source_weight=0.5, gradient_format='png',
+                            gradient_space='rgb', engine=DEFAULT_PALETTE_ENGINE, use_cache=True,
+                            pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """
+    פלטה משותפת לשתי תמונות באשכול אחד
+    
+    דגימה משותפת משתי התמונות (לפי source_weight) עוברת KMeans אחד, במקום אשכול נפרד
+    לכל תמונה. לכל צבע מחושב איזה חלק מהפיקסלים של כל תמונה שייך אליו, והצבעים
+    ממוינים מהמקורית לשנוצרה - כמו הסדר בפלטה המשולבת הקודמת.
+    
+    Args:
+        image1_data (str/bytes/ImageSource): התמונה המקורית
+        image2_data (str/bytes/ImageSource): התמונה שנוצרה
+        num_colors (int): מספר הצבעים בפלטה המשותפת
+        source_weight (float): החלק של התמונה המקורית בדגימה (0-1)
+        gradient_format (str): 'png', 'css' או None (ללא גרדיאנט)
+        gradient_space (str): מרחב האינטרפולציה של הגרדיאנט - 'rgb' או 'oklab'
+        engine (str): מנוע חילוץ הפלטה (ראו palette_engines)
+        use_cache (bool): האם להשתמש במטמון התוצאות
+        pixel_budget (int): מספר הפיקסלים המקסימלי בדגימה המשותפת
+    
+    Returns:
+        dict: תוצאות הניתוח, כולל color_shares - {'original', 'generated'} לכל צבע
+    """
+    try:
+        if not 0 <= source_weight <= 1:
+            return {'error': 'source_weight חייב להיות בין 0 ל-1'}
+        sources = [ImageSource.from_any(image1_data), ImageSource.from_any(image2_data)]
+        
+        cache_key = None
+        if use_cache and cache_enabled():
+            cache_key = make_key(*(source.content_hash for source in sources), op='combined_colors',
+                                 num_colors=num_colors, source_weight=source_weight, engine=engine,
+                                 gradient_format=gradient_format, gradient_space=gradient_space,
+                                 pixel_budget=pixel_budget)
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # דגימה משותפת ואשכול אחד
+        pixels, labels = pooled_sample(sources, pixel_budget, [source_weight, 1 - source_weight])
+        with stage('palette'):
+            palette = extract_palette(pixels, num_colors, engine)
+        
+        # החלק של כל תמונה בכל צבע (מתוך הפיקסלים של אותה תמונה)
+        with stage('assign'):
+            assigned = assign_pixels(pixels, palette)
+        counts = np.zeros((2, len(palette)))
+        np.add.at(counts, (labels, assigned), 1)
+        shares = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        
+        # מהצבעים של המקורית לצבעים של התמונה שנוצרה
+        order = np.argsort(shares[1] - shares[0], kind='stable')
+        colors = palette[order].tolist()
+        color_shares = [{'original': round(float(shares[0, i]), 4), 'generated': round(float(shares[1, i]), 4)}
+                        for i in order]
+        
+        hex_colors = colors_to_hex(colors)
+        result = {
+            'colors_rgb': colors,
+            'colors_hex': hex_colors,
+            'color_shares': color_shares,
+            'num_colors': len(colors)
+        }
+        
+        # גרדיאנט אחד - רק של הפלטה המשותפת
+        result.update(render_gradient_payload(colors, gradient_format, gradient_space))
+        
+        if cache_key is not None:
+            analysis_cache.put(cache_key, result)
+        
+        return result
+        
+    except Exception as e:
+        return {'error': f'שגיאה בניתוח הצבעים המשולב: {str(e)}'}
+
+def create_color_palette(colors, save_path=None, backend=None, scale=1.0):
     """
     יוצר פלטת צבעים יפה עם קודי HEX
     
     Args:
         colors (list): רשימת צבעים
         save_path (str): נתיב לשמירת הפלטה (אופציונלי)
+        backend (str): 'raster' (NumPy/Pillow) או 'matplotlib' (איכות הדפסה). ברירת מחדל: raster כשיש
+                       save_path, ובלי save_path - matplotlib שמציג את הגרף בחלון (plt.show)
+        scale (float): פקטור הרזולוציה של backend הרסטרי
+
+    Returns:
+        bytes: קובץ PNG ב-backend הרסטרי (None ב-matplotlib או בשגיאה)
     """
+    backend = _display_backend(backend, save_path)
     try:
+        if backend == 'raster':
+            return _render_raster_view('palette', colors, save_path, scale, "הפלטה נשמרה ב")
+
+        plt = optional_import('matplotlib.pyplot', 'matplotlib')
         fig, ax = plt.subplots(figsize=(12, 4))
         
         for i, color in enumerate(colors):
@@ -265,15 +381,26 @@ def create_color_palette(colors, save_path=None):
     except Exception as e:
         print(f"שגיאה ביצירת פלטת צבעים: {str(e)}")
 
-def create_color_pie_chart(colors, save_path=None):
+def create_color_pie_chart(colors, save_path=None, backend=None, scale=1.0):
     """
     יוצר גרף עוגה של הצבעים הדומיננטיים
     
     Args:
         colors (list): רשימת צבעים
         save_path (str): נתיב לשמירת הגרף (אופציונלי)
+        backend (str): 'raster' (NumPy/Pillow) או 'matplotlib' (איכות הדפסה). ברירת מחדל: raster כשיש
+                       save_path, ובלי save_path - matplotlib שמציג את הגרף בחלון (plt.show)
+        scale (float): פקטור הרזולוציה של backend הרסטרי
+
+    Returns:
+        bytes: קובץ PNG ב-backend הרסטרי (None ב-matplotlib או בשגיאה)
     """
+    backend = _display_backend(backend, save_path)
     try:
+        if backend == 'raster':
+            return _render_raster_view('pie', colors, save_path, scale, "גרף העוגה נשמר ב")
+
+        plt = optional_import('matplotlib.pyplot', 'matplotlib')
         fig, ax = plt.subplots(figsize=(10, 8))
         
         # יצירת נתונים לגרף עוגה (כל צבע שווה חלק)
@@ -281,15 +408,14 @@ def create_color_pie_chart(colors, save_path=None):
         labels = [f'#{c[0]:02x}{c[1]:02x}{c[2]:02x}' for c in colors]
         colors_normalized = [np.array(c)/255 for c in colors]
         
-        result = ax.pie(sizes, labels=labels, colors=[tuple(c) for c in colors_normalized],
-                       autopct='%1.1f%%', startangle=90)
+        # עם autopct מתקבלים שלושה רכיבים - tuple בגרסאות ישנות, PieContainer בחדשות
+        _, _, autotexts = ax.pie(sizes, labels=labels, colors=[tuple(c) for c in colors_normalized],
+                                 autopct='%1.1f%%', startangle=90)
         
         # עיצוב הטקסט
-        if len(result) > 2:
-            autotexts = result[2]
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontweight('bold')
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
         
         ax.set_title('התפלגות הצבעים הדומיננטיים', fontsize=16, fontweight='bold')
         
@@ -304,16 +430,80 @@ def create_color_pie_chart(colors, save_path=None):
     except Exception as e:
         print(f"שגיאה ביצירת גרף עוגה: {str(e)}")
 
+# סבילות ההרמוניה בשברי סיבוב של גלגל הגוונים (1.0 = 360°)
+HARMONY_TOLERANCE = 0.05       # ±18° סביב 180° (משלים) ו-120° (טריאדי)
+ANALOGOUS_MAX_DISTANCE = 1 / 12  # עד 30° - צבעים אנלוגיים
+MONOCHROMATIC_DISTANCE = 1 / 36  # עד 10° - אותו גוון
+# מתחת לרוויה/בהירות האלה הגוון לא מוגדר (אפור, שחור, לבן) ולא נכנס ליחסי גוונים
+CHROMATIC_MIN_SATURATION = 0.15
+CHROMATIC_MIN_VALUE = 0.15
+
+def _rgb_to_hsv_array(colors):
+    """
+    ממיר פלטה שלמה ל-HSV בפעולה וקטורית אחת (כמו colorsys.rgb_to_hsv לכל צבע)
+    
+    Returns:
+        tuple: מערכי h, s, v בטווח 0..1
+    """
+    rgb = np.asarray(colors, dtype=np.float64).reshape(-1, 3) / 255
+    value = rgb.max(axis=1)
+    delta = value - rgb.min(axis=1)
+    saturation = np.divide(delta, value, out=np.zeros_like(value), where=value > 0)
+    
+    safe_delta = np.where(delta > 0, delta, 1)
+    r, g, b = rgb.T
+    hue = np.where(value == r, (g - b) / safe_delta,
+                   np.where(value == g, 2 + (b - r) / safe_delta, 4 + (r - g) / safe_delta))
+    hue = np.where(delta > 0, np.mod(hue / 6, 1.0), 0.0)
+    return hue, saturation, value
+
+def _hue_groups(hue, indices):
+    """
+    מקבץ צבעים עם אותו גוון: ממיין את הגוונים ופותח קבוצה חדשה כשגוון רחוק יותר מ-MONOCHROMATIC_DISTANCE
+    מהגוון הראשון בקבוצה - כך כל קבוצה מכסה עד 10°, ורמפה של גוונים צפופים לא נשרשרת לקבוצה אחת
+    
+    המיון מתחיל אחרי הפער המעגלי הגדול ביותר, כך שקבוצה לא נחתכת במעבר מ-360° ל-0°.
+    
+    Returns:
+        list: קבוצות אינדקסים (2 צבעים ומעלה בכל קבוצה)
+    """
+    if len(indices) < 2:
+        return []
+    order = indices[np.argsort(hue[indices])]
+    sorted_hue = hue[order]
+    gaps = np.diff(np.append(sorted_hue, sorted_hue[0] + 1))
+    start = (int(np.argmax(gaps)) + 1) % len(order)
+    order = np.roll(order, -start)
+    unwrapped = np.roll(sorted_hue, -start)
+    unwrapped[len(order) - start:] += 1
+    
+    groups, anchor = [[order[0]]], unwrapped[0]
+    for index, value in zip(order[1:], unwrapped[1:]):
+        if value - anchor > MONOCHROMATIC_DISTANCE:
+            groups.append([])
+            anchor = value
+        groups[-1].append(index)
+    return [sorted(int(i) for i in group) for group in groups if len(group) > 1]
+
 def analyze_color_harmony(colors):
     """
     מנתח הרמוניה של צבעים
     
+    הפלטה מומרת ל-HSV פעם אחת, ומטריצת מרחקי הגוונים (מעגלית) בין כל הזוגות
+    מחושבת בבת אחת - כל היחסים נגזרים ממנה, גם בפלטות משולבות גדולות.
+    
     Args:
         colors (list): רשימת צבעים
     
     Returns:
-        dict: ניתוח ההרמוניה
+        dict: ניתוח ההרמוניה - זוגות משלימים ואנלוגיים, שלשות טריאדיות,
+              קבוצות מונוכרומטיות (אינדקסים ב-colors) וספירת טמפרטורות
     """
+    with stage('harmony'):
+        return _analyze_color_harmony(colors)
+
+
+def _analyze_color_harmony(colors):
     try:
         harmony_analysis = {
             'complementary': [],
@@ -322,30 +512,45 @@ def analyze_color_harmony(colors):
             'monochromatic': [],
             'color_temperatures': {'warm': 0, 'cool': 0, 'neutral': 0}
         }
+        if not len(colors):
+            return harmony_analysis
+        
+        # המרה ל-HSV לניתוח טוב יותר
+        h, s, v = _rgb_to_hsv_array(colors)
+        
+        # ניתוח טמפרטורת צבע: אדום-כתום או כחול-סגול חמים, כחול-ירוק קרים
+        vivid = (s > 0.3) & (v > 0.3)
+        warm_hue = (h < 0.1) | (h > 0.8)
+        cool_hue = (h > 0.4) & (h < 0.7)
+        harmony_analysis['color_temperatures'] = {
+            'warm': int(np.count_nonzero(warm_hue & vivid)),
+            'cool': int(np.count_nonzero(cool_hue & vivid)),
+            'neutral': int(np.count_nonzero(~warm_hue & ~cool_hue))
+        }
         
-        for color in colors:
-            # המרה ל-HSV לניתוח טוב יותר
-            h, s, v = colorsys.rgb_to_hsv(color[0]/255, color[1]/255, color[2]/255)
-            
-            # ניתוח טמפרטורת צבע
-            if h < 0.1 or h > 0.8:  # אדום-כתום או כחול-סגול
-                if s > 0.3 and v > 0.3:
-                    harmony_analysis['color_temperatures']['warm'] += 1
-            elif 0.4 < h < 0.7:  # כחול-ירוק
-                if s > 0.3 and v > 0.3:
-                    harmony_analysis['color_temperatures']['cool'] += 1
-            else:
-                harmony_analysis['color_temperatures']['neutral'] += 1
-        
-        # ניתוח צבעים משלימים
-        for i, color1 in enumerate(colors):
-            for j, color2 in enumerate(colors[i+1:], i+1):
-                h1, _, _ = colorsys.rgb_to_hsv(color1[0]/255, color1[1]/255, color1[2]/255)
-                h2, _, _ = colorsys.rgb_to_hsv(color2[0]/255, color2[1]/255, color2[2]/255)
-                
-                # בדיקה אם צבעים משלימים (הפרש של 0.5 ב-HSV)
-                if abs(h1 - h2) > 0.45 and abs(h1 - h2) < 0.55:
-                    harmony_analysis['complementary'].append((i, j))
+        # מרחק גוונים מעגלי בין כל הזוגות (0..0.5), רק בין צבעים עם גוון מוגדר
+        chromatic = (s > CHROMATIC_MIN_SATURATION) & (v > CHROMATIC_MIN_VALUE)
+        distance = np.abs(h[:, None] - h[None, :])
+        distance = np.minimum(distance, 1 - distance)
+        pairs = np.triu(chromatic[:, None] & chromatic[None, :], k=1)
+        
+        complementary = pairs & (distance > 0.5 - HARMONY_TOLERANCE)
+        analogous = pairs & (distance > MONOCHROMATIC_DISTANCE) & (distance <= ANALOGOUS_MAX_DISTANCE)
+        harmony_analysis['complementary'] = [(int(i), int(j)) for i, j in np.argwhere(complementary)]
+        harmony_analysis['analogous'] = [(int(i), int(j)) for i, j in np.argwhere(analogous)]
+        
+        # שלשות טריאדיות: כל זוג (i, j) במרחק ~120°, ולכל זוג - כל k>j שרחוק ~120° משניהם
+        third = np.abs(distance - 1 / 3) < HARMONY_TOLERANCE
+        third &= chromatic[:, None] & chromatic[None, :]
+        edges = np.argwhere(np.triu(third, k=1))
+        if len(edges):
+            candidates = third[edges[:, 0]] & third[edges[:, 1]]
+            candidates &= np.arange(len(h))[None, :] > edges[:, 1:2]
+            edge_index, k = np.nonzero(candidates)
+            harmony_analysis['triadic'] = [(int(edges[e, 0]), int(edges[e, 1]), int(kk))
+                                           for e, kk in zip(edge_index, k)]
+        
+        harmony_analysis['monochromatic'] = _hue_groups(h, np.flatnonzero(chromatic))
         
         return harmony_analysis
         
@@ -353,15 +558,26 @@ def analyze_color_harmony(colors):
         print(f"שגיאה בניתוח הרמוניה: {str(e)}")
         return {}
 
-def create_color_wheel(colors, save_path=None):
+def create_color_wheel(colors, save_path=None, backend=None, scale=1.0):
     """
     יוצר גלגל צבעים עם הצבעים הדומיננטיים
     
     Args:
         colors (list): רשימת צבעים
         save_path (str): נתיב לשמירת הגרף (אופציונלי)
+        backend (str): 'raster' (NumPy/Pillow) או 'matplotlib' (איכות הדפסה). ברירת מחדל: raster כשיש
+                       save_path, ובלי save_path - matplotlib שמציג את הגרף בחלון (plt.show)
+        scale (float): פקטור הרזולוציה של backend הרסטרי
+
+    Returns:
+        bytes: קובץ PNG ב-backend הרסטרי (None ב-matplotlib או בשגיאה)
     """
+    backend = _display_backend(backend, save_path)
     try:
+        if backend == 'raster':
+            return _render_raster_view('wheel', colors, save_path, scale, "גלגל הצבעים נשמר ב")
+
+        plt = optional_import('matplotlib.pyplot', 'matplotlib')
         fig, ax = plt.subplots(figsize=(10, 10), subplot_kw=dict(projection='polar'))
         
         # יצירת גלגל צבעים
@@ -398,59 +614,53 @@ def create_color_wheel(colors, save_path=None):
     except Exception as e:
         print(f"שגיאה ביצירת גלגל צבעים: {str(e)}")
 
-def create_color_gradient(colors, save_path=None):
+def create_color_gradient(colors, save_path=None, width=DEFAULT_GRADIENT_WIDTH,
+                          height=DEFAULT_GRADIENT_HEIGHT, space='rgb'):
     """
     יוצר גרדיאנט צבעים מהצבעים הדומיננטיים
     
     Args:
         colors (list): רשימת צבעים
-        save_path (str): נתיב לשמירת הגרף (אופציונלי)
+        save_path (str): נתיב לשמירת הגרדיאנט (אופציונלי)
+        width (int): רוחב בפיקסלים
+        height (int): גובה בפיקסלים
+        space (str): מרחב האינטרפולציה - 'rgb' או 'oklab'
+    
+    Returns:
+        bytes: קובץ ה-PNG של הגרדיאנט (None בשגיאה)
     """
     try:
-        fig, ax = plt.subplots(figsize=(12, 3))
-        
-        # יצירת גרדיאנט
-        gradient = np.linspace(0, 1, 1000)
-        
-        for i in range(len(colors) - 1):
-            color1 = np.array(colors[i]) / 255
-            color2 = np.array(colors[i + 1]) / 255
-            
-            start_idx = int(i * 1000 / (len(colors) - 1))
-            end_idx = int((i + 1) * 1000 / (len(colors) - 1))
-            
-            for j in range(start_idx, end_idx):
-                t = (j - start_idx) / (end_idx - start_idx)
-                interpolated_color = color1 * (1 - t) + color2 * t
-                ax.axvline(x=j/1000, color=interpolated_color, linewidth=2)
-        
-        ax.set_xlim(0, 1)
-        ax.set_ylim(0, 1)
-        ax.axis('off')
+        png_bytes = render_gradient_png(colors, width, height, space)
         
         if save_path:
-            plt.savefig(save_path, bbox_inches='tight', dpi=300, facecolor='white')
+            with open(save_path, 'wb') as f:
+                f.write(png_bytes)
             print(f"הגרדיאנט נשמר ב: {save_path}")
-        else:
-            plt.show()
-            
-        plt.close()
+        
+        return png_bytes
         
     except Exception as e:
         print(f"שגיאה ביצירת גרדיאנט: {str(e)}")
+        return None
 
-def generate_color_report(colors, save_dir=None):
+def generate_color_report(colors, save_dir=None, backend=DEFAULT_REPORT_BACKEND, scale=1.0, parallel=True):
     """
     יוצר דוח מלא של ניתוח הצבעים
     
     Args:
         colors (list): רשימת צבעים
         save_dir (str): תיקייה לשמירת הקבצים (אופציונלי)
+        backend (str): 'raster' (NumPy/Pillow, ברירת מחדל) או 'matplotlib' (איכות הדפסה)
+        scale (float): פקטור הרזולוציה של התצוגות (backend רסטרי וגרדיאנט)
+        parallel (bool): רינדור התצוגות במקביל (רק ב-backend הרסטרי - pyplot אינו thread-safe)
     
     Returns:
         dict: דוח מלא עם כל הניתוחים
     """
     try:
+        if backend not in REPORT_BACKENDS:
+            raise ValueError(f"backend לא מוכר: {backend}. אפשרויות: {', '.join(REPORT_BACKENDS)}")
+
         report = {
             'colors_rgb': colors,
             'colors_hex': colors_to_hex(colors),
@@ -461,20 +671,40 @@ def generate_color_report(colors, save_dir=None):
         if save_dir:
             os.makedirs(save_dir, exist_ok=True)
             
-            # יצירת כל הויזואליזציות
-            plot_colors(colors, os.path.join(save_dir, 'color_bars.png'))
-            create_color_palette(colors, os.path.join(save_dir, 'color_palette.png'))
-            create_color_pie_chart(colors, os.path.join(save_dir, 'color_pie.png'))
-            create_color_wheel(colors, os.path.join(save_dir, 'color_wheel.png'))
-            create_color_gradient(colors, os.path.join(save_dir, 'color_gradient.png'))
-            
-            report['visualizations'] = {
+            visualizations = {
                 'bars': 'color_bars.png',
                 'palette': 'color_palette.png',
                 'pie': 'color_pie.png',
                 'wheel': 'color_wheel.png',
                 'gradient': 'color_gradient.png'
             }
+            renderers = {
+                'bars': lambda path: plot_colors(colors, path, backend, scale),
+                'palette': lambda path: create_color_palette(colors, path, backend, scale),
+                'pie': lambda path: create_color_pie_chart(colors, path, backend, scale),
+                'wheel': lambda path: create_color_wheel(colors, path, backend, scale),
+                'gradient': lambda path: create_color_gradient(
+                    colors, path, max(1, int(DEFAULT_GRADIENT_WIDTH * scale)),
+                    max(1, int(DEFAULT_GRADIENT_HEIGHT * scale))),
+            }
+            
+            def render(view):
+                path = os.path.join(save_dir, visualizations[view])
+                if backend == 'matplotlib' and view != 'gradient':
+                    # ב-matplotlib הציור והקידוד (savefig) הם שלב אחד
+                    with stage('render_matplotlib'):
+                        return renderers[view](path)
+                return renderers[view](path)
+            
+            # יצירת כל הויזואליזציות - כל תצוגה עצמאית וכותבת לקובץ משלה
+            if parallel and backend == 'raster':
+                with ThreadPoolExecutor(max_workers=len(renderers)) as executor:
+                    list(executor.map(render, renderers))
+            else:
+                for view in renderers:
+                    render(view)
+            
+            report['visualizations'] = visualizations
         
         return report
         
@@ -482,18 +712,20 @@ def generate_color_report(colors, save_dir=None):
         print(f"שגיאה ביצירת דוח: {str(e)}")
         return {}
 
-def create_combined_edge_image(image1_data, image2_data, output_path=None, blend_ratio=0.5):
+def create_combined_edge_image(image1_data, image2_data, output_path=None, blend_ratio=0.5, tiled=None):
     """
     יוצר תמונת קווי מתאר משולבת משתי תמונות
     Args:
-        image1_data (str): נתוני התמונה הראשונה (base64 או נתיב)
-        image2_data (str): נתוני התמונה השנייה (base64 או נתיב)
+        image1_data (str/bytes/ImageSource): נתוני התמונה הראשונה (base64, נתיב, בייטים או ImageSource)
+        image2_data (str/bytes/ImageSource): נתוני התמונה השנייה
         output_path (str): נתיב לשמירת התמונה (אופציונלי)
         blend_ratio (float): יחס הערבוב בין התמונות (0-1)
+        tiled (bool): עיבוד ברצועות בזיכרון חסום (None - אוטומטי לפי גודל התמונות)
     Returns:
         dict: {'combined_image': base64 string}
     """
     # Check if OpenCV is available
+    cv2 = optional_import('cv2', 'OpenCV')
     if cv2 is None:
         return {'error': 'OpenCV library not available for edge detection'}
     if np is None:
@@ -502,149 +734,142 @@ def create_combined_edge_image(image1_data, image2_data, output_path=None, blend
         return {'error': 'PIL library not available for edge detection'}
         
     try:
-        # טעינת התמונה הראשונה
-        if os.path.exists(image1_data):
-            img1 = cv2.imread(image1_data)
-        elif image1_data.startswith('data:image'):
-            image_data = image1_data.split(',')[1]
-            img_array = np.frombuffer(base64.b64decode(image_data), np.uint8)
-            img1 = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        else:
-            img_array = np.frombuffer(base64.b64decode(image1_data), np.uint8)
-            img1 = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        # טעינת התמונה השנייה
-        if os.path.exists(image2_data):
-            img2 = cv2.imread(image2_data)
-        elif image2_data.startswith('data:image'):
-            image_data = image2_data.split(',')[1]
-            img_array = np.frombuffer(base64.b64decode(image_data), np.uint8)
-            img2 = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        else:
-            img_array = np.frombuffer(base64.b64decode(image2_data), np.uint8)
-            img2 = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        if img1 is None or img2 is None:
-            raise ValueError("לא ניתן לטעון את התמונות. בדקי את הנתונים.")
+        source1 = ImageSource.from_any(image1_data)
+        source2 = ImageSource.from_any(image2_data)
+        if should_tile(source1.size, source2.size, tiled=tiled):
+            # אפור בלבד, רצועה אחרי רצועה ישר ל-PNG
+            png_bytes = tiled_combined_edge_png(source1, source2, blend_ratio)
+            if output_path:
+                with open(output_path, 'wb') as f:
+                    f.write(png_bytes)
+                print(f"✔️ שמרתי את הרישום הקווי בשם {output_path}")
+            return {'combined_image': to_data_url(png_bytes)}
+        
+        # טעינת התמונות (פענוח חד-פעמי, תצוגת BGR ל-OpenCV)
+        img1 = np.ascontiguousarray(source1.bgr())
+        img2 = np.ascontiguousarray(source2.bgr())
         # יישור גודל
         height = min(img1.shape[0], img2.shape[0])
         width = min(img1.shape[1], img2.shape[1])
         img1 = cv2.resize(img1, (width, height))
         img2 = cv2.resize(img2, (width, height))
-        # ערבוב התמונות
-        blended = cv2.addWeighted(img1, blend_ratio, img2, 1 - blend_ratio, 0)
-        # המרה לגווני אפור
-        gray = cv2.cvtColor(blended, cv2.COLOR_BGR2GRAY)
-        # זיהוי קווי מתאר
-        edges = cv2.Canny(gray, 100, 200)
-        # המרה ל-RGB לצורך הצגה
-        edges_rgb = cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB)
-        # שמירה זמנית
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            temp_path = tmp_file.name
-        cv2.imwrite(temp_path, edges_rgb)
-        # קריאת הקובץ כ-base64
-        with open(temp_path, 'rb') as f:
-            edges_base64 = base64.b64encode(f.read()).decode('utf-8')
+        with stage('edges'):
+            # ערבוב התמונות
+            blended = cv2.addWeighted(img1, blend_ratio, img2, 1 - blend_ratio, 0)
+            # המרה לגווני אפור
+            gray = cv2.cvtColor(blended, cv2.COLOR_BGR2GRAY)
+            # זיהוי קווי מתאר
+            edges = cv2.Canny(gray, 100, 200)
+        # קידוד בזיכרון - מפה בינארית, ביט לפיקסל
+        png_bytes = encode_edge_map(edges, binary=True)
         # שמירה קבועה אם נדרש
         if output_path:
-            cv2.imwrite(output_path, edges_rgb)
+            with open(output_path, 'wb') as f:
+                f.write(png_bytes)
             print(f"✔️ שמרתי את הרישום הקווי בשם {output_path}")
-        # ניקוי קובץ זמני
-        os.unlink(temp_path)
-        return {'combined_image': f"data:image/png;base64,{edges_base64}"}
+        return {'combined_image': to_data_url(png_bytes)}
     except Exception as e:
         print(f"שגיאה ביצירת תמונת קווי המתאר: {str(e)}")
         return None
 
-def analyze_image_edges(image_url):
+def analyze_image_edges(image_url, operator=DEFAULT_EDGE_OPERATOR, use_cache=True, tiled=None):
     """
     פונקציה לניתוח קווי מתאר מתמונה אחת
     
     Args:
-        image_url (str): URL של התמונה או נתוני base64
+        image_url (str/bytes/ImageSource): URL של התמונה, נתוני base64, בייטים או ImageSource
+        operator (str): אופרטור הגרדיאנט - 'central', 'sobel', 'scharr' או 'canny'
+        use_cache (bool): האם להשתמש במטמון התוצאות
+        tiled (bool): עיבוד ברצועות בזיכרון חסום (None - אוטומטי לפי גודל התמונה)
     
     Returns:
         dict: תוצאות הניתוח
     """
     try:
-        import requests
-        import base64
-        from io import BytesIO
-        
         # Check if required libraries are available
         if Image is None:
             return {'error': 'PIL library not available'}
         if np is None:
             return {'error': 'numpy library not available'}
         
-        # הורדת התמונה אם זה URL
-        if image_url.startswith('http'):
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            img_bytes = response.content
-            img = Image.open(BytesIO(img_bytes))
+        source = ImageSource.from_any(image_url)
+        width, height = source.size
+        tiled = should_tile(source.size, tiled=tiled)
+        
+        cache_key = None
+        if use_cache and cache_enabled():
+            cache_key = make_key(source.content_hash, op='edges', operator=operator, tiled=tiled)
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        if tiled:
+            # אפור בלבד (מוקטן אם חורג מהתקציב), רצועה אחרי רצועה ישר ל-PNG
+            gray_image = decode_gray(source)
+            png_bytes = tiled_edge_png(gray_image, operator)
+            edge_width, edge_height = gray_image.size
         else:
-            # אם זה כבר base64
-            if image_url.startswith('data:image'):
-                image_data = image_url.split(',')[1]
-                img_bytes = base64.b64decode(image_data)
-            else:
-                img_bytes = base64.b64decode(image_url)
-            img = Image.open(BytesIO(img_bytes))
-        
-        if img is None:
-            return {'error': 'לא הצלחתי לטעון את התמונה'}
-        
-        # המרה לגווני אפור
-        gray = img.convert('L')
-        
-        # המרה למערך numpy
-        gray_array = np.array(gray)
-        
-        # זיהוי קווי מתאר פשוט
-        edges = np.zeros_like(gray_array)
-        
-        # Simple edge detection
-        for x in range(1, gray_array.shape[0] - 1):
-            for y in range(1, gray_array.shape[1] - 1):
-                # Simple Sobel-like edge detection
-                gx = (gray_array[x+1, y] - gray_array[x-1, y]) / 2
-                gy = (gray_array[x, y+1] - gray_array[x, y-1]) / 2
-                magnitude = int(min(255, (gx**2 + gy**2)**0.5))
-                edges[x, y] = magnitude
-        
-        # המרה חזרה לתמונה
-        edge_image = Image.fromarray(edges.astype(np.uint8))
-        
-        # המרה ל-base64
-        buffer = BytesIO()
-        edge_image.save(buffer, format='PNG')
-        edges_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return {
-            'edge_image': f"data:image/png;base64,{edges_base64}",
-            'width': img.width,
-            'height': img.height
+            # גווני אפור מהפענוח המשותף
+            gray_array = source.gray()
+            
+            # זיהוי קווי מתאר וקטורי (מנוע משותף)
+            with stage('edges'):
+                edges = compute_edge_map(gray_array, operator)
+            edge_width, edge_height = width, height
+            
+            # קידוד בזיכרון - ערוץ אחד (ב-Canny ביט לפיקסל)
+            png_bytes = encode_edge_map(edges, binary=operator in BINARY_EDGE_OPERATORS)
+        
+        result = {
+            'edge_image': to_data_url(png_bytes),
+            'width': width,
+            'height': height,
+            'operator': operator,
+            'tiled': tiled
         }
+        if (edge_width, edge_height) != (width, height):
+            # התמונה הוקטנה כדי להיכנס לתקציב הזיכרון
+            result['edge_width'], result['edge_height'] = edge_width, edge_height
+        
+        if cache_key is not None:
+            analysis_cache.put(cache_key, result)
+        
+        return result
         
     except Exception as e:
         return {'error': f'שגיאה בניתוח קווי המתאר: {str(e)}'}
 
-def analyze_combined_edges(image1_data, image2_data, blend_ratio=0.5, save_image=False, output_dir="edge_results"):
+def analyze_combined_edges(image1_data, image2_data, blend_ratio=0.5, save_image=False, output_dir="edge_results",
+                           use_cache=True, tiled=None):
     """
     פונקציה ראשית לניתוח קווי מתאר משולבים
     
     Args:
-        image1_data (str): נתוני התמונה הראשונה
-        image2_data (str): נתוני התמונה השנייה
+        image1_data (str/bytes/ImageSource): נתוני התמונה הראשונה
+        image2_data (str/bytes/ImageSource): נתוני התמונה השנייה
         blend_ratio (float): יחס הערבוב
         save_image (bool): האם לשמור את התמונה כקובץ
         output_dir (str): תיקייה לשמירת הקבצים
+        use_cache (bool): האם להשתמש במטמון התוצאות
+        tiled (bool): עיבוד ברצועות בזיכרון חסום (None - אוטומטי לפי גודל התמונות)
     
     Returns:
         dict: תוצאות הניתוח
     """
     try:
+        image1_data = ImageSource.from_any(image1_data)
+        image2_data = ImageSource.from_any(image2_data)
+        tiled = should_tile(image1_data.size, image2_data.size, tiled=tiled)
+        
+        # בדיקה במטמון (לא כשיש שמירה לדיסק)
+        cache_key = None
+        if use_cache and cache_enabled() and not save_image:
+            cache_key = make_key(image1_data.content_hash, image2_data.content_hash,
+                                 op='combined_edges', blend_ratio=blend_ratio, tiled=tiled)
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # יצירת נתיב שמירה אם נדרש
         saved_image_path = None
         if save_image:
@@ -658,7 +883,8 @@ def analyze_combined_edges(image1_data, image2_data, blend_ratio=0.5, save_image
             image1_data, 
             image2_data, 
             output_path=saved_image_path,
-            blend_ratio=blend_ratio
+            blend_ratio=blend_ratio,
+            tiled=tiled
         )
         
         if edges_image is None:
@@ -666,12 +892,16 @@ def analyze_combined_edges(image1_data, image2_data, blend_ratio=0.5, save_image
         
         result = {
             'edges_image': edges_image,
-            'blend_ratio': blend_ratio
+            'blend_ratio': blend_ratio,
+            'tiled': tiled
         }
         
         if saved_image_path:
             result['saved_image_path'] = saved_image_path
         
+        if cache_key is not None:
+            analysis_cache.put(cache_key, result)
+        
         return result
         
     except Exception as e:
@@ -0,0 +1,152 @@
+"""
+מנוע זיהוי קווי מתאר וקטורי - משותף ל-color_utils ול-streamlit_app
+
+כל האופרטורים עובדים על מערך שלם (NumPy slicing) במקום לולאות פיקסל-פיקסל בפייתון.
+"""
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+# OpenCV נטען רק בשימוש הראשון (Canny)
+from lazy_imports import optional_import
+
+# אופרטורים נתמכים
+EDGE_OPERATORS = ('central', 'sobel', 'scharr', 'canny')
+DEFAULT_EDGE_OPERATOR = 'central'
+# אופרטורים שמחזירים מפה בינארית (0 / 255) - מקודדים בביט לפיקסל
+BINARY_EDGE_OPERATORS = ('canny',)
+
+# גרעינים ספרביליים: (משקלי החלקה, מקדם נרמול לסקאלה של הפרש מרכזי)
+_SEPARABLE_KERNELS = {
+    'sobel': ((1.0, 2.0, 1.0), 8.0),
+    'scharr': ((3.0, 10.0, 3.0), 32.0),
+}
+
+
+def _central_difference(gray):
+    """
+    הפרש מרכזי - זהה לחישוב הישן: gx = (p[x+1] - p[x-1]) / 2
+
+    Args:
+        gray (np.ndarray): מערך גווני אפור (H, W)
+
+    Returns:
+        tuple: (gx, gy) עבור הפיקסלים הפנימיים בלבד
+    """
+    g = gray.astype(np.float64)
+    gx = (g[2:, 1:-1] - g[:-2, 1:-1]) / 2
+    gy = (g[1:-1, 2:] - g[1:-1, :-2]) / 2
+    return gx, gy
+
+
+def _separable_gradient(gray, operator):
+    """
+    גרעין 3x3 ספרבילי (Sobel / Scharr) בעזרת חיתוכי מערך
+
+    התוצאה מנורמלת בסכום משקלי ההחלקה כך שהעוצמה בסקאלה של הפרש מרכזי.
+
+    Args:
+        gray (np.ndarray): מערך גווני אפור (H, W)
+        operator (str): 'sobel' או 'scharr'
+
+    Returns:
+        tuple: (gx, gy) עבור הפיקסלים הפנימיים בלבד
+    """
+    (a, b, c), norm = _SEPARABLE_KERNELS[operator]
+    g = gray.astype(np.float64)
+
+    # נגזרת לאורך ציר 0 והחלקה לאורך ציר 1
+    d0 = g[2:, :] - g[:-2, :]
+    gx = a * d0[:, :-2] + b * d0[:, 1:-1] + c * d0[:, 2:]
+
+    # נגזרת לאורך ציר 1 והחלקה לאורך ציר 0
+    d1 = g[:, 2:] - g[:, :-2]
+    gy = a * d1[:-2, :] + b * d1[1:-1, :] + c * d1[2:, :]
+
+    scale = 1.0 / norm
+    return gx * scale, gy * scale
+
+
+def auto_canny_thresholds(gray, sigma=0.33):
+    """
+    מחשב ספים אוטומטיים ל-Canny לפי החציון של עוצמות האפור
+
+    Args:
+        gray (np.ndarray): מערך גווני אפור
+        sigma (float): רוחב הטווח סביב החציון
+
+    Returns:
+        tuple: (סף תחתון, סף עליון)
+    """
+    median = float(np.median(gray))
+    lower = int(max(0, (1.0 - sigma) * median))
+    upper = int(min(255, (1.0 + sigma) * median))
+    return lower, upper
+
+
+def compute_edge_map(gray, operator=DEFAULT_EDGE_OPERATOR, canny_thresholds=None):
+    """
+    מחשב מפת קווי מתאר לתמונה בגווני אפור
+
+    ברירת המחדל ('central') מחזירה פלט זהה ללולאה הישנה:
+    עוצמת הגרדיאנט נחתכת ל-255, מעוגלת כלפי מטה, ושולי התמונה נשארים 0.
+
+    Args:
+        gray (np.ndarray): מערך uint8 בגווני אפור (H, W)
+        operator (str): 'central', 'sobel', 'scharr' או 'canny'
+        canny_thresholds (tuple): ספים ל-Canny (אופציונלי - ברירת מחדל אוטומטית)
+
+    Returns:
+        np.ndarray: מפת קווי מתאר uint8 באותו גודל
+    """
+    if np is None:
+        raise RuntimeError('numpy library not available for edge detection')
+    if operator not in EDGE_OPERATORS:
+        raise ValueError(f"אופרטור לא מוכר: {operator}. אפשרויות: {', '.join(EDGE_OPERATORS)}")
+
+    gray = np.asarray(gray)
+
+    if operator == 'canny':
+        cv2 = optional_import('cv2', 'OpenCV')
+        if cv2 is None:
+            raise RuntimeError('OpenCV library not available for Canny edge detection')
+        lower, upper = canny_thresholds or auto_canny_thresholds(gray)
+        return cv2.Canny(gray.astype(np.uint8), lower, upper)
+
+    edges = np.zeros(gray.shape, dtype=np.uint8)
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return edges
+
+    if operator == 'central':
+        gx, gy = _central_difference(gray)
+    else:
+        gx, gy = _separable_gradient(gray, operator)
+
+    magnitude = np.sqrt(gx * gx + gy * gy)
+    np.minimum(magnitude, 255, out=magnitude)
+    edges[1:-1, 1:-1] = magnitude.astype(np.uint8)
+    return edges
+
+
+def reference_edge_map(gray):
+    """
+    המימוש הישן (לולאה כפולה בפייתון) - משמש רק להשוואה בבדיקות ובמדידות
+
+    Args:
+        gray (np.ndarray): מערך גווני אפור (H, W)
+
+    Returns:
+        np.ndarray: מפת קווי מתאר uint8
+    """
+    values = np.asarray(gray).astype(int).tolist()
+    edges = np.zeros((len(values), len(values[0]) if values else 0), dtype=np.uint8)
+    for x in range(1, len(values) - 1):
+        for y in range(1, len(values[0]) - 1):
+            gx = (values[x+1][y] - values[x-1][y]) / 2
+            gy = (values[x][y+1] - values[x][y-1]) / 2
+            edges[x, y] = int(min(255, (gx**2 + gy**2)**0.5))
+    return edges
@@ -0,0 +1,181 @@
+"""
+רינדור גרדיאנט צבעים עם NumPy/Pillow - ללא matplotlib וללא קבצים זמניים
+
+תומך באינטרפולציה ב-RGB או במרחב תפיסתי (OKLab), ובמצב "CSS"
+שמחזיר מחרוזת linear-gradient כך שהדפדפן מצייר את הגרדיאנט בעצמו.
+"""
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+try:
+    from PIL import Image
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+
+from artifact_encoder import encode_image
+from metrics import stage
+
+GRADIENT_SPACES = ('rgb', 'oklab')
+GRADIENT_FORMATS = ('png', 'css')
+DEFAULT_GRADIENT_WIDTH = 1200
+DEFAULT_GRADIENT_HEIGHT = 300
+MAX_GRADIENT_SIZE = 4096  # רוחב / גובה מקסימלי של גרדיאנט שמבקשים מבחוץ
+
+
+def _srgb_to_linear(c):
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(c):
+    c = np.clip(c, 0.0, 1.0)
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * np.power(c, 1 / 2.4) - 0.055)
+
+
+def rgb_to_oklab(rgb):
+    """
+    ממיר צבעי sRGB (0-255) ל-OKLab
+
+    Args:
+        rgb (np.ndarray): מערך (N, 3)
+
+    Returns:
+        np.ndarray: מערך (N, 3) של L, a, b
+    """
+    linear = _srgb_to_linear(np.asarray(rgb, dtype=np.float64) / 255.0)
+    lms = linear @ np.array([
+        [0.4122214708, 0.2119034982, 0.0883024619],
+        [0.5363325363, 0.6806995451, 0.2817188376],
+        [0.0514459929, 0.1073969566, 0.6299787005],
+    ])
+    return np.cbrt(lms) @ np.array([
+        [0.2104542553, 1.9779984951, 0.0259040371],
+        [0.7936177850, -2.4285922050, 0.7827717662],
+        [-0.0040720468, 0.4505937099, -0.8086757660],
+    ])
+
+
+def oklab_to_rgb(lab):
+    """
+    ממיר צבעי OKLab חזרה ל-sRGB (0-255, float)
+
+    Args:
+        lab (np.ndarray): מערך (N, 3)
+
+    Returns:
+        np.ndarray: מערך (N, 3)
+    """
+    lms = np.asarray(lab, dtype=np.float64) @ np.array([
+        [1.0, 1.0, 1.0],
+        [0.3963377774, -0.1055613458, -0.0894841775],
+        [0.2158037573, -0.0638541728, -1.2914855480],
+    ])
+    linear = (lms ** 3) @ np.array([
+        [4.0767416621, -1.2684380046, -0.0041960863],
+        [-3.3077115913, 2.6097574011, -0.7034186147],
+        [0.2309699292, -0.3413193965, 1.7076147010],
+    ])
+    return _linear_to_srgb(linear) * 255.0
+
+
+def interpolate_gradient(colors, width=DEFAULT_GRADIENT_WIDTH, space='rgb'):
+    """
+    מחשב שורת גרדיאנט אחת - הצבעים מפוזרים בקצב אחיד לאורך הרוחב
+
+    Args:
+        colors (list): רשימת צבעים ב-RGB
+        width (int): מספר הפיקסלים בשורה
+        space (str): מרחב האינטרפולציה - 'rgb' או 'oklab'
+
+    Returns:
+        np.ndarray: מערך (width, 3) מסוג uint8
+    """
+    if space not in GRADIENT_SPACES:
+        raise ValueError(f"מרחב צבע לא מוכר: {space}. אפשרויות: {', '.join(GRADIENT_SPACES)}")
+
+    stops = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    if len(stops) == 0:
+        raise ValueError('לא נשלחו צבעים לגרדיאנט')
+    if len(stops) == 1:
+        return np.tile(np.clip(np.rint(stops), 0, 255).astype(np.uint8), (width, 1))
+
+    if space == 'oklab':
+        stops = rgb_to_oklab(stops)
+
+    positions = np.linspace(0.0, 1.0, len(stops))
+    t = np.linspace(0.0, 1.0, width)
+    row = np.stack([np.interp(t, positions, stops[:, ch]) for ch in range(3)], axis=1)
+
+    if space == 'oklab':
+        row = oklab_to_rgb(row)
+
+    return np.clip(np.rint(row), 0, 255).astype(np.uint8)
+
+
+def render_gradient(colors, width=DEFAULT_GRADIENT_WIDTH, height=DEFAULT_GRADIENT_HEIGHT, space='rgb'):
+    """
+    מרנדר גרדיאנט אופקי למערך תמונה
+
+    Args:
+        colors (list): רשימת צבעים ב-RGB
+        width (int): רוחב בפיקסלים
+        height (int): גובה בפיקסלים
+        space (str): מרחב האינטרפולציה
+
+    Returns:
+        np.ndarray: מערך (height, width, 3) מסוג uint8 (תצוגה משודרת של שורה אחת)
+    """
+    row = interpolate_gradient(colors, width, space)
+    return np.broadcast_to(row, (height, width, 3))
+
+
+def render_gradient_png(colors, width=DEFAULT_GRADIENT_WIDTH, height=DEFAULT_GRADIENT_HEIGHT, space='rgb'):
+    """
+    מרנדר גרדיאנט ישירות לבאפר PNG בזיכרון
+
+    Args:
+        colors (list): רשימת צבעים ב-RGB
+        width (int): רוחב בפיקסלים
+        height (int): גובה בפיקסלים
+        space (str): מרחב האינטרפולציה
+
+    Returns:
+        bytes: קובץ PNG
+    """
+    if Image is None:
+        raise RuntimeError('PIL library not available for gradient rendering')
+    with stage('gradient'):
+        pixels = render_gradient(colors, width, height, space)
+    return encode_image(pixels)
+
+
+def gradient_to_css(colors, space='rgb', angle=90):
+    """
+    מחזיר מחרוזת CSS של linear-gradient - הדפדפן מצייר, השרת לא
+
+    Args:
+        colors (list): רשימת צבעים ב-RGB
+        space (str): מרחב האינטרפולציה ('oklab' משתמש בתחביר "in oklab")
+        angle (int): זווית הגרדיאנט במעלות
+
+    Returns:
+        str: ערך CSS מוכן לשימוש ב-background
+    """
+    if space not in GRADIENT_SPACES:
+        raise ValueError(f"מרחב צבע לא מוכר: {space}. אפשרויות: {', '.join(GRADIENT_SPACES)}")
+    if not colors:
+        raise ValueError('לא נשלחו צבעים לגרדיאנט')
+
+    hex_colors = ['#{:02x}{:02x}{:02x}'.format(int(c[0]), int(c[1]), int(c[2])) for c in colors]
+    if len(hex_colors) == 1:
+        hex_colors = hex_colors * 2
+
+    last = len(hex_colors) - 1
+    stops = ', '.join(f'{h} {round(100 * i / last, 2):g}%' for i, h in enumerate(hex_colors))
+    prefix = f'in oklab {angle}deg' if space == 'oklab' else f'{angle}deg'
+    return f'linear-gradient({prefix}, {stops})'
@@ -0,0 +1,293 @@
+"""
+הורדת תמונות מ-URL (בעיקר התמונות ש-DALL-E יוצר) - כל URL יורד לכל היותר פעם אחת בתהליך
+
+- Session משותף של requests עם מאגר חיבורים (keep-alive)
+- מטמון בייטים לפי URL (LRU לפי גודל)
+- בקשות מקבילות לאותו URL ממתינות להורדה אחת (in-flight dedup)
+- הורדה שעוברת סף גודל נכתבת לקובץ זמני תוך כדי קריאה, ולא נשמרת בזיכרון
+
+הגדרות (משתני סביבה):
+    DOWNLOAD_CACHE_MAX_BYTES   גודל מטמון הבייטים בזיכרון (ברירת מחדל: 64MB)
+    DOWNLOAD_SPILL_BYTES       מעל הסף הזה ההורדה נכתבת לדיסק (ברירת מחדל: 8MB)
+    DOWNLOAD_DISK_MAX_BYTES    נפח מקסימלי לקבצים שנכתבו לדיסק (ברירת מחדל: 512MB)
+    DOWNLOAD_MAX_BYTES         גודל מקסימלי להורדה אחת (ברירת מחדל: 50MB)
+    DOWNLOAD_POOL_SIZE         מספר החיבורים הפתוחים לכל שרת (ברירת מחדל: 16)
+"""
+
+import os
+import atexit
+import shutil
+import weakref
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Import with error handling
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError as e:
+    print(f"Warning: requests import failed: {e}")
+    requests = None
+
+from analysis_cache import LRUCache
+from image_source import ImageSource
+from metrics import stage, count_bytes_in
+
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_CHUNK = 256 * 1024
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv('DOWNLOAD_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+DOWNLOAD_SPILL_BYTES = int(os.getenv('DOWNLOAD_SPILL_BYTES', 8 * 1024 * 1024))
+DOWNLOAD_DISK_MAX_BYTES = int(os.getenv('DOWNLOAD_DISK_MAX_BYTES', 512 * 1024 * 1024))
+DOWNLOAD_MAX_BYTES = int(os.getenv('DOWNLOAD_MAX_BYTES', 50 * 1024 * 1024))
+DOWNLOAD_POOL_SIZE = int(os.getenv('DOWNLOAD_POOL_SIZE', 16))
+
+# בייטים של הורדות קטנות, לפי URL
+download_cache = LRUCache(max_bytes=DOWNLOAD_CACHE_MAX_BYTES, name='downloads')
+
+_lock = threading.Lock()
+_session = None
+_spill_dir = None
+# הורדות גדולות שנכתבו לדיסק: url -> (נתיב, גודל, hash)
+_spilled = OrderedDict()
+_spilled_bytes = 0
+# ImageSource חיים לכל קובץ על הדיסק: נתיב -> מספר הקוראים. from_file קורא את הקובץ בעצלות,
+# ולכן קובץ שפונה בזמן שעוד קוראים ממנו נמחק רק כשהקורא האחרון נאסף
+_readers = {}
+_evicted_readers = set()
+# נפרד מ-_lock: ה-finalizer יכול לרוץ ב-GC כש-_lock כבר מוחזק באותו thread
+_readers_lock = threading.RLock()
+# הורדות שרצות כרגע: url -> Future
+_inflight = {}
+_counters = {'fetches': 0, 'deduplicated': 0, 'spilled': 0}
+
+
+def get_session():
+    """
+    Session משותף עם מאגר חיבורים - נוצר בשימוש הראשון
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _get_spill_dir():
+    global _spill_dir
+    if _spill_dir is None:
+        _spill_dir = tempfile.mkdtemp(prefix='poetic-downloads-')
+        atexit.register(shutil.rmtree, _spill_dir, True)
+    return _spill_dir
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _spilled_source(path, digest):
+    """
+    ImageSource לקובץ על הדיסק, שנרשם כקורא עד שהוא נאסף (נקרא כש-_lock מוחזק)
+    """
+    source = ImageSource.from_file(path, digest)
+    with _readers_lock:
+        _readers[path] = _readers.get(path, 0) + 1
+    weakref.finalize(source, _release_reader, path)
+    return source
+
+
+def _release_reader(path):
+    with _readers_lock:
+        count = _readers.pop(path, 1) - 1
+        if count:
+            _readers[path] = count
+            return
+        if path not in _evicted_readers:
+            return
+        _evicted_readers.discard(path)
+    _remove_file(path)
+
+
+def _evict_file(path):
+    with _readers_lock:
+        if _readers.get(path):
+            # עוד יש ניתוח שקורא ממנו - יימחק עם הקורא האחרון
+            _evicted_readers.add(path)
+            return
+    _remove_file(path)
+
+
+def _remember_spilled(url, path, size, digest):
+    """
+    רושם קובץ שנכתב לדיסק ומפנה את הישנים ביותר מעבר לנפח המותר
+
+    Returns:
+        ImageSource: מקור לקובץ החדש
+    """
+    global _spilled_bytes
+    with _lock:
+        _spilled[url] = (path, size, digest)
+        _spilled_bytes += size
+        source = _spilled_source(path, digest)
+        while _spilled_bytes > DOWNLOAD_DISK_MAX_BYTES and len(_spilled) > 1:
+            _, (old_path, old_size, _) = _spilled.popitem(last=False)
+            _spilled_bytes -= old_size
+            _evict_file(old_path)
+    return source
+
+
+def check_download_size(size):
+    """
+    Raises:
+        ValueError: אם ההורדה גדולה מ-DOWNLOAD_MAX_BYTES
+    """
+    if size > DOWNLOAD_MAX_BYTES:
+        raise ValueError(f"התמונה גדולה מדי (מעל {DOWNLOAD_MAX_BYTES} בייטים)")
+
+
+def _receive(url, chunks):
+    """
+    קורא את תוכן ההורדה בחלקים - עד הסף בזיכרון, מעליו לקובץ זמני
+
+    Returns:
+        ImageSource: מבייטים (נשמר במטמון) או מקובץ על הדיסק
+    """
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    spill = None
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            check_download_size(size)
+            digest.update(chunk)
+            if spill is None and size > DOWNLOAD_SPILL_BYTES:
+                spill = tempfile.NamedTemporaryFile(dir=_get_spill_dir(), suffix='.img', delete=False)
+                spill.write(buffer)
+                buffer = None
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+
+    count_bytes_in(size, 'download')
+    if spill is None:
+        content = bytes(buffer)
+        download_cache.put(url, content)
+        return ImageSource(content)
+
+    spill.close()
+    with _lock:
+        _counters['spilled'] += 1
+    return _remember_spilled(url, spill.name, size, digest.hexdigest())
+
+
+def cached_source(url):
+    """
+    מחזיר ImageSource מהמטמון (זיכרון או דיסק), או None אם ה-URL עוד לא ירד
+    """
+    content = download_cache.get(url)
+    if content is not None:
+        return ImageSource(content)
+    with _lock:
+        entry = _spilled.get(url)
+        if entry is not None and os.path.exists(entry[0]):
+            _spilled.move_to_end(url)
+            return _spilled_source(entry[0], entry[2])
+    return None
+
+
+def store_download(url, content):
+    """
+    שומר תוכן שהורד בדרך אחרת (למשל httpx במצב ASGI) באותו מטמון
+
+    Args:
+        url (str): כתובת התמונה
+        content (bytes / list): התוכן, או רשימת החלקים שלו
+
+    Returns:
+        ImageSource
+    """
+    return _receive(url, [content] if isinstance(content, (bytes, bytearray)) else content)
+
+
+def _fetch(url):
+    with _lock:
+        _counters['fetches'] += 1
+    with stage('download'), get_session().get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        check_download_size(int(response.headers.get('content-length') or 0))
+        return _receive(url, response.iter_content(DOWNLOAD_CHUNK))
+
+
+def download_image(url):
+    """
+    מוריד תמונה מ-URL - מהמטמון אם כבר ירדה, או ממתין להורדה שכבר רצה
+
+    Args:
+        url (str): כתובת התמונה
+
+    Returns:
+        ImageSource: מקור התמונה
+    """
+    source = cached_source(url)
+    if source is not None:
+        return source
+
+    with _lock:
+        future = _inflight.get(url)
+        owner = future is None
+        if owner:
+            future = _inflight[url] = Future()
+        else:
+            _counters['deduplicated'] += 1
+    if not owner:
+        return future.result()
+
+    try:
+        # ייתכן שהורדה קודמת הסתיימה בין הבדיקה לרישום
+        source = cached_source(url) or _fetch(url)
+        future.set_result(source)
+        return source
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(url, None)
+
+
+def fetch_bytes(url):
+    """
+    Returns:
+        bytes: תוכן התמונה ב-URL (דרך המטמון)
+    """
+    return download_image(url).raw_bytes
+
+
+def stats():
+    """
+    Returns:
+        dict: סטטיסטיקות מטמון ההורדות, הקבצים על הדיסק והמונים
+    """
+    result = download_cache.stats()
+    with _lock:
+        result.update(_counters)
+        result['spilled_entries'] = len(_spilled)
+        result['spilled_bytes'] = _spilled_bytes
+    return result
@@ -0,0 +1,233 @@
+"""
+ImageSource - מקור תמונה שמפוענח פעם אחת בלבד ומשותף לכל הניתוחים
+
+מזהה את סוג הקלט (נתיב, URL, data URL, base64 רגיל, בייטים או מערך),
+מפענח את ה-base64 לבאפר אחד, מפענח את הפיקסלים רק כשמבקשים ורק פעם אחת,
+ומחזיר תצוגות NumPy (RGB, BGR, גווני אפור) לכל ניתוח שצריך אותן.
+"""
+
+import os
+import base64
+import threading
+from io import BytesIO
+
+# Import with error handling
+try:
+    from PIL import Image
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+from analysis_cache import content_hash
+from artifact_encoder import encode_image
+from metrics import stage
+
+
+def detect_kind(data):
+    """
+    מזהה את סוג הקלט
+
+    Args:
+        data: str / bytes / np.ndarray
+
+    Returns:
+        str: 'bytes', 'array', 'path', 'url', 'data_url' או 'base64'
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return 'bytes'
+    if np is not None and isinstance(data, np.ndarray):
+        return 'array'
+    if not isinstance(data, str):
+        raise TypeError(f"סוג קלט לא נתמך: {type(data).__name__}")
+    if data.startswith('http://') or data.startswith('https://'):
+        return 'url'
+    if data.startswith('data:image'):
+        return 'data_url'
+    if len(data) < 4096 and os.path.exists(data):
+        return 'path'
+    return 'base64'
+
+
+class ImageSource:
+    """
+    תמונה אחת עם פענוח עצל - כל שלב (בייטים, פיקסלים, אפור) מחושב לכל היותר פעם אחת
+    """
+
+    def __init__(self, data):
+        self.kind = detect_kind(data)
+        self._data = data
+        self._bytes = None
+        self._hash = None
+        self._rgb = None
+        self._gray = None
+        self._lock = threading.RLock()
+
+        if self.kind == 'bytes':
+            self._bytes = bytes(data)
+        elif self.kind == 'array':
+            self._set_rgb(data)
+
+    @classmethod
+    def from_any(cls, data):
+        """
+        מחזיר ImageSource - אותו אובייקט אם כבר קיבלנו אחד
+
+        Args:
+            data: ImageSource / str / bytes / np.ndarray
+
+        Returns:
+            ImageSource
+        """
+        return data if isinstance(data, cls) else cls(data)
+
+    @classmethod
+    def from_file(cls, path, content_hash=None):
+        """
+        יוצר מקור מקובץ על הדיסק - אפשר להעביר hash שכבר חושב כדי לא לקרוא את הקובץ שוב
+        """
+        source = cls(path)
+        source._hash = content_hash
+        return source
+
+    @classmethod
+    def from_array(cls, rgb):
+        """
+        יוצר מקור ממערך RGB שכבר פוענח (H, W, 3) מסוג uint8
+        """
+        return cls(rgb)
+
+    def _set_rgb(self, rgb):
+        rgb = np.asarray(rgb, dtype=np.uint8)
+        if rgb.ndim != 3 or rgb.shape[2] != 3:
+            raise ValueError(f"מערך RGB חייב להיות בצורה (H, W, 3), התקבל {rgb.shape}")
+        rgb = rgb.view()
+        rgb.flags.writeable = False
+        self._rgb = rgb
+
+    @property
+    def raw_bytes(self):
+        """
+        בייטי קובץ התמונה - פענוח base64 / קריאת קובץ / הורדה מתבצעים פעם אחת
+
+        Returns:
+            bytes: תוכן הקובץ
+        """
+        if self._bytes is None:
+            with self._lock:
+                if self._bytes is None:
+                    self._bytes = self._load_bytes()
+        return self._bytes
+
+    def _load_bytes(self):
+        if self.kind == 'path':
+            with open(self._data, 'rb') as f:
+                return f.read()
+        if self.kind == 'url':
+            # הורדה משותפת - מאגר חיבורים ומטמון לפי URL
+            from image_downloader import fetch_bytes
+            return fetch_bytes(self._data)
+        if self.kind == 'data_url':
+            # הסרת ה-prefix של data URL
+            with stage('base64_decode'):
+                return base64.b64decode(self._data.split(',', 1)[1])
+        if self.kind == 'base64':
+            with stage('base64_decode'):
+                return base64.b64decode(self._data)
+        if self.kind == 'array':
+            # מקור שנוצר ממערך - מקודדים ל-PNG רק אם מישהו באמת צריך בייטים
+            return encode_image(self._rgb)
+        raise ValueError(f"סוג קלט לא נתמך: {self.kind}")
+
+    @property
+    def content_hash(self):
+        """
+        hash של התוכן - למקור ממערך מחושב על הפיקסלים עצמם
+
+        Returns:
+            str: SHA-256 hex
+        """
+        if self._hash is None:
+            if self.kind == 'array':
+                shape = ','.join(str(d) for d in self._rgb.shape).encode()
+                self._hash = content_hash(shape + b':' + np.ascontiguousarray(self._rgb).tobytes())
+            else:
+                self._hash = content_hash(self.raw_bytes)
+        return self._hash
+
+    def open(self):
+        """
+        פותח את התמונה ב-PIL בלי לפענח פיקסלים (קריאת header בלבד)
+
+        Returns:
+            PIL.Image.Image
+        """
+        if Image is None:
+            raise RuntimeError('PIL library not available')
+        if self.kind == 'array':
+            return Image.fromarray(self._rgb)
+        if self.kind == 'path' and self._bytes is None:
+            # PIL קורא מהקובץ ישירות - בלי לטעון את כל הבייטים לזיכרון
+            return Image.open(self._data)
+        img = Image.open(BytesIO(self.raw_bytes))
+        if img is None:
+            raise ValueError("לא הצלחתי לטעון את התמונה")
+        return img
+
+    @property
+    def size(self):
+        """
+        Returns:
+            tuple: (רוחב, גובה)
+        """
+        if self._rgb is not None:
+            return self._rgb.shape[1], self._rgb.shape[0]
+        return self.open().size
+
+    @property
+    def is_decoded(self):
+        return self._rgb is not None
+
+    def rgb(self):
+        """
+        פיקסלי התמונה ב-RGB - מפוענחים פעם אחת, לקריאה בלבד
+
+        Returns:
+            np.ndarray: (H, W, 3) uint8
+        """
+        if self._rgb is None:
+            with self._lock:
+                if self._rgb is None:
+                    img = self.open()
+                    with stage('decode'):
+                        self._set_rgb(np.asarray(img.convert('RGB')))
+        return self._rgb
+
+    def bgr(self):
+        """
+        תצוגת BGR (ל-OpenCV) על אותו זיכרון - ללא העתקה
+
+        Returns:
+            np.ndarray: (H, W, 3) uint8
+        """
+        return self.rgb()[..., ::-1]
+
+    def gray(self):
+        """
+        גווני אפור (המרת 'L' של PIL) - מחושב פעם אחת ונשמר
+
+        Returns:
+            np.ndarray: (H, W) uint8
+        """
+        if self._gray is None:
+            with self._lock:
+                if self._gray is None:
+                    gray = np.asarray(Image.fromarray(self.rgb()).convert('L'))
+                    gray.flags.writeable = False
+                    self._gray = gray
+        return self._gray
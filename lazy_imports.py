@@ -0,0 +1,44 @@
+"""
+ייבוא עצל של ספריות כבדות (scikit-learn, OpenCV, matplotlib, openai)
+
+ייבוא של app.py לא טוען אותן - כל ספרייה נטענת בשימוש הראשון שלה, כך ש-worker חדש
+של gunicorn עולה מהר. ההתנהגות כשהספרייה חסרה זהה לייבוא הרגיל בפרויקט: הדפסת
+אזהרה והחזרת None.
+"""
+
+import importlib
+
+# שם המודול -> המודול (או None אם הייבוא נכשל)
+_modules = {}
+
+
+def optional_import(name, label=None):
+    """
+    מייבא מודול בשימוש הראשון ושומר אותו לקריאות הבאות
+
+    Args:
+        name (str): שם המודול המלא (למשל 'sklearn.cluster')
+        label (str): השם שמופיע באזהרה אם הייבוא נכשל (ברירת מחדל: name)
+
+    Returns:
+        module: המודול, או None אם הוא לא מותקן
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError as e:
+        print(f"Warning: {label or name} import failed: {e}")
+        module = None
+    _modules[name] = module
+    return module
+
+
+def preload(*names):
+    """
+    טוען מראש מודולים (למשל ב-thread ברקע אחרי העלייה), כדי שהבקשה הראשונה לא תחכה להם
+    """
+    for name in names:
+        optional_import(name)
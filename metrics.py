@@ -0,0 +1,340 @@
+"""
+מדדי ביצועים: זמן לכל שלב, בייטים נכנסים / יוצאים, פגיעות במטמונים ושגיאות upstream
+
+השלבים נמדדים עם stage('decode') / upstream('chat') סביב הקוד עצמו, ונאספים להיסטוגרמות
+ולמונים בזיכרון התהליך. /metrics מחזיר אותם בפורמט הטקסט של Prometheus (בלי תלות
+ב-prometheus_client). כל worker של gunicorn מדווח על עצמו.
+
+בתוך בקשה, השלבים נרשמים גם לבקשה הנוכחית (contextvar) - לכותרת Server-Timing.
+
+הגדרות (משתני סביבה):
+    METRICS_DISABLED=1   מכבה את המדידה - stage מחזיר context manager ריק, בלי מדידת זמן
+    SERVER_TIMING=1      מוסיף לתגובות כותרת Server-Timing עם זמני השלבים של הבקשה
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import nullcontext, contextmanager
+
+METRICS_ENABLED = os.getenv('METRICS_DISABLED', '').lower() not in ('1', 'true', 'yes')
+SERVER_TIMING_ENABLED = METRICS_ENABLED and os.getenv('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+# גבולות הדליים בשניות - מפענוח של מילישנייה ועד קריאה ארוכה ל-DALL-E
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# השלבים של הבקשה הנוכחית: רשימת (שם, שניות), או None מחוץ לבקשה
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+_NULL_STAGE = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    מונה מצטבר לכל צירוף של תוויות
+    """
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                     for key, value in items)
+        return lines
+
+
+class Histogram:
+    """
+    היסטוגרמה עם דליים קבועים לכל צירוף של תוויות
+    """
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # תוויות -> [ספירה לכל דלי (לא מצטברת), סכום, ספירה כוללת]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, (('le', _format_value(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key, (('le', '+Inf'),))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('poetic_stage_seconds', 'Time spent in each analysis stage', ('stage',))
+UPSTREAM_SECONDS = Histogram('poetic_upstream_seconds', 'Latency of OpenAI calls', ('call',))
+UPSTREAM_ERRORS = Counter('poetic_upstream_errors_total', 'Failed OpenAI calls', ('call',))
+HTTP_SECONDS = Histogram('poetic_http_request_seconds', 'Request latency until the response is returned',
+                         ('endpoint', 'method', 'status'))
+BYTES_IN = Counter('poetic_bytes_in_total', 'Bytes received (request bodies and downloads)', ('source',))
+BYTES_OUT = Counter('poetic_bytes_out_total', 'Bytes produced (responses and encoded artifacts)', ('kind',))
+
+_METRICS = [STAGE_SECONDS, UPSTREAM_SECONDS, UPSTREAM_ERRORS, HTTP_SECONDS, BYTES_IN, BYTES_OUT]
+
+# מטמונים שנקראים ברגע ה-scrape: שם -> פונקציה שמחזירה dict עם hits / misses / evictions
+_cache_collectors = {}
+
+
+def register_cache(name, stats):
+    """
+    רושם מטמון שהמונים שלו יופיעו ב-/metrics (נקראים רק ב-scrape, בלי עלות בנתיב החם)
+
+    Args:
+        name (str): שם המטמון בתווית cache
+        stats (callable): מחזירה dict עם hits / misses / evictions
+    """
+    _cache_collectors[name] = stats
+
+
+def _record(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """
+    מודד שלב: with stage('palette'): ...
+
+    Args:
+        name (str): שם השלב (תווית stage ושם ב-Server-Timing)
+
+    Returns:
+        context manager (ריק כשהמדידה כבויה)
+    """
+    if not METRICS_ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def record_stages(stages):
+    """
+    רושם שלבים שנמדדו במקום אחר (למשל בתהליך של מאגר הניתוחים)
+
+    Args:
+        stages (list): רשימת (שם, שניות)
+    """
+    for name, seconds in stages or ():
+        _record(name, seconds)
+
+
+@contextmanager
+def collect_stages():
+    """
+    אוסף את השלבים שרצים בתוך הבלוק לרשימה (בתהליך עובד, כדי להחזיר אותם לתהליך הראשי)
+
+        with collect_stages() as stages:
+            ...
+    """
+    stages = []
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+
+@contextmanager
+def upstream(call):
+    """
+    מודד קריאה ל-OpenAI: זמן, ושגיאה אם הבלוק זרק חריגה
+
+        with upstream('chat'):
+            client.chat.completions.create(...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe_upstream(call, time.perf_counter() - start, error=True)
+        raise
+    observe_upstream(call, time.perf_counter() - start)
+
+
+def observe_upstream(call, seconds, error=False):
+    """
+    רושם קריאה ל-OpenAI שנמדדה ידנית (למשל stream שנקרא בתוך generator)
+    """
+    if not METRICS_ENABLED:
+        return
+    UPSTREAM_SECONDS.observe(seconds, call=call)
+    if error:
+        UPSTREAM_ERRORS.inc(call=call)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((f'openai_{call}', seconds))
+
+
+def count_bytes_in(amount, source):
+    if METRICS_ENABLED and amount:
+        BYTES_IN.inc(amount, source=source)
+
+
+def count_bytes_out(amount, kind):
+    if METRICS_ENABLED and amount:
+        BYTES_OUT.inc(amount, kind=kind)
+
+
+def begin_request():
+    """
+    מתחיל לאסוף את השלבים של בקשה
+
+    Returns:
+        Token: ל-end_request, או None כשהמדידה כבויה
+    """
+    if not METRICS_ENABLED:
+        return None
+    return _request_stages.set([])
+
+
+def end_request(token):
+    if token is None:
+        return
+    try:
+        _request_stages.reset(token)
+    except ValueError:
+        # הבקשה הסתיימה ב-context אחר (למשל אחרי תגובה זורמת) - רק מנתקים את הרשימה
+        _request_stages.set(None)
+
+
+def request_stages():
+    """
+    Returns:
+        list: (שם, שניות) של השלבים שנמדדו עד עכשיו בבקשה הנוכחית
+    """
+    return list(_request_stages.get() or ())
+
+
+def server_timing(stages, total=None):
+    """
+    בונה ערך לכותרת Server-Timing - שלב שרץ כמה פעמים מופיע פעם אחת עם הסכום
+
+    Args:
+        stages (list): (שם, שניות)
+        total (float): זמן הבקשה כולה בשניות (אופציונלי)
+
+    Returns:
+        str: למשל 'decode;dur=12.3, palette;dur=40.1, total;dur=60.0'
+    """
+    durations = {}
+    for name, seconds in stages:
+        durations[name] = durations.get(name, 0.0) + seconds
+    if total is not None:
+        durations['total'] = total
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in durations.items())
+
+
+def _cache_lines():
+    lines = []
+    samples = {'hits': [], 'misses': [], 'evictions': []}
+    for name, stats in sorted(_cache_collectors.items()):
+        try:
+            values = stats()
+        except Exception:
+            continue
+        for field in samples:
+            if field in values:
+                samples[field].append((name, values[field]))
+    for field, values in samples.items():
+        metric = f'poetic_cache_{field}_total'
+        lines.append(f'# HELP {metric} Cache {field} since the worker started')
+        lines.append(f'# TYPE {metric} counter')
+        lines.extend(f'{metric}{{cache="{_escape(name)}"}} {value}' for name, value in values)
+    return lines
+
+
+def render():
+    """
+    Returns:
+        str: כל המדדים בפורמט הטקסט של Prometheus
+    """
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.extend(_cache_lines())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,161 @@
+"""
+מנועי חילוץ פלטה - כולם מקבלים מערך פיקסלים ומחזירים את אותה צורה
+
+    kmeans      - KMeans מלא של scikit-learn (ברירת המחדל, ההתנהגות המקורית)
+    minibatch   - MiniBatchKMeans - קירוב מהיר של KMeans
+    median_cut  - חלוקת חציון של Pillow
+    octree      - קוונטיזציית octree מהירה של Pillow
+    histogram   - KMeans משוקלל על היסטוגרמת צבעים דחוסה (32 ערכים לערוץ)
+"""
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+try:
+    from PIL import Image
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+
+# scikit-learn נטען רק בשימוש הראשון (ייבוא של כשנייה)
+from lazy_imports import optional_import
+
+PALETTE_ENGINES = ('kmeans', 'minibatch', 'median_cut', 'octree', 'histogram')
+DEFAULT_PALETTE_ENGINE = 'kmeans'
+
+# מספר הביטים לערוץ בהיסטוגרמה הדחוסה (5 ביטים = 32 תאים לערוץ)
+HISTOGRAM_BITS = 5
+
+
+def _require_sklearn():
+    cluster = optional_import('sklearn.cluster', 'sklearn')
+    if cluster is None:
+        raise RuntimeError('sklearn library not available for palette extraction')
+    return cluster
+
+
+def _kmeans(pixels, num_colors):
+    kmeans = _require_sklearn().KMeans(n_clusters=num_colors, n_init='auto', random_state=42)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_
+
+
+def _minibatch(pixels, num_colors):
+    kmeans = _require_sklearn().MiniBatchKMeans(n_clusters=num_colors, n_init='auto', random_state=42, batch_size=2048)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_
+
+
+def _pillow_quantize(pixels, num_colors, method):
+    if Image is None:
+        raise RuntimeError('PIL library not available for palette extraction')
+    strip = Image.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8).reshape(1, -1, 3))
+    quantized = strip.quantize(colors=num_colors, method=method)
+    palette = np.array(quantized.getpalette()[:3 * 256], dtype=np.int64).reshape(-1, 3)
+    used = sorted(index for _, index in quantized.getcolors(maxcolors=256))
+    return palette[used]
+
+
+def _median_cut(pixels, num_colors):
+    return _pillow_quantize(pixels, num_colors, Image.Quantize.MEDIANCUT)
+
+
+def _octree(pixels, num_colors):
+    return _pillow_quantize(pixels, num_colors, Image.Quantize.FASTOCTREE)
+
+
+def color_histogram(pixels, bits=HISTOGRAM_BITS):
+    """
+    דוחס את הפיקסלים להיסטוגרמה תלת-ממדית
+
+    Args:
+        pixels (np.ndarray): מערך (N, 3) מסוג uint8
+        bits (int): מספר ביטים לערוץ
+
+    Returns:
+        tuple: (צבע ממוצע לכל תא מאוכלס (M, 3), מספר הפיקסלים בכל תא (M,))
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int64)
+    bins = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    size = 1 << (3 * bits)
+
+    counts = np.bincount(bins, minlength=size)
+    occupied = np.nonzero(counts)[0]
+    means = np.stack([
+        np.bincount(bins, weights=pixels[:, ch], minlength=size)[occupied] for ch in range(3)
+    ], axis=1) / counts[occupied, None]
+    return means, counts[occupied]
+
+
+def _histogram(pixels, num_colors):
+    cluster = _require_sklearn()
+    means, counts = color_histogram(pixels)
+    kmeans = cluster.KMeans(n_clusters=min(num_colors, len(means)), n_init='auto', random_state=42)
+    kmeans.fit(means, sample_weight=counts)
+    return kmeans.cluster_centers_
+
+
+_ENGINES = {
+    'kmeans': _kmeans,
+    'minibatch': _minibatch,
+    'median_cut': _median_cut,
+    'octree': _octree,
+    'histogram': _histogram,
+}
+
+
+def extract_palette(pixels, num_colors, engine=DEFAULT_PALETTE_ENGINE):
+    """
+    מחלץ פלטת צבעים ממערך פיקסלים
+
+    Args:
+        pixels (np.ndarray): מערך (N, 3) של פיקסלים ב-RGB
+        num_colors (int): מספר הצבעים לחילוץ
+        engine (str): שם המנוע (ראו PALETTE_ENGINES)
+
+    Returns:
+        np.ndarray: מערך (K, 3) של צבעים שלמים, K <= num_colors
+    """
+    if engine not in _ENGINES:
+        raise ValueError(f"מנוע פלטה לא מוכר: {engine}. אפשרויות: {', '.join(PALETTE_ENGINES)}")
+    centers = _ENGINES[engine](pixels, num_colors)
+    return np.asarray(centers).astype(int)
+
+
+def assign_pixels(pixels, palette):
+    """
+    משייך כל פיקסל לצבע הקרוב ביותר בפלטה
+
+    Args:
+        pixels (np.ndarray): מערך (N, 3)
+        palette (np.ndarray): מערך (K, 3)
+
+    Returns:
+        np.ndarray: מערך (N,) של אינדקסים בפלטה
+    """
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    palette = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+    # |p - c|² = |c|² - 2p·c + |p|² - האיבר האחרון זהה לכל הצבעים ולא משפיע על argmin
+    return ((palette ** 2).sum(axis=1) - 2 * pixels @ palette.T).argmin(axis=1)
+
+
+def palette_error(pixels, palette):
+    """
+    מדד איכות: מרחק RGB ממוצע של כל פיקסל לצבע הקרוב ביותר בפלטה (נמוך = טוב)
+
+    Args:
+        pixels (np.ndarray): מערך (N, 3)
+        palette (np.ndarray): מערך (K, 3)
+
+    Returns:
+        float: המרחק הממוצע
+    """
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 1, 3)
+    palette = np.asarray(palette, dtype=np.float32).reshape(1, -1, 3)
+    return float(np.sqrt(((pixels - palette) ** 2).sum(axis=2)).min(axis=1).mean())
@@ -0,0 +1,146 @@
+"""
+דגימת פיקסלים בתקציב קבוע לחילוץ פלטה
+
+1. קריאת ה-header בלבד (גודל ופורמט) בלי לפענח פיקסלים.
+2. פענוח ישירות לרזולוציה נמוכה (draft של JPEG, או reduce לפורמטים אחרים).
+3. דגימה שכבתית (stratified) ששומרת על יחס הרוחב-גובה, עד התקציב שנקבע.
+
+כך תמונת טלפון גדולה עולה בערך כמו תמונה ממוזערת.
+"""
+
+import os
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+from image_source import ImageSource
+from metrics import stage
+
+# 22,500 פיקסלים - כמו ה-150x150 הקודם
+DEFAULT_PIXEL_BUDGET = int(os.getenv('PIXEL_SAMPLE_BUDGET', 150 * 150))
+
+# תקרה לתקציב שמגיע מבקשה - 512x512, מעבר לזה האשכול עולה יותר מהפענוח המלא שהדגימה חוסכת
+MAX_PIXEL_BUDGET = int(os.getenv('PIXEL_SAMPLE_MAX_BUDGET', 512 * 512))
+
+# כמה פיקסלים מפוענחים לכל פיקסל נדגם - מרווח לבחירה בתוך כל תא
+DECODE_OVERSAMPLE = 4
+
+
+def _grid_shape(width, height, budget):
+    """
+    מחשב רשת תאים ששומרת על יחס הרוחב-גובה ומכילה עד budget תאים
+    """
+    rows = max(1, int(np.sqrt(budget * height / width)))
+    cols = max(1, min(width, budget // rows))
+    return min(rows, height), cols
+
+
+def stratified_sample(rgb, budget, seed=42):
+    """
+    בוחר פיקסל אקראי אחד מכל תא ברשת אחידה על פני התמונה
+
+    Args:
+        rgb (np.ndarray): מערך (H, W, 3)
+        budget (int): מספר הפיקסלים המקסימלי
+        seed (int): זרע - אותה תמונה נותנת אותה דגימה
+
+    Returns:
+        np.ndarray: מערך (N, 3) עם N <= budget
+    """
+    height, width = rgb.shape[:2]
+    if height * width <= budget:
+        return rgb.reshape(-1, 3)
+
+    rows, cols = _grid_shape(width, height, budget)
+    rng = np.random.RandomState(seed)
+    row_edges = np.linspace(0, height, rows + 1)
+    col_edges = np.linspace(0, width, cols + 1)
+
+    ys = row_edges[:-1, None] + rng.random_sample((rows, cols)) * np.diff(row_edges)[:, None]
+    xs = col_edges[None, :-1] + rng.random_sample((rows, cols)) * np.diff(col_edges)[None, :]
+    ys = np.minimum(ys.astype(np.intp), height - 1)
+    xs = np.minimum(xs.astype(np.intp), width - 1)
+    return rgb[ys.ravel(), xs.ravel()]
+
+
+def decode_reduced(source, budget):
+    """
+    מפענח את התמונה ברזולוציה המינימלית שעדיין מספיקה לתקציב
+
+    Args:
+        source (ImageSource): מקור התמונה
+        budget (int): מספר הפיקסלים שיידגמו
+
+    Returns:
+        np.ndarray: מערך RGB (H, W, 3) מוקטן, שומר על יחס הרוחב-גובה
+    """
+    # אם התמונה כבר פוענחה במלואה (למשל לניתוח קווי מתאר) - משתמשים בה
+    if source.is_decoded:
+        return source.rgb()
+
+    img = source.open()
+    width, height = img.size
+    target_pixels = budget * DECODE_OVERSAMPLE
+    scale = (width * height / target_pixels) ** 0.5
+
+    with stage('decode'):
+        if scale > 1:
+            target = (max(1, int(width / scale)), max(1, int(height / scale)))
+            # JPEG: פענוח DCT מוקטן (1/2, 1/4, 1/8) - לא מפענחים את הרזולוציה המלאה בכלל
+            img.draft('RGB', target)
+            img = img.convert('RGB')
+            factor = int(min(img.size[0] / target[0], img.size[1] / target[1]))
+            if factor >= 2:
+                img = img.reduce(factor)
+        else:
+            img = img.convert('RGB')
+
+        return np.asarray(img)
+
+
+def sample_pixels(image_data, budget=DEFAULT_PIXEL_BUDGET, seed=42):
+    """
+    מחזיר דגימת פיקסלים מייצגת בתקציב קבוע
+
+    Args:
+        image_data (str/bytes/ImageSource): מקור התמונה
+        budget (int): מספר הפיקסלים המקסימלי
+        seed (int): זרע לדגימה
+
+    Returns:
+        np.ndarray: מערך (N, 3) מסוג uint8
+    """
+    source = ImageSource.from_any(image_data)
+    rgb = decode_reduced(source, budget)
+    with stage('sample'):
+        return stratified_sample(rgb, budget, seed)
+
+
+def pooled_sample(sources, budget=DEFAULT_PIXEL_BUDGET, weights=None, seed=42):
+    """
+    דגימה משותפת מכמה תמונות לאשכול אחד: כל תמונה תורמת חלק מהתקציב לפי המשקל שלה,
+    בלי קשר לרזולוציה שלה
+
+    Args:
+        sources (list): מקורות התמונות (str/bytes/ImageSource)
+        budget (int): מספר הפיקסלים המקסימלי בדגימה המשותפת
+        weights (list): משקל לכל תמונה (ברירת מחדל: שווה)
+        seed (int): זרע לדגימה
+
+    Returns:
+        tuple: (מערך פיקסלים (N, 3) מסוג uint8, מערך (N,) עם אינדקס התמונה של כל פיקסל)
+    """
+    if weights is None:
+        weights = [1.0] * len(sources)
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) != len(sources) or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError('משקלי הדגימה חייבים להיות אי-שליליים, אחד לכל תמונה')
+
+    budgets = np.maximum(1, np.floor(budget * weights / weights.sum()).astype(int))
+    samples = [sample_pixels(source, int(part), seed) for source, part in zip(sources, budgets)]
+    labels = np.repeat(np.arange(len(samples)), [len(sample) for sample in samples])
+    return np.concatenate(samples), labels
@@ -0,0 +1,231 @@
+"""
+רינדור תצוגות דוח הצבעים עם NumPy/Pillow - ללא matplotlib
+
+פסים, פלטה, עוגה וגלגל צבעים מצוירים ישירות למערך פיקסלים (מיפוי זווית/רדיוס
+לכל פיקסל בבת אחת, במקום pcolormesh לכל צבע), והתוויות נכתבות עם ImageDraw.
+הרזולוציה היא פרמטר (scale), וכל תצוגה עצמאית - אפשר לרנדר אותן במקביל.
+
+matplotlib נשאר זמין ב-color_utils כ-backend אופציונלי לאיכות הדפסה.
+"""
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+    ImageDraw = None
+    ImageFont = None
+
+from gradient_renderer import render_gradient
+from artifact_encoder import encode_image
+from metrics import stage
+
+REPORT_VIEWS = ('bars', 'palette', 'pie', 'wheel', 'gradient')
+REPORT_BACKENDS = ('raster', 'matplotlib')
+DEFAULT_REPORT_BACKEND = 'raster'
+
+# גודל כל תצוגה ב-scale=1 (רוחב, גובה)
+VIEW_SIZES = {
+    'bars': (1200, 360),
+    'palette': (1200, 400),
+    'pie': (900, 900),
+    'wheel': (900, 900),
+    'gradient': (1200, 300),
+}
+
+WHITE = (255, 255, 255)
+
+
+def _hex(color):
+    return f'#{int(color[0]):02x}{int(color[1]):02x}{int(color[2]):02x}'
+
+
+def _text_color(color):
+    # אותו כלל כמו בגרפים של matplotlib: טקסט לבן על צבע כהה
+    return WHITE if sum(color) / 3 < 128 else (0, 0, 0)
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow ישן - גופן bitmap בגודל קבוע
+        return ImageFont.load_default()
+
+
+def _size(view, scale):
+    width, height = VIEW_SIZES[view]
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def _palette_array(colors):
+    return np.clip(np.asarray(colors, dtype=np.float32).reshape(-1, 3), 0, 255)
+
+
+def _polar_grid(width, height, radius_scale):
+    """
+    רדיוס וזווית של כל פיקסל ביחס למרכז התמונה
+
+    Returns:
+        tuple: (רדיוס ביחידות של radius_scale, זווית 0..2π נגד כיוון השעון ממזרח)
+    """
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    dx = x + 0.5 - width / 2
+    dy = height / 2 - (y + 0.5)
+    return np.hypot(dx, dy) / radius_scale, np.mod(np.arctan2(dy, dx), 2 * np.pi)
+
+
+def _compose(palette, index, coverage):
+    """
+    צובע כל פיקסל בצבע של הפלח שלו, מעורבב עם לבן לפי הכיסוי (החלקת קצוות)
+    """
+    coverage = coverage[..., None]
+    pixels = palette[index] * coverage + np.float32(255) * (1 - coverage)
+    return Image.fromarray(np.rint(pixels).astype(np.uint8))
+
+
+def _label(draw, xy, text, fill, size):
+    draw.text(xy, text, fill=fill, font=_font(size), anchor='mm')
+
+
+def render_bars(colors, width=1200, height=360):
+    """
+    פס רציף של הצבעים עם קוד HEX על כל צבע
+
+    Returns:
+        PIL.Image: תמונת RGB
+    """
+    palette = _palette_array(colors)
+    count = len(palette)
+    columns = np.arange(width) * count // width
+    img = Image.fromarray(np.ascontiguousarray(
+        np.broadcast_to(palette[columns].astype(np.uint8), (height, width, 3))))
+
+    draw = ImageDraw.Draw(img)
+    for i, color in enumerate(colors):
+        _label(draw, ((i + 0.5) * width / count, height / 2), _hex(color), _text_color(color), max(8, height // 18))
+    return img
+
+
+def render_palette(colors, width=1200, height=400):
+    """
+    דוגמיות צבע נפרדות על רקע לבן, עם קוד HEX על כל דוגמית
+
+    Returns:
+        PIL.Image: תמונת RGB
+    """
+    count = len(colors)
+    margin = max(1, width // (count * 20))
+    cell = width / count
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    top, bottom = height // 8, height - height // 8
+    for i, color in enumerate(_palette_array(colors).astype(np.uint8)):
+        pixels[top:bottom, int(i * cell) + margin:int((i + 1) * cell) - margin] = color
+    img = Image.fromarray(pixels)
+
+    draw = ImageDraw.Draw(img)
+    for i, color in enumerate(colors):
+        _label(draw, ((i + 0.5) * cell, height / 2), _hex(color), _text_color(color),
+               max(8, min(int(cell) // 6, height // 14)))
+    return img
+
+
+def render_pie(colors, width=900, height=900):
+    """
+    גרף עוגה עם פלח שווה לכל צבע (כמו ax.pie עם startangle=90), אחוז בתוך הפלח וקוד HEX מחוץ לו
+
+    Returns:
+        PIL.Image: תמונת RGB
+    """
+    palette = _palette_array(colors)
+    count = len(palette)
+    radius = min(width, height) * 0.36
+    distance, angle = _polar_grid(width, height, radius)
+    # הפלח הראשון מתחיל למעלה (90°) וממשיך נגד כיוון השעון
+    index = (np.mod(angle - np.pi / 2, 2 * np.pi) * count / (2 * np.pi)).astype(np.intp) % count
+    coverage = np.clip((1 - distance) * radius + 0.5, 0, 1)
+    img = _compose(palette, index, coverage)
+
+    draw = ImageDraw.Draw(img)
+    size = max(8, int(radius) // 14)
+    for i, color in enumerate(colors):
+        middle = np.pi / 2 + (i + 0.5) * 2 * np.pi / count
+        for factor, text, fill in ((0.6, f'{100 / count:.1f}%', WHITE), (1.15, _hex(color), (0, 0, 0))):
+            _label(draw, (width / 2 + np.cos(middle) * radius * factor, height / 2 - np.sin(middle) * radius * factor),
+                   text, fill, size)
+    return img
+
+
+def render_wheel(colors, width=900, height=900):
+    """
+    גלגל צבעים: טבעת (0.8-1.0 מהרדיוס) עם קשת לכל צבע, וקוד HEX בפנים
+
+    Returns:
+        PIL.Image: תמונת RGB
+    """
+    palette = _palette_array(colors)
+    count = len(palette)
+    # כמו ylim=1.2 בגרף הקוטבי - שוליים סביב הטבעת
+    radius = min(width, height) / 2 / 1.2
+    distance, angle = _polar_grid(width, height, radius)
+    index = (angle * count / (2 * np.pi)).astype(np.intp) % count
+    coverage = np.clip((1.0 - distance) * radius + 0.5, 0, 1) * np.clip((distance - 0.8) * radius + 0.5, 0, 1)
+    img = _compose(palette, index, coverage)
+
+    draw = ImageDraw.Draw(img)
+    size = max(8, int(radius) // 16)
+    for i, color in enumerate(colors):
+        middle = (i + 0.5) * 2 * np.pi / count
+        _label(draw, (width / 2 + np.cos(middle) * radius * 0.6, height / 2 - np.sin(middle) * radius * 0.6),
+               _hex(color), (0, 0, 0), size)
+    return img
+
+
+def render_gradient_view(colors, width=1200, height=300, space='rgb'):
+    return Image.fromarray(np.ascontiguousarray(render_gradient(colors, width, height, space)))
+
+
+_RENDERERS = {
+    'bars': render_bars,
+    'palette': render_palette,
+    'pie': render_pie,
+    'wheel': render_wheel,
+    'gradient': render_gradient_view,
+}
+
+
+def render_view(view, colors, scale=1.0):
+    """
+    מרנדר תצוגה אחת של הדוח
+
+    Args:
+        view (str): אחת מ-REPORT_VIEWS
+        colors (list): רשימת צבעים ב-RGB
+        scale (float): פקטור הרזולוציה ביחס ל-VIEW_SIZES (2.0 - כפול בכל ציר)
+
+    Returns:
+        PIL.Image: תמונת RGB
+    """
+    if np is None or Image is None:
+        raise RuntimeError('numpy / PIL libraries not available for report rendering')
+    if view not in _RENDERERS:
+        raise ValueError(f"תצוגה לא מוכרת: {view}. אפשרויות: {', '.join(REPORT_VIEWS)}")
+    if not len(colors):
+        raise ValueError('לא נשלחו צבעים')
+    with stage('render_raster'):
+        return _RENDERERS[view](colors, *_size(view, scale))
+
+
+def render_view_png(view, colors, scale=1.0):
+    """
+    Returns:
+        bytes: התצוגה כקובץ PNG
+    """
+    return encode_image(render_view(view, colors, scale))
@@ -0,0 +1,346 @@
+"""
+מאגר תוכן לפי סשן של לקוח - במקום מילון session_data גלובלי אחד לכל המשתמשים
+
+כל לקוח מזוהה בעוגייה (SESSION_COOKIE). לכל סשן יש תקציב זיכרון משלו, ולכל המאגר
+תקציב כולל: כשסשן חורג - הפריטים הישנים שלו נמחקים; כשהמאגר חורג - הסשנים שלא
+נגעו בהם הכי הרבה זמן נמחקים (LRU). סשן שלא היה בשימוש יותר מ-SESSION_TTL פג.
+ערכים גדולים (תמונות base64) אפשר לשמור בקובץ זמני במקום בזיכרון.
+
+הגדרות (משתני סביבה):
+    SESSION_MAX_BYTES        תקציב זיכרון לסשן (ברירת מחדל: 32MB)
+    SESSION_STORE_MAX_BYTES  תקציב זיכרון לכל הסשנים (ברירת מחדל: 256MB)
+    SESSION_TTL              זמן חוסר פעילות עד שסשן פג, בשניות (ברירת מחדל: 6 שעות)
+    SESSION_SPILL_BYTES      ערך מחרוזת גדול מזה נשמר לדיסק (ברירת מחדל: 0 - כבוי)
+    SESSION_DISK_MAX_BYTES   נפח מקסימלי לקבצים על הדיסק (ברירת מחדל: 1GB)
+"""
+
+import os
+import re
+import time
+import atexit
+import shutil
+import secrets
+import tempfile
+import threading
+import contextvars
+from collections import OrderedDict, deque
+
+from analysis_cache import estimate_size
+
+SESSION_KINDS = ('images', 'texts', 'gradients', 'edge_images')
+SESSION_COOKIE = 'poetic_session'
+DEFAULT_SESSION = 'default'
+
+_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+_current_session = contextvars.ContextVar('session_id', default=DEFAULT_SESSION)
+
+
+def new_session_id():
+    return secrets.token_urlsafe(24)
+
+
+def resolve_session_id(cookie_value):
+    """
+    מחזיר את מזהה הסשן מהעוגייה, או מזהה חדש אם אין עוגייה תקינה
+
+    Returns:
+        tuple: (מזהה, האם נוצר עכשיו)
+    """
+    if cookie_value and _SESSION_ID_PATTERN.match(cookie_value):
+        return cookie_value, False
+    return new_session_id(), True
+
+
+def current_session_id():
+    """
+    הסשן של הקוד שרץ עכשיו (נקבע לכל בקשה, ומועבר ל-threads עם run_in_session)
+    """
+    return _current_session.get()
+
+
+def bind_session(session_id):
+    """
+    Returns:
+        Token: להחזרת הסשן הקודם עם unbind_session
+    """
+    return _current_session.set(session_id)
+
+
+def unbind_session(token):
+    _current_session.reset(token)
+
+
+def run_in_session(session_id, func, *args, **kwargs):
+    """
+    מריץ פונקציה (למשל ב-thread של מאגר עובדים) בהקשר של סשן מסוים
+    """
+    token = _current_session.set(session_id)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current_session.reset(token)
+
+
+class _Spilled:
+    """
+    ערך שנשמר בקובץ על הדיסק - נטען בחזרה רק כשקוראים את התוכן
+    """
+
+    __slots__ = ('path', 'size')
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+
+class _Session:
+    __slots__ = ('entries', 'counters', 'seq', 'bytes', 'disk_bytes', 'last_access')
+
+    def __init__(self):
+        # (kind, item, size) לפי סדר ההוספה - הפריט הישן ביותר נמחק ראשון
+        self.entries = deque()
+        self.counters = dict.fromkeys(SESSION_KINDS, 0)
+        # מספר רץ על פני כל הסוגים - הסמן של /get-all-content
+        self.seq = 0
+        self.bytes = 0
+        self.disk_bytes = 0
+        self.last_access = time.monotonic()
+
+
+class SessionStore:
+    """
+    תוכן הסשנים עם תקציב זיכרון לסשן ולמאגר, פינוי LRU ותפוגה לפי TTL
+    """
+
+    def __init__(self, max_session_bytes=32 * 1024 * 1024, max_total_bytes=256 * 1024 * 1024,
+                 ttl=6 * 60 * 60, spill_bytes=0, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl = ttl
+        self.spill_bytes = spill_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.evicted_items = 0
+        self.evicted_sessions = 0
+        self.expired_sessions = 0
+        self.spilled_values = 0
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._spill_dir = None
+        self._lock = threading.RLock()
+
+    def _get_spill_dir(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='poetic-sessions-')
+            atexit.register(shutil.rmtree, self._spill_dir, True)
+        return self._spill_dir
+
+    def _spill(self, item):
+        """
+        מעביר לדיסק ערכי מחרוזת גדולים מהסף
+
+        Returns:
+            int: מספר הבייטים שנכתבו
+        """
+        written = 0
+        for key, value in item.items():
+            if isinstance(value, str) and len(value) > self.spill_bytes:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self._get_spill_dir(),
+                                                 delete=False) as f:
+                    f.write(value)
+                item[key] = _Spilled(f.name, len(value))
+                written += len(value)
+                self.spilled_values += 1
+        return written
+
+    @staticmethod
+    def _disk_size(item):
+        return sum(v.size for v in item.values() if isinstance(v, _Spilled))
+
+    @staticmethod
+    def _remove_files(item):
+        for value in item.values():
+            if isinstance(value, _Spilled):
+                try:
+                    os.remove(value.path)
+                except OSError:
+                    pass
+
+    def _drop_oldest(self, session):
+        _, item, size = session.entries.popleft()
+        disk = self._disk_size(item)
+        self._remove_files(item)
+        session.bytes -= size
+        session.disk_bytes -= disk
+        self._bytes -= size
+        self._disk_bytes -= disk
+        self.evicted_items += 1
+
+    def _drop_session(self, session_id):
+        session = self._sessions.pop(session_id)
+        for _, item, _ in session.entries:
+            self._remove_files(item)
+        self._bytes -= session.bytes
+        self._disk_bytes -= session.disk_bytes
+
+    def _expire(self, now):
+        if not self.ttl:
+            return
+        # הסשנים ממוינים לפי זמן השימוש האחרון - הישנים בהתחלה
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl:
+                break
+            self._drop_session(session_id)
+            self.expired_sessions += 1
+
+    def _touch(self, session_id, create=False):
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session()
+        self._sessions.move_to_end(session_id)
+        session.last_access = now
+        return session
+
+    def append(self, session_id, kind, item):
+        """
+        מוסיף פריט לסשן - id, timestamp ו-seq נקבעים כאן ולא חוזרים גם אחרי פינוי
+
+        Args:
+            session_id (str): מזהה הסשן
+            kind (str): אחד מ-SESSION_KINDS
+            item (dict): הפריט
+
+        Returns:
+            dict: הפריט כפי שנשמר (עם id ו-timestamp)
+        """
+        if kind not in SESSION_KINDS:
+            raise ValueError(f"סוג תוכן לא מוכר: {kind}")
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            item = dict(item)
+            item['id'] = item['timestamp'] = session.counters[kind]
+            session.counters[kind] += 1
+            session.seq += 1
+            item['seq'] = session.seq
+            stored = dict(item)
+
+            disk = self._spill(item) if self.spill_bytes else 0
+            size = estimate_size({k: v for k, v in item.items() if not isinstance(v, _Spilled)})
+            session.entries.append((kind, item, size))
+            session.bytes += size
+            session.disk_bytes += disk
+            self._bytes += size
+            self._disk_bytes += disk
+
+            # תקציב הסשן - מוחקים את הפריטים הישנים שלו
+            while session.bytes > self.max_session_bytes and len(session.entries) > 1:
+                self._drop_oldest(session)
+
+            # תקציב המאגר - מוחקים סשנים שלא היו בשימוש הכי הרבה זמן
+            while (self._bytes > self.max_total_bytes or self._disk_bytes > self.max_disk_bytes) \
+                    and len(self._sessions) > 1:
+                oldest = next(iter(self._sessions))
+                self._drop_session(oldest)
+                self.evicted_sessions += 1
+            return stored
+
+    def get(self, session_id):
+        """
+        מחזיר את כל התוכן של סשן, מחולק לפי סוג (ערכים מהדיסק נטענים בחזרה)
+
+        Returns:
+            dict: {'images': [...], 'texts': [...], 'gradients': [...], 'edge_images': [...]}
+        """
+        content = self.page(session_id)
+        return {kind: content[kind] for kind in SESSION_KINDS}
+
+    def page(self, session_id, since=0, limit=None, kinds=SESSION_KINDS):
+        """
+        מחזיר עמוד של תוכן הסשן - רק פריטים שנוספו אחרי since, לפי סדר ההוספה
+
+        Args:
+            session_id (str): מזהה הסשן
+            since (int): הסמן מהעמוד הקודם (seq של הפריט האחרון שהתקבל), 0 - מההתחלה
+            limit (int): מספר הפריטים המקסימלי בעמוד (None - הכל)
+            kinds (tuple): סוגי התוכן שנכללים
+
+        Returns:
+            dict: הפריטים לפי סוג, ו-'cursor' / 'has_more' לעמוד הבא
+        """
+        content = {kind: [] for kind in SESSION_KINDS}
+        with self._lock:
+            session = self._touch(session_id)
+            entries = [entry for entry in (session.entries if session is not None else ())
+                       if entry[1]['seq'] > since and entry[0] in kinds]
+        has_more = limit is not None and len(entries) > limit
+        if has_more:
+            entries = entries[:limit]
+
+        for kind, item, _ in entries:
+            loaded = {}
+            for key, value in item.items():
+                if isinstance(value, _Spilled):
+                    try:
+                        value = value.load()
+                    except OSError:
+                        # הקובץ נמחק בפינוי שרץ במקביל
+                        value = ''
+                loaded[key] = value
+            content[kind].append(loaded)
+
+        content['cursor'] = entries[-1][1]['seq'] if entries else since
+        content['has_more'] = has_more
+        return content
+
+    def referenced_hashes(self):
+        """
+        Returns:
+            set: ה-hashes בשדות '<שם>_hash' של כל הפריטים - blobs שהסשנים עוד מציגים
+        """
+        with self._lock:
+            return {value for session in self._sessions.values() for _, item, _ in session.entries
+                    for key, value in item.items() if key.endswith('_hash') and isinstance(value, str)}
+
+    def clear(self, session_id=None):
+        with self._lock:
+            for sid in ([session_id] if session_id is not None else list(self._sessions)):
+                if sid in self._sessions:
+                    self._drop_session(sid)
+
+    def stats(self):
+        """
+        Returns:
+            dict: מספר סשנים, נפח בזיכרון ובדיסק, מוני פינוי ותפוגה
+        """
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_total_bytes,
+                'max_session_bytes': self.max_session_bytes,
+                'disk_bytes': self._disk_bytes,
+                'ttl': self.ttl,
+                'evicted_items': self.evicted_items,
+                'evicted_sessions': self.evicted_sessions,
+                'expired_sessions': self.expired_sessions,
+                'spilled_values': self.spilled_values,
+            }
+
+
+# המאגר המשותף של app.py / asgi_app.py
+session_store = SessionStore(
+    max_session_bytes=int(os.getenv('SESSION_MAX_BYTES', 32 * 1024 * 1024)),
+    max_total_bytes=int(os.getenv('SESSION_STORE_MAX_BYTES', 256 * 1024 * 1024)),
+    ttl=float(os.getenv('SESSION_TTL', 6 * 60 * 60)),
+    spill_bytes=int(os.getenv('SESSION_SPILL_BYTES', 0)),
+    max_disk_bytes=int(os.getenv('SESSION_DISK_MAX_BYTES', 1024 * 1024 * 1024)),
+)
@@ -8,6 +8,8 @@ import numpy as np
 from openai import OpenAI
 from sklearn.cluster import KMeans
 from collections import Counter
+from edge_engine import compute_edge_map
+from artifact_encoder import encode_image, encode_edge_map, to_data_url
 
 # Custom CSS to match the original design
 st.markdown("""
@@ -246,7 +248,7 @@ def analyze_image_colors(image_data, num_colors=6):
         pixels = img_array.reshape(-1, 3)
         
         # Use K-means to find dominant colors
-        kmeans = KMeans(n_clusters=num_colors, random_state=42)
+        kmeans = KMeans(n_clusters=num_colors, n_init='auto', random_state=42)
         kmeans.fit(pixels)
         
         # Get colors and their counts
@@ -263,10 +265,8 @@ def analyze_image_colors(image_data, num_colors=6):
         # Create gradient image
         gradient_img = create_gradient_image(colors_rgb)
         
-        # Convert gradient to base64
-        buffered = io.BytesIO()
-        gradient_img.save(buffered, format="PNG")
-        gradient_base64 = base64.b64encode(buffered.getvalue()).decode()
+        # Encode gradient in memory
+        gradient_url = to_data_url(encode_image(gradient_img))
         
         # Convert colors to hex
         colors_hex = [f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}" for color in colors_rgb]
@@ -282,7 +282,7 @@ def analyze_image_colors(image_data, num_colors=6):
             'colors_hex': colors_hex,
             'descriptions': descriptions,
             'num_colors': len(colors_rgb),
-            'gradient_image': f"data:image/png;base64,{gradient_base64}"
+            'gradient_image': gradient_url
         }
         
     except Exception as e:
@@ -320,29 +320,13 @@ def analyze_image_edges(image_data):
         # Convert to grayscale
         gray_image = image.convert('L')
         
-        # Simple edge detection using PIL
-        # Create a new image with edge detection
-        edge_image = Image.new('L', gray_image.size)
-        edge_pixels = edge_image.load()
-        gray_pixels = gray_image.load()
+        # Vectorized edge detection (shared engine)
+        edges = compute_edge_map(np.array(gray_image))
         
         width, height = gray_image.size
         
-        for x in range(1, width - 1):
-            for y in range(1, height - 1):
-                # Simple Sobel-like edge detection
-                gx = (gray_pixels[x+1, y] - gray_pixels[x-1, y]) / 2
-                gy = (gray_pixels[x, y+1] - gray_pixels[x, y-1]) / 2
-                magnitude = int(min(255, (gx**2 + gy**2)**0.5))
-                edge_pixels[x, y] = magnitude
-        
-        # Convert to base64
-        buffered = io.BytesIO()
-        edge_image.save(buffered, format="PNG")
-        edge_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
         return {
-            'edge_image': f"data:image/png;base64,{edge_base64}",
+            'edge_image': to_data_url(encode_edge_map(edges)),
             'width': width,
             'height': height
         }
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import base64
+from io import BytesIO
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+from PIL import Image
+
+import asgi_app
+from session_store import SESSION_COOKIE
+
+
+def create_test_png():
+    """יוצר PNG קטן עם רעש"""
+    buffer = BytesIO()
+    Image.fromarray(np.random.RandomState(0).randint(0, 256, (32, 32, 3), dtype=np.uint8)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FakeCompletions:
+    """מחליף את chat.completions של AsyncOpenAI - מחזיר תשובה קבועה וסופר קריאות"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(0)
+        message = SimpleNamespace(content=self.text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def run_requests(requests):
+    """
+    מריץ את asgi_app.app דרך httpx.ASGITransport עם לקוח אחד (העוגיות נשמרות בין הבקשות)
+
+    Args:
+        requests (callable): async function שמקבלת את הלקוח
+
+    Returns:
+        מה ש-requests מחזירה
+    """
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await requests(client)
+    return asyncio.run(run())
+
+
+def test_wsgi_fallback():
+    """בודק שנתיבים שלא ב-ASYNC_ROUTES, והעלאות שאינן JSON, עוברים לאפליקציית ה-Flask"""
+    print("\n🧪 בודק מעבר ל-Flask...")
+
+    png = create_test_png()
+
+    async def requests(client):
+        health = await client.get('/health')
+        colors = await client.post('/analyze-colors', json={'image_url': base64.b64encode(png).decode('ascii'),
+                                                            'num_colors': 3, 'gradient_format': 'css',
+                                                            'use_cache': False})
+        # GET לנתיב אסינכרוני ו-multipart ל-/analyze - גם הם מטופלים ב-Flask
+        get_analyze = await client.get('/analyze')
+        multipart = await client.post('/analyze', data={'fresh': 'maybe'}, files={'image': ('a.png', png)})
+        return health, colors, get_analyze, multipart
+
+    health, colors, get_analyze, multipart = run_requests(requests)
+    assert health.status_code == 200 and health.json()['status'] == 'ok'
+    assert colors.status_code == 200 and len(colors.json()['colors_rgb']) == 3
+    assert get_analyze.status_code == 405
+    # רק request_data של Flask ממיר את שדות הטופס - fresh לא תקין מחזיר 400
+    assert multipart.status_code == 400 and 'fresh' in multipart.json()['error']
+
+    print("✅ נתיבים סינכרוניים עוברים ל-Flask")
+    return True
+
+
+def test_body_limit():
+    """בודק שגוף גדול מ-MAX_BODY_BYTES נדחה ב-413 ושגוף קטן ממשיך לנקודת הקצה"""
+    print("\n🧪 בודק מגבלת גודל הגוף...")
+
+    limit = asgi_app.MAX_BODY_BYTES
+    asgi_app.MAX_BODY_BYTES = 1024
+    try:
+        async def requests(client):
+            large = await client.post('/analyze', json={'image': 'A' * 4096})
+            small = await client.post('/analyze', json={})
+            return large, small
+        large, small = run_requests(requests)
+    finally:
+        asgi_app.MAX_BODY_BYTES = limit
+
+    assert large.status_code == 413 and large.json() == {'error': 'הבקשה גדולה מדי'}
+    assert small.status_code == 400 and small.json() == {'error': 'לא נשלחה תמונה'}
+
+    print("✅ גוף גדול מדי מחזיר 413")
+    return True
+
+
+def test_async_analyze_session():
+    """בודק את /analyze האסינכרוני עם לקוח OpenAI מוחלף, ואת עוגיית הסשן שנקבעת ונקראת בחזרה"""
+    print("\n🧪 בודק /analyze אסינכרוני וסשן...")
+
+    completions = FakeCompletions('שיר מהלקוח האסינכרוני')
+    client_before = asgi_app._openai_client
+    asgi_app._openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    try:
+        image = 'data:image/png;base64,' + base64.b64encode(create_test_png()).decode('ascii')
+
+        async def requests(client):
+            first = await client.post('/analyze', json={'image': image, 'fresh': True})
+            # העוגייה נשמרה בלקוח - הבקשה הבאה באותו סשן, בלי עוגייה חדשה
+            second = await client.post('/analyze', json={})
+            content = await client.get('/get-all-content', params={'kind': 'texts'})
+            return first, second, content
+
+        first, second, content = run_requests(requests)
+        # לקוח חדש, בלי העוגייה - סשן אחר
+        other = run_requests(lambda client: client.get('/get-all-content', params={'kind': 'texts'}))
+    finally:
+        asgi_app._openai_client = client_before
+
+    assert first.status_code == 200, first.json()
+    assert first.json() == {'result': 'שיר מהלקוח האסינכרוני'}
+    assert len(completions.calls) == 1 and completions.calls[0]['messages']
+    set_cookie = first.headers.get('set-cookie', '')
+    assert set_cookie.startswith(f'{SESSION_COOKIE}=') and 'HttpOnly' in set_cookie
+    assert 'set-cookie' not in second.headers
+
+    # הטקסט שנשמר בצד ה-ASGI מופיע ב-Flask לאותה עוגייה, ולא לסשן אחר
+    texts = [item['text'] for item in content.json()['texts']]
+    assert 'שיר מהלקוח האסינכרוני' in texts
+    assert 'שיר מהלקוח האסינכרוני' not in [item['text'] for item in other.json().get('texts', [])]
+
+    print("✅ העוגייה נקבעת ב-ASGI ונקראת ב-Flask")
+    return True
+
+
+def main():
+    """פונקציה ראשית לבדיקות"""
+    print("🚀 מתחיל בדיקות ASGI...")
+
+    fallback_success = test_wsgi_fallback()
+    limit_success = test_body_limit()
+    session_success = test_async_analyze_session()
+
+    print(f"\n📊 סיכום בדיקות:")
+    print(f"   מעבר ל-Flask: {'✅' if fallback_success else '❌'}")
+    print(f"   מגבלת גודל: {'✅' if limit_success else '❌'}")
+    print(f"   /analyze וסשן: {'✅' if session_success else '❌'}")
+
+    if fallback_success and limit_success and session_success:
+        print("\n🎉 כל הבדיקות עברו בהצלחה!")
+        return True
+    else:
+        print("\n⚠️  חלק מהבדיקות נכשלו")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
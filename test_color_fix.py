@@ -5,9 +5,15 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from color_utils import extract_dominant_colors, create_color_gradient
+from color_utils import (extract_dominant_colors, create_color_gradient, analyze_image_colors, generate_color_report,
+                         analyze_color_harmony, analyze_combined_colors)
+from analysis_cache import analysis_cache, LRUCache
+from gradient_renderer import render_gradient, gradient_to_css
+from palette_engines import PALETTE_ENGINES
+from report_renderer import render_view, REPORT_VIEWS, VIEW_SIZES
 import numpy as np
 import base64
+import time
 from io import BytesIO
 from PIL import Image
 
@@ -81,6 +87,263 @@ def test_gradient_creation():
         print(f"❌ שגיאה ביצירת הגרדיאנט: {str(e)}")
         return False
 
+def test_palette_engines():
+    """בודק שכל מנועי הפלטה מחזירים את אותה צורה ומוצאים את ארבעת הצבעים"""
+    print("\n🧪 בודק מנועי פלטה...")
+    
+    pil_img = Image.fromarray(create_test_image())
+    buffer = BytesIO()
+    pil_img.save(buffer, format='PNG')
+    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    expected = {(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0)}
+    for engine in PALETTE_ENGINES:
+        colors = extract_dominant_colors(img_base64, num_colors=4, engine=engine)
+        assert isinstance(colors, list) and 0 < len(colors) <= 4, f"{engine}: {colors}"
+        assert all(len(c) == 3 and all(isinstance(v, int) for v in c) for c in colors)
+        if engine in ('median_cut', 'octree'):
+            # הקוונטיזציה של Pillow עשויה למזג צבעים - בודקים רק את הצורה
+            print(f"   {engine}: ✅")
+            continue
+        # מרכזי KMeans נחתכים לשלם, לכן מאפשרים סטייה קטנה
+        assert len(colors) == 4, f"{engine}: {colors}"
+        for color in colors:
+            assert any(max(abs(a - b) for a, b in zip(color, e)) <= 2 for e in expected), f"{engine}: {colors}"
+        print(f"   {engine}: ✅")
+    
+    # מנוע לא מוכר בנקודות הקצה - 400 כמו אופרטור לא מוכר, לא 500
+    import app as flask_module
+    client = flask_module.app.test_client()
+    for path, body in (('/analyze-colors', {'image_url': img_base64}),
+                       ('/analyze-colors-batch', {'images': [img_base64]}),
+                       ('/analyze-colors-combined', {'original_image': img_base64,
+                                                     'generated_image_url': 'https://example.com/generated.png'}),
+                       ('/pipeline', {'image': img_base64})):
+        response = client.post(path, json=dict(body, engine='dbscan', gradient_format='css'))
+        assert response.status_code == 400 and 'dbscan' in response.get_json()['error'], path
+    
+    return True
+
+def test_analysis_cache():
+    """בודק שניתוח חוזר מגיע מהמטמון ושאפשר לעקוף אותו"""
+    print("\n🧪 בודק מטמון ניתוח...")
+    
+    pil_img = Image.fromarray(create_test_image())
+    buffer = BytesIO()
+    pil_img.save(buffer, format='PNG')
+    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    analysis_cache.clear()
+    first = analyze_image_colors(img_base64, num_colors=4)
+    hits_before = analysis_cache.hits
+    
+    # data URL של אותם בייטים - אותו מפתח
+    second = analyze_image_colors(f"data:image/png;base64,{img_base64}", num_colors=4)
+    assert analysis_cache.hits == hits_before + 1
+    assert second == first
+    
+    # שינוי התוצאה לא משנה את המטמון
+    second['harmony_analysis'] = {}
+    assert 'harmony_analysis' not in analyze_image_colors(img_base64, num_colors=4)
+    
+    # עקיפה מפורשת
+    hits = analysis_cache.hits
+    analyze_image_colors(img_base64, num_colors=4, use_cache=False)
+    assert analysis_cache.hits == hits
+    
+    # פינוי לפי גודל
+    small = LRUCache(max_bytes=300)
+    for i in range(5):
+        small.put(i, 'x' * 100)
+    assert small.get(0) is None and small.get(4) == 'x' * 100
+    assert small.stats()['evictions'] > 0
+    
+    # תפוגה לפי TTL
+    expiring = LRUCache(max_bytes=1000, ttl=0.05)
+    expiring.put('k', 'v')
+    assert expiring.get('k') == 'v'
+    time.sleep(0.06)
+    assert expiring.get('k') is None
+    assert expiring.stats()['expirations'] == 1 and expiring.stats()['bytes'] == 0
+    
+    print(f"✅ {analysis_cache.stats()}")
+    return True
+
+def test_gradient_renderer_modes():
+    """בודק רינדור גרדיאנט ב-RGB, ב-OKLab ובמצב CSS"""
+    print("\n🧪 בודק מצבי רינדור גרדיאנט...")
+    
+    colors = [[255, 0, 0], [0, 0, 255]]
+    
+    rgb = render_gradient(colors, width=101, height=7)
+    assert rgb.shape == (7, 101, 3)
+    assert rgb[0, 0].tolist() == [255, 0, 0] and rgb[0, -1].tolist() == [0, 0, 255]
+    
+    # הקצוות זהים בשני המרחבים, האמצע שונה
+    oklab = render_gradient(colors, width=101, height=7, space='oklab')
+    assert oklab[0, 0].tolist() == [255, 0, 0] and oklab[0, -1].tolist() == [0, 0, 255]
+    assert oklab[0, 50].tolist() != rgb[0, 50].tolist()
+    
+    css = gradient_to_css(colors)
+    assert css == 'linear-gradient(90deg, #ff0000 0%, #0000ff 100%)'
+    
+    # גודל, פורמט ומרחב לא תקינים בנקודת הקצה - 400 לפני הרינדור
+    import app as flask_module
+    client = flask_module.app.test_client()
+    for options in ({'width': 0}, {'width': -5}, {'height': 10**6}, {'width': 'wide'}, {'height': 2.5},
+                    {'width': None}, {'gradient_format': 'svg'}, {'gradient_space': 'hsv'}):
+        response = client.post('/create-combined-gradient', json=dict({'colors': colors}, **options))
+        assert response.status_code == 400, options
+    response = client.post('/create-combined-gradient', json={'colors': colors, 'width': 4096, 'height': 1,
+                                                              'gradient_space': 'oklab'})
+    assert response.status_code == 200 and 'gradient_image' in response.get_json()
+    
+    print(f"✅ {css}")
+    return True
+
+def test_lazy_imports():
+    """בודק שייבוא app לא טוען את הספריות הכבדות ולא פונה לרשת"""
+    print("\n🧪 בודק עלייה מהירה...")
+
+    import subprocess
+    code = ("import sys, app; "
+            "heavy = [m for m in ('sklearn', 'cv2', 'matplotlib', 'openai') if m in sys.modules]; "
+            "assert not heavy, heavy; "
+            "assert app.get_client() is not None and 'openai' in sys.modules")
+    env = dict(os.environ, OPENAI_API_KEY='sk-test-offline-key', OPENAI_BASE_URL='http://10.255.255.1:9/v1')
+    completed = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env=env, capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    print("✅ הספריות הכבדות נטענות רק בשימוש")
+    return True
+
+def test_report_renderer():
+    """בודק שהתצוגות הרסטריות נוצרות ברזולוציה המבוקשת ושהדוח כותב את כל הקבצים"""
+    print("\n🧪 בודק רינדור דוח...")
+    
+    import tempfile
+    colors = [[255, 0, 0], [0, 128, 255], [250, 250, 0]]
+    
+    for view in REPORT_VIEWS:
+        width, height = VIEW_SIZES[view]
+        assert render_view(view, colors).size == (width, height)
+        assert render_view(view, colors, scale=0.5).size == (width // 2, height // 2)
+    
+    # הפלח הראשון בעוגה מתחיל למעלה ונמשך נגד כיוון השעון - משמאל למרכז הראשון, מימין האחרון
+    pie = np.asarray(render_view('pie', colors))
+    assert pie[450, 450 - 100].tolist() == [255, 0, 0]
+    assert pie[450, 450 + 100].tolist() == [250, 250, 0]
+    assert pie[5, 5].tolist() == [255, 255, 255]
+    
+    with tempfile.TemporaryDirectory() as save_dir:
+        report = generate_color_report(colors, save_dir, scale=0.5)
+        assert sorted(report['visualizations']) == sorted(REPORT_VIEWS)
+        for name in report['visualizations'].values():
+            with Image.open(os.path.join(save_dir, name)) as img:
+                assert img.size[0] > 0
+    
+    assert generate_color_report(colors, backend='svg') == {}
+    
+    print("✅ כל התצוגות נוצרו")
+    return True
+
+def test_color_harmony():
+    """בודק שכל קבוצות ההרמוניה מתמלאות ושצבעים אפורים לא נכנסים ליחסי גוונים"""
+    print("\n🧪 בודק ניתוח הרמוניה...")
+    
+    colors = [[255, 0, 0], [0, 255, 255], [0, 255, 0], [0, 0, 255],
+              [200, 30, 30], [255, 80, 0], [128, 128, 128], [0, 0, 0]]
+    harmony = analyze_color_harmony(colors)
+    
+    assert harmony['complementary'] == [(0, 1), (1, 4)]
+    assert harmony['analogous'] == [(0, 5), (4, 5)]
+    assert harmony['triadic'] == [(0, 2, 3), (2, 3, 4)]
+    assert harmony['monochromatic'] == [[0, 4]]
+    assert harmony['color_temperatures'] == {'warm': 3, 'cool': 2, 'neutral': 1}
+    
+    # רמפת גוונים במרווח 8° - לא נשרשרת לקבוצה אחת, וכל קבוצה בטווח 10° מהגוון הראשון בה
+    import colorsys
+    ramp = [[int(round(c * 255)) for c in colorsys.hsv_to_rgb(degrees / 360, 1.0, 1.0)]
+            for degrees in (0, 8, 16, 24, 32, 40)]
+    harmony = analyze_color_harmony(ramp)
+    assert harmony['monochromatic'] == [[0, 1], [2, 3], [4, 5]], harmony['monochromatic']
+    # זוג באותה קבוצה לא נספר גם כאנלוגי
+    grouped = {(i, j) for group in harmony['monochromatic'] for i in group for j in group if i < j}
+    assert not grouped & set(harmony['analogous'])
+    assert (0, 3) in harmony['analogous'] and (0, 1) not in harmony['analogous']
+    
+    # קבוצה שחוצה את 0° נשארת אחת (355° ו-3°)
+    wrap = [[int(round(c * 255)) for c in colorsys.hsv_to_rgb(degrees / 360, 1.0, 1.0)]
+            for degrees in (355, 3, 180)]
+    assert analyze_color_harmony(wrap)['monochromatic'] == [[0, 1]]
+    
+    # פלטה משולבת גדולה - עדיין מהיר
+    big = np.random.RandomState(0).randint(0, 256, (64, 3)).tolist()
+    start = time.time()
+    harmony = analyze_color_harmony(big)
+    assert time.time() - start < 0.5
+    assert all(i < j < k for i, j, k in harmony['triadic'])
+    
+    print(f"✅ {len(harmony['triadic'])} שלשות טריאדיות ב-64 צבעים")
+    return True
+
+def test_joint_combined_colors():
+    """בודק פלטה משותפת באשכול אחד עם חלק כל תמונה בכל צבע, ואת נקודת הקצה המשולבת"""
+    print("\n🧪 בודק ניתוח צבעים משולב באשכול אחד...")
+    
+    # המקורית: אדום וירוק; שנוצרה: ירוק וכחול - הירוק משותף
+    original = np.zeros((60, 60, 3), dtype=np.uint8)
+    original[:, :30] = [255, 0, 0]
+    original[:, 30:] = [0, 255, 0]
+    generated = np.zeros((60, 60, 3), dtype=np.uint8)
+    generated[:, :30] = [0, 255, 0]
+    generated[:, 30:] = [0, 0, 255]
+    buffers = []
+    for img in (original, generated):
+        buffer = BytesIO()
+        Image.fromarray(img).save(buffer, format='PNG')
+        buffers.append(buffer.getvalue())
+    
+    result = analyze_combined_colors(buffers[0], buffers[1], num_colors=3, gradient_format='css', use_cache=False)
+    assert result['colors_rgb'] == [[255, 0, 0], [0, 255, 0], [0, 0, 255]], result
+    assert [round(s['original'], 2) for s in result['color_shares']] == [0.5, 0.5, 0.0]
+    assert [round(s['generated'], 2) for s in result['color_shares']] == [0.0, 0.5, 0.5]
+    assert result['gradient_css'].startswith('linear-gradient')
+    assert 'error' in analyze_combined_colors(buffers[0], buffers[1], source_weight=2)
+    
+    # נקודת הקצה - במצב ברירת המחדל (separate) ובמצב המשותף (joint)
+    import app as flask_module
+    from image_source import ImageSource
+    download = flask_module.download_generated_image
+    flask_module.download_generated_image = lambda url: ImageSource(buffers[1])
+    try:
+        client = flask_module.app.test_client()
+        options = {'original_image': base64.b64encode(buffers[0]).decode('ascii'),
+                   'generated_image_url': 'https://example.com/generated.png', 'num_colors': 3,
+                   'gradient_format': 'css', 'use_cache': False}
+        joint = client.post('/analyze-colors-combined', json=dict(options, mode='joint')).get_json()
+        separate = client.post('/analyze-colors-combined', json=dict(options, num_colors=2)).get_json()
+        unknown = client.post('/analyze-colors-combined', json=dict(options, mode='other'))
+        # source_weight נבדק בנקודת הקצה: מספר (או מחרוזת מספרית) בטווח 0..1, אחרת 400
+        weighted = client.post('/analyze-colors-combined', json=dict(options, mode='joint', source_weight='0.5'))
+        bad_weights = [client.post('/analyze-colors-combined', json=dict(options, mode='joint', source_weight=weight))
+                       for weight in (2, -0.1, None, 'heavy', float('nan'), True)]
+    finally:
+        flask_module.download_generated_image = download
+    
+    assert joint['mode'] == 'joint' and joint['num_colors'] == 3
+    assert joint['original_colors_count'] == 2 and joint['generated_colors_count'] == 1
+    assert 'מקורית 50% · נוצרה 50%' in joint['descriptions'][1]
+    assert separate['mode'] == 'separate'
+    assert separate['num_colors'] == 4 and separate['original_colors_count'] == 2
+    assert unknown.status_code == 400
+    assert weighted.status_code == 200 and weighted.get_json()['colors_rgb'] == joint['colors_rgb']
+    assert [response.status_code for response in bad_weights] == [400] * 6
+    
+    print(f"✅ {joint['colors_hex']}")
+    return True
+
 def main():
     """פונקציה ראשית לבדיקות"""
     print("🚀 מתחיל בדיקות...")
@@ -91,11 +354,40 @@ def main():
     # בדיקת יצירת גרדיאנט
     gradient_success = test_gradient_creation()
     
+    # בדיקת מנועי פלטה
+    engines_success = test_palette_engines()
+    
+    # בדיקת מטמון
+    cache_success = test_analysis_cache()
+    
+    # בדיקת מצבי רינדור
+    renderer_success = test_gradient_renderer_modes()
+    
+    # בדיקת ייבוא עצל
+    lazy_success = test_lazy_imports()
+    
+    # בדיקת רינדור הדוח
+    report_success = test_report_renderer()
+    
+    # בדיקת ניתוח הרמוניה
+    harmony_success = test_color_harmony()
+    
+    # בדיקת ניתוח משולב באשכול אחד
+    joint_success = test_joint_combined_colors()
+    
     print(f"\n📊 סיכום בדיקות:")
     print(f"   חילוץ צבעים: {'✅' if color_success else '❌'}")
     print(f"   יצירת גרדיאנט: {'✅' if gradient_success else '❌'}")
+    print(f"   מנועי פלטה: {'✅' if engines_success else '❌'}")
+    print(f"   מטמון ניתוח: {'✅' if cache_success else '❌'}")
+    print(f"   מצבי רינדור: {'✅' if renderer_success else '❌'}")
+    print(f"   עלייה מהירה: {'✅' if lazy_success else '❌'}")
+    print(f"   רינדור דוח: {'✅' if report_success else '❌'}")
+    print(f"   ניתוח הרמוניה: {'✅' if harmony_success else '❌'}")
+    print(f"   ניתוח משולב: {'✅' if joint_success else '❌'}")
     
-    if color_success and gradient_success:
+    if color_success and gradient_success and engines_success and cache_success and renderer_success \
+            and lazy_success and report_success and harmony_success and joint_success:
         print("\n🎉 כל הבדיקות עברו בהצלחה!")
         return True
     else:
@@ -6,6 +6,10 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from color_utils import analyze_image_edges, create_combined_edge_image
+from edge_engine import compute_edge_map, reference_edge_map, EDGE_OPERATORS
+from tiled_edges import iter_edge_strips, decode_gray, PngStreamWriter
+from image_source import ImageSource
+import analysis_pool
 import numpy as np
 import base64
 from io import BytesIO
@@ -98,6 +102,108 @@ def test_combined_edge_analysis():
         print(f"❌ שגיאה ביצירת תמונת קווי המתאר המשולבת: {str(e)}")
         return False
 
+def test_vectorized_edges_match_reference():
+    """בודק שהמנוע הווקטורי זהה ללולאה הישנה ושכל האופרטורים רצים"""
+    print("\n🧪 בודק מנוע קווי מתאר וקטורי...")
+    
+    gray = np.array(Image.fromarray(create_test_image()).convert('L'))
+    
+    # ברירת המחדל חייבת להיות זהה לפיקסל
+    assert np.array_equal(compute_edge_map(gray), reference_edge_map(gray))
+    
+    for operator in EDGE_OPERATORS:
+        edges = compute_edge_map(gray, operator)
+        assert edges.shape == gray.shape and edges.dtype == np.uint8
+        assert edges.max() > 0, f"לא נמצאו קווי מתאר עם {operator}"
+    
+    print("✅ המנוע הווקטורי זהה למימוש הישן")
+    return True
+
+def test_process_pool_matches_inline():
+    """בודק שניתוח דרך מאגר התהליכים (זיכרון משותף) זהה לניתוח inline"""
+    print("\n🧪 בודק מאגר תהליכים...")
+    
+    pil_img = Image.fromarray(create_test_image())
+    buffer = BytesIO()
+    pil_img.save(buffer, format='PNG')
+    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    inline = analyze_image_edges(img_base64, use_cache=False)
+    
+    # סף 0 - כל תמונה עוברת למאגר
+    min_pixels = analysis_pool.POOL_MIN_PIXELS
+    analysis_pool.POOL_MIN_PIXELS = 0
+    try:
+        pooled = analysis_pool.analyze_image_edges(img_base64, use_cache=False)
+    finally:
+        analysis_pool.POOL_MIN_PIXELS = min_pixels
+        analysis_pool.shutdown_pool()
+    
+    assert pooled == inline, pooled.get('error')
+    
+    # חריגה בעובד עולה כמו שהיא - לא BufferError מסגירת הזיכרון המשותף
+    shm, descriptor = analysis_pool._share_array(create_test_image())
+    try:
+        analysis_pool._worker('no_such_analysis', [descriptor], {})
+        assert False, 'ניתוח לא קיים'
+    except AttributeError:
+        pass
+    finally:
+        shm.close()
+        shm.unlink()
+    print("✅ התוצאה מהמאגר זהה")
+    return True
+
+def test_tiled_edges():
+    """בודק שעיבוד ברצועות זהה לתמונה שלמה, שה-PNG הזורם תקין ושהפענוח נשאר בתקציב"""
+    print("\n🧪 בודק קווי מתאר ברצועות...")
+    
+    rng = np.random.RandomState(0)
+    gray = rng.randint(0, 256, (203, 157)).astype(np.uint8)
+    for operator in ('central', 'sobel', 'scharr'):
+        for rows in (1, 2, 50):
+            strips = np.concatenate(list(iter_edge_strips(gray, operator, rows)))
+            assert np.array_equal(strips, compute_edge_map(gray, operator)), (operator, rows)
+    
+    # PNG זורם - אפור ו-RGB, ברצועות בגדלים שונים
+    binary = (gray >= 128).astype(np.uint8) * 255
+    for mode, pixels in (('L', gray), ('RGB', rng.randint(0, 256, (40, 30, 3)).astype(np.uint8)), ('1', binary)):
+        buffer = BytesIO()
+        writer = PngStreamWriter(buffer, pixels.shape[1], pixels.shape[0], mode)
+        for top in range(0, len(pixels), 17):
+            writer.write_rows(pixels[top:top + 17])
+        writer.close()
+        decoded = Image.open(BytesIO(buffer.getvalue()))
+        assert decoded.mode == mode and np.array_equal(np.asarray(decoded.convert(mode if mode != '1' else 'L')),
+                                                       pixels), mode
+    
+    # JPEG גדול מהתקציב מפוענח ישר מוקטן
+    buffer = BytesIO()
+    Image.fromarray(create_test_image()).resize((800, 600)).save(buffer, format='JPEG')
+    small = decode_gray(ImageSource(buffer.getvalue()), max_pixels=100_000)
+    assert small.mode == 'L' and small.size[0] * small.size[1] <= 100_000
+    
+    # נקודות הכניסה - מפורש ברצועות. ב-PNG זהה לגמרי; ב-JPEG הפענוח ישר לאפור (ערוץ Y)
+    # שונה מעט מהמרת RGB ל-'L' בעיגול
+    decode = lambda result: np.asarray(Image.open(BytesIO(base64.b64decode(result['edge_image'].split(',')[1]))))
+    for image_format, tolerance in (('PNG', 0), ('JPEG', 8)):
+        buffer = BytesIO()
+        Image.fromarray(create_test_image()).resize((800, 600)).save(buffer, format=image_format)
+        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        full = analyze_image_edges(img_base64, use_cache=False, tiled=False)
+        tiled = analyze_image_edges(img_base64, use_cache=False, tiled=True)
+        assert tiled['tiled'] and not full['tiled']
+        difference = np.abs(decode(tiled).astype(int) - decode(full).astype(int)).max()
+        assert difference <= tolerance, (image_format, difference)
+    # קווי המתאר המשולבים בינאריים - ביט לפיקסל, בשני המסלולים
+    for tiled in (True, False):
+        combined = create_combined_edge_image(img_base64, img_base64, tiled=tiled)
+        combined_image = Image.open(BytesIO(base64.b64decode(combined['combined_image'].split(',')[1])))
+        assert combined_image.size == (800, 600) and combined_image.mode == '1'
+    
+    print("✅ רצועות זהות לתמונה שלמה")
+    return True
+
 def main():
     """פונקציה ראשית לבדיקות"""
     print("🚀 מתחיל בדיקות קווי מתאר...")
@@ -108,11 +214,23 @@ def main():
     # בדיקת ניתוח קווי מתאר משולב
     combined_success = test_combined_edge_analysis()
     
+    # בדיקת המנוע הווקטורי
+    vectorized_success = test_vectorized_edges_match_reference()
+    
+    # בדיקת מאגר התהליכים
+    pool_success = test_process_pool_matches_inline()
+    
+    # בדיקת עיבוד ברצועות
+    tiled_success = test_tiled_edges()
+    
     print(f"\n📊 סיכום בדיקות קווי מתאר:")
     print(f"   ניתוח קווי מתאר: {'✅' if edge_success else '❌'}")
     print(f"   ניתוח קווי מתאר משולב: {'✅' if combined_success else '❌'}")
+    print(f"   מנוע וקטורי: {'✅' if vectorized_success else '❌'}")
+    print(f"   מאגר תהליכים: {'✅' if pool_success else '❌'}")
+    print(f"   עיבוד ברצועות: {'✅' if tiled_success else '❌'}")
     
-    if edge_success and combined_success:
+    if edge_success and combined_success and vectorized_success and pool_success and tiled_success:
         print("\n🎉 כל בדיקות קווי המתאר עברו בהצלחה!")
         return True
     else:
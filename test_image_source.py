@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from image_source import ImageSource, detect_kind
+from pixel_sampling import sample_pixels, stratified_sample
+import image_downloader
+import numpy as np
+import base64
+import gc
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from PIL import Image
+
+def create_test_png():
+    """יוצר קובץ PNG קטן עם ארבעה רבעים צבעוניים"""
+    img = np.zeros((40, 60, 3), dtype=np.uint8)
+    img[:20, :30] = [255, 0, 0]
+    img[:20, 30:] = [0, 255, 0]
+    img[20:, :30] = [0, 0, 255]
+    img[20:, 30:] = [255, 255, 0]
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format='PNG')
+    return img, buffer.getvalue()
+
+def test_detect_kind():
+    """בודק זיהוי סוגי קלט"""
+    print("🧪 בודק זיהוי סוג קלט...")
+
+    _, png = create_test_png()
+    b64 = base64.b64encode(png).decode('utf-8')
+
+    assert detect_kind(png) == 'bytes'
+    assert detect_kind(b64) == 'base64'
+    assert detect_kind(f"data:image/png;base64,{b64}") == 'data_url'
+    assert detect_kind('https://example.com/a.png') == 'url'
+    assert detect_kind(os.path.abspath(__file__)) == 'path'
+    assert detect_kind(np.zeros((2, 2, 3), dtype=np.uint8)) == 'array'
+
+    print("✅ כל סוגי הקלט זוהו")
+    return True
+
+def test_decode_once_and_views():
+    """בודק שהפענוח מתבצע פעם אחת ושהתצוגות חולקות זיכרון"""
+    print("\n🧪 בודק פענוח חד-פעמי ותצוגות...")
+
+    expected, png = create_test_png()
+    source = ImageSource(f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}")
+
+    assert source.raw_bytes == png
+    assert source.raw_bytes is source.raw_bytes
+    assert source.size == (60, 40) and not source.is_decoded
+
+    rgb = source.rgb()
+    assert source.rgb() is rgb
+    assert np.array_equal(rgb, expected)
+    assert not rgb.flags.writeable
+
+    # BGR היא תצוגה על אותו זיכרון
+    bgr = source.bgr()
+    assert np.shares_memory(bgr, rgb)
+    assert bgr[0, 0].tolist() == [0, 0, 255]
+
+    gray = source.gray()
+    assert source.gray() is gray and gray.shape == (40, 60)
+
+    # אותו hash לאותם בייטים מכל סוג קלט
+    assert ImageSource(png).content_hash == source.content_hash
+    assert ImageSource.from_any(source) is source
+
+    print("✅ הפענוח מתבצע פעם אחת")
+    return True
+
+def test_budgeted_sampling():
+    """בודק דגימה בתקציב: לא חורגת, דטרמיניסטית, ומכסה את כל אזורי התמונה"""
+    print("\n🧪 בודק דגימת פיקסלים בתקציב...")
+
+    # תמונה רחבה (פי 4) עם פס צבע שונה בכל רבע אופקי
+    img = np.zeros((300, 1200, 3), dtype=np.uint8)
+    for i, color in enumerate([[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 0]]):
+        img[:, i * 300:(i + 1) * 300] = color
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format='JPEG', quality=95)
+
+    pixels = sample_pixels(buffer.getvalue(), budget=400)
+    assert 0 < len(pixels) <= 400 and pixels.shape[1] == 3
+    assert np.array_equal(pixels, sample_pixels(buffer.getvalue(), budget=400))
+
+    # כל רבע מקבל בערך רבע מהדגימה (שמירה על יחס הרוחב-גובה)
+    strata = stratified_sample(img, 400)
+    for color in ([255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 0]):
+        share = np.all(strata == color, axis=1).mean()
+        assert 0.2 < share < 0.3, f"{color}: {share}"
+
+    # תמונה קטנה מהתקציב - כל הפיקסלים
+    assert len(stratified_sample(img[:10, :10], 400)) == 100
+
+    # תקציב מבקשה - מספר שלם חיובי עד MAX_PIXEL_BUDGET, אחרת 400
+    import app as flask_module
+    from pixel_sampling import MAX_PIXEL_BUDGET
+    client = flask_module.app.test_client()
+    image_url = base64.b64encode(buffer.getvalue()).decode('ascii')
+    for budget in (0, -1, 10**10, MAX_PIXEL_BUDGET + 1, 2.5, 'many', None, True):
+        response = client.post('/analyze-colors', json={'image_url': image_url, 'pixel_budget': budget,
+                                                        'gradient_format': 'css', 'use_cache': False})
+        assert response.status_code == 400, budget
+    response = client.post('/analyze-colors', json={'image_url': image_url, 'pixel_budget': 400, 'num_colors': 4,
+                                                    'gradient_format': 'css', 'use_cache': False})
+    assert response.status_code == 200
+
+    print(f"✅ נדגמו {len(pixels)} פיקסלים")
+    return True
+
+def serve_bytes(content, delay=0.2):
+    """מפעיל שרת HTTP מקומי שמחזיר את אותם בייטים לכל בקשה וסופר את הבקשות"""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('content-length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests_seen
+
+def test_downloader():
+    """בודק שכל URL יורד פעם אחת, גם בבקשות מקבילות, ושהורדה גדולה נכתבת לדיסק"""
+    print("\n🧪 בודק את מטמון ההורדות...")
+
+    _, png = create_test_png()
+    server, requests_seen = serve_bytes(png)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        # שמונה בקשות מקבילות לאותו URL - הורדה אחת
+        url = f"{base_url}/generated.png"
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sources = list(pool.map(image_downloader.download_image, [url] * 8))
+        assert requests_seen.count('/generated.png') == 1
+        assert all(s.raw_bytes == png for s in sources)
+
+        # קריאה חוזרת (גם דרך ImageSource של URL) - מהמטמון
+        assert ImageSource(url).raw_bytes == png
+        assert requests_seen.count('/generated.png') == 1
+
+        # מעל הסף - נכתב לקובץ זמני ולא נשמר בזיכרון
+        threshold = image_downloader.DOWNLOAD_SPILL_BYTES
+        image_downloader.DOWNLOAD_SPILL_BYTES = len(png) // 2
+        try:
+            big = image_downloader.download_image(f"{base_url}/big.png")
+        finally:
+            image_downloader.DOWNLOAD_SPILL_BYTES = threshold
+        assert big.kind == 'path' and big.size == (60, 40)
+        assert big.content_hash == ImageSource(png).content_hash
+        assert image_downloader.download_image(f"{base_url}/big.png").kind == 'path'
+        assert requests_seen.count('/big.png') == 1
+
+        # פינוי מהדיסק בזמן שעוד קוראים מהקובץ - נמחק רק אחרי שהקורא האחרון נאסף
+        disk_max = image_downloader.DOWNLOAD_DISK_MAX_BYTES
+        image_downloader.DOWNLOAD_SPILL_BYTES = len(png) // 2
+        image_downloader.DOWNLOAD_DISK_MAX_BYTES = len(png)
+        try:
+            image_downloader.download_image(f"{base_url}/other.png")
+        finally:
+            image_downloader.DOWNLOAD_SPILL_BYTES = threshold
+            image_downloader.DOWNLOAD_DISK_MAX_BYTES = disk_max
+        path = big._data
+        assert image_downloader.cached_source(f"{base_url}/big.png") is None
+        assert os.path.exists(path) and big.rgb().shape == (40, 60, 3)
+        del big
+        gc.collect()
+        assert not os.path.exists(path)
+    finally:
+        server.shutdown()
+
+    print(f"✅ {image_downloader.stats()}")
+    return True
+
+def test_binary_uploads():
+    """בודק ש-multipart וגוף image/* נותנים את אותה תוצאה כמו base64 בתוך JSON"""
+    print("\n🧪 בודק העלאות בינאריות...")
+
+    import app as flask_module
+    client = flask_module.app.test_client()
+    _, png = create_test_png()
+    options = {'num_colors': 4, 'gradient_format': 'css', 'use_cache': False}
+
+    as_json = client.post('/analyze-colors', json=dict(options, image_url=base64.b64encode(png).decode('ascii')))
+    as_form = client.post('/analyze-colors', data={'image_url': (BytesIO(png), 'image.png'), 'num_colors': '4',
+                                                   'gradient_format': 'css', 'use_cache': 'false'})
+    as_raw = client.post('/analyze-colors', data=png, content_type='image/png',
+                         query_string={'num_colors': 4, 'gradient_format': 'css', 'use_cache': 'false'})
+    assert as_json.status_code == as_form.status_code == as_raw.status_code == 200
+    colors = sorted(as_json.get_json()['colors_rgb'])
+    assert sorted(as_form.get_json()['colors_rgb']) == colors
+    assert sorted(as_raw.get_json()['colors_rgb']) == colors
+
+    edges = client.post('/analyze-edges', data=png, content_type='image/png')
+    assert edges.status_code == 200 and 'edge_image' in edges.get_json()
+    assert client.post('/analyze-edges', data=b'', content_type='image/png').status_code == 400
+    assert client.post('/analyze-edges', data=png, content_type='image/png',
+                       query_string={'operator': 'laplace'}).status_code == 400
+
+    # רק שדות מספריים / בוליאניים מומרים - שדות טקסט ומזהים נשארים מחרוזות
+    assert flask_module._form_value('output_dir', '007') == '007'
+    assert flask_module._form_value('prompt', 'true') == 'true'
+    assert flask_module._form_value('num_colors', '4') == 4
+    assert flask_module._form_value('source_weight', '0.25') == 0.25
+    assert flask_module._form_value('use_cache', 'False') is False
+    for name, value in (('source_weight', 'nan'), ('pixel_budget', 'inf'), ('num_colors', 'four'),
+                        ('num_colors', '4.5'), ('use_cache', 'maybe')):
+        try:
+            flask_module._form_value(name, value)
+            assert False, f'{name}={value} היה צריך להידחות'
+        except flask_module.ParameterError:
+            pass
+    assert client.post('/analyze-colors', data=png, content_type='image/png',
+                       query_string={'num_colors': 'nan'}).status_code == 400
+    assert client.post('/analyze', data=png, content_type='image/png',
+                       query_string={'fresh': 'sometimes'}).status_code == 400
+
+    # מספר קבצים באותו שדה - אצווה
+    batch = client.post('/analyze-colors-batch', data={'images': [(BytesIO(png), 'a.png'), (BytesIO(png), 'b.png')],
+                                                       'gradient_format': 'css'})
+    lines = [line for line in batch.get_data(as_text=True).splitlines() if line]
+    assert batch.status_code == 200 and '"done": true' in lines[-1] and '"errors": 0' in lines[-1]
+
+    print("✅ שלושת פורמטי ההעלאה מגיעים לאותו ניתוח")
+    return True
+
+def main():
+    """פונקציה ראשית לבדיקות"""
+    print("🚀 מתחיל בדיקות ImageSource...")
+
+    kind_success = test_detect_kind()
+    decode_success = test_decode_once_and_views()
+    sampling_success = test_budgeted_sampling()
+    downloader_success = test_downloader()
+    upload_success = test_binary_uploads()
+
+    print(f"\n📊 סיכום בדיקות:")
+    print(f"   זיהוי סוג קלט: {'✅' if kind_success else '❌'}")
+    print(f"   פענוח חד-פעמי: {'✅' if decode_success else '❌'}")
+    print(f"   דגימה בתקציב: {'✅' if sampling_success else '❌'}")
+    print(f"   מטמון הורדות: {'✅' if downloader_success else '❌'}")
+    print(f"   העלאות בינאריות: {'✅' if upload_success else '❌'}")
+
+    if kind_success and decode_success and sampling_success and downloader_success and upload_success:
+        print("\n🎉 כל הבדיקות עברו בהצלחה!")
+        return True
+    else:
+        print("\n⚠️  חלק מהבדיקות נכשלו")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
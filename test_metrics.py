@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+
+def test_stage_timing():
+    """בודק מדידת שלבים, איסוף לבקשה וכותרת Server-Timing"""
+    print("\n🧪 בודק מדידת שלבים...")
+
+    before = metrics.STAGE_SECONDS.count(stage='test_stage')
+    with metrics.collect_stages() as stages:
+        with metrics.stage('test_stage'):
+            pass
+        with metrics.stage('test_stage'):
+            pass
+        metrics.observe_upstream('test_call', 0.5, error=True)
+    assert metrics.STAGE_SECONDS.count(stage='test_stage') == before + 2
+    assert [name for name, _ in stages] == ['test_stage', 'test_stage', 'openai_test_call']
+    assert metrics.UPSTREAM_ERRORS.value(call='test_call') >= 1
+
+    # שלב שחוזר מופיע פעם אחת, עם הסכום
+    header = metrics.server_timing([('decode', 0.01), ('palette', 0.02), ('decode', 0.005)], 0.05)
+    assert header == 'decode;dur=15.0, palette;dur=20.0, total;dur=50.0'
+
+    # שלבים מתהליך אחר נרשמים בתהליך הנוכחי
+    metrics.record_stages([('test_stage', 0.1)])
+    assert metrics.STAGE_SECONDS.count(stage='test_stage') == before + 3
+
+    # מדידה כבויה - context manager ריק, בלי רישום
+    metrics.METRICS_ENABLED = False
+    try:
+        with metrics.stage('test_stage'):
+            pass
+        assert metrics.STAGE_SECONDS.count(stage='test_stage') == before + 3
+        assert metrics.begin_request() is None
+    finally:
+        metrics.METRICS_ENABLED = True
+
+    print("✅ שלבים נמדדים ונאספים לבקשה")
+    return True
+
+
+def test_metrics_endpoint():
+    """בודק את /metrics ואת כותרת Server-Timing על בקשת ניתוח אמיתית"""
+    print("\n🧪 בודק את /metrics...")
+
+    import app as flask_module
+    client = flask_module.app.test_client()
+
+    buffer = BytesIO()
+    Image.fromarray(np.random.RandomState(0).randint(0, 256, (64, 64, 3), dtype=np.uint8)).save(buffer, 'PNG')
+    image_url = 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+    metrics.SERVER_TIMING_ENABLED = True
+    try:
+        response = client.post('/analyze-colors', json={'image_url': image_url, 'num_colors': 4, 'use_cache': False})
+    finally:
+        metrics.SERVER_TIMING_ENABLED = False
+    assert response.status_code == 200, response.get_json()
+    timing = response.headers['Server-Timing']
+    for name in ('base64_decode', 'decode', 'palette', 'total'):
+        assert f'{name};dur=' in timing, timing
+    print(f"   Server-Timing: {timing}")
+
+    scrape = client.get('/metrics')
+    assert scrape.status_code == 200 and scrape.mimetype == 'text/plain'
+    text = scrape.get_data(as_text=True)
+    assert 'poetic_stage_seconds_bucket{stage="palette",le="+Inf"}' in text
+    assert 'poetic_http_request_seconds_count{endpoint="analyze_colors",method="POST",status="200"}' in text
+    assert 'poetic_cache_hits_total{cache="analysis"}' in text
+    assert 'poetic_bytes_in_total{source="request"}' in text
+
+    print("✅ /metrics מחזיר שלבים, בקשות ומטמונים")
+    return True
+
+
+def main():
+    """פונקציה ראשית לבדיקות"""
+    print("🚀 מתחיל בדיקות מדדים...")
+
+    stage_success = test_stage_timing()
+    endpoint_success = test_metrics_endpoint()
+
+    print(f"\n📊 סיכום בדיקות:")
+    print(f"   מדידת שלבים: {'✅' if stage_success else '❌'}")
+    print(f"   נקודת /metrics: {'✅' if endpoint_success else '❌'}")
+
+    if stage_success and endpoint_success:
+        print("\n🎉 כל הבדיקות עברו בהצלחה!")
+        return True
+    else:
+        print("\n⚠️  חלק מהבדיקות נכשלו")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import app as flask_module
+from image_source import ImageSource
+
+
+def create_test_png(seed):
+    """יוצר PNG קטן עם שני פסי צבע ורעש"""
+    rng = np.random.RandomState(seed)
+    img = np.zeros((48, 64, 3), dtype=np.uint8)
+    img[:, :32] = rng.randint(0, 256, 3)
+    img[:, 32:] = rng.randint(0, 256, 3)
+    img = np.clip(img.astype(int) + rng.randint(-10, 10, img.shape), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def run_pipeline(poem, generation, body=None):
+    """
+    מריץ /pipeline עם שלבי OpenAI וההורדה מוחלפים
+
+    Returns:
+        tuple: (תגובה, רשימת השורות)
+    """
+    original = {name: getattr(flask_module, name)
+                for name in ('run_poetic_analysis', 'run_image_generation', 'download_generated_image')}
+    flask_module.run_poetic_analysis = poem
+    flask_module.run_image_generation = generation
+    flask_module.download_generated_image = lambda url: ImageSource(create_test_png(1))
+    try:
+        client = flask_module.app.test_client()
+        request = {'image': base64.b64encode(create_test_png(0)).decode('ascii'), 'num_colors': 3,
+                   'gradient_format': 'css', 'use_cache': False}
+        response = client.post('/pipeline', json=dict(request, **(body or {})))
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    finally:
+        for name, func in original.items():
+            setattr(flask_module, name, func)
+    return response, lines
+
+
+def poem_ok(image_data, is_additional=False, fresh=False):
+    return {'result': 'שיר בדיקה'}, 200
+
+
+def generation_ok(prompt, is_additional=False, fresh=False):
+    return {'generated_image_url': 'https://example.com/generated.png', 'poetic_text': prompt}, 200
+
+
+def test_pipeline_order():
+    """בודק את סדר השלבים ואת שורת הסיכום כשהכל מצליח"""
+    print("\n🧪 בודק את סדר שלבי ה-pipeline...")
+
+    response, lines = run_pipeline(poem_ok, generation_ok)
+    assert response.status_code == 200
+    stages = [line['stage'] for line in lines if 'stage' in line]
+    assert sorted(stages) == sorted(['poem', 'colors_original', 'edges_original', 'generate',
+                                     'colors_combined', 'edges_combined'])
+    # ההורדה שלב פנימי, וכל שלב מגיע אחרי התלות שלו
+    assert 'download' not in stages
+    assert stages.index('poem') < stages.index('generate')
+    assert stages.index('generate') < stages.index('colors_combined')
+    assert stages.index('generate') < stages.index('edges_combined')
+    assert all('result' in line for line in lines[:-1]), [line.get('error') for line in lines]
+
+    done = lines[-1]
+    assert done['done'] and done['stages'] == 6 and done['errors'] == 0
+    print(f"✅ {stages}")
+    return True
+
+
+def test_pipeline_failures():
+    """בודק דילוג על שלבים תלויים, חריגה בשלב וקלט לא תקין"""
+    print("\n🧪 בודק כישלונות ב-pipeline...")
+
+    # השיר נכשל - כל מה שתלוי בו מדולג, ניתוחי המקור עדיין רצים
+    response, lines = run_pipeline(lambda *args: ({'error': 'אין שיר'}, 500), generation_ok)
+    errors = {line['stage']: line['error'] for line in lines if 'error' in line}
+    assert errors['poem'] == 'אין שיר'
+    for dependent in ('generate', 'colors_combined', 'edges_combined'):
+        assert errors[dependent] == 'דולג - השלב poem נכשל'
+    assert {line['stage'] for line in lines if 'result' in line} == {'colors_original', 'edges_original'}
+    assert lines[-1]['done'] and lines[-1]['stages'] == 6 and lines[-1]['errors'] == 4
+
+    # חריגה בתוך שלב הופכת לשורת שגיאה, והשלבים שאחריו מדולגים
+    def generation_raises(*args):
+        raise RuntimeError('DALL-E לא זמין')
+    _, lines = run_pipeline(poem_ok, generation_raises)
+    errors = {line['stage']: line['error'] for line in lines if 'error' in line}
+    assert 'DALL-E לא זמין' in errors['generate']
+    assert set(errors) == {'generate', 'colors_combined', 'edges_combined'}
+    assert lines[-1]['stages'] == 6 and lines[-1]['errors'] == 3
+
+    # קידוד שנכשל בשלב אחד - שורת שגיאה לשלב, והתגובה ממשיכה עד done
+    artifact_response = flask_module.artifact_response
+    def failing_edges(result, data):
+        if 'edge_image' in result or 'edges_image' in result:
+            raise ValueError('קידוד נכשל')
+        return artifact_response(result, data)
+    flask_module.artifact_response = failing_edges
+    try:
+        _, lines = run_pipeline(poem_ok, generation_ok)
+    finally:
+        flask_module.artifact_response = artifact_response
+    errors = {line['stage'] for line in lines if 'error' in line}
+    assert errors == {'edges_original', 'edges_combined'}
+    assert lines[-1]['done'] and lines[-1]['errors'] == 2
+
+    # פרמטרים לא תקינים - 400 לפני שהתגובה הזורמת מתחילה
+    for body in ({'artifact_format': 'gif'}, {'artifact_preset': 'tiny'}, {'operator': 'laplace'}):
+        response, _ = run_pipeline(poem_ok, generation_ok, body)
+        assert response.status_code == 400, body
+
+    print("✅ שלבים תלויים מדולגים והסיכום נכון")
+    return True
+
+
+def main():
+    """פונקציה ראשית לבדיקות"""
+    print("🚀 מתחיל בדיקות pipeline...")
+
+    order_success = test_pipeline_order()
+    failure_success = test_pipeline_failures()
+
+    print(f"\n📊 סיכום בדיקות:")
+    print(f"   סדר השלבים: {'✅' if order_success else '❌'}")
+    print(f"   כישלונות ודילוגים: {'✅' if failure_success else '❌'}")
+
+    if order_success and failure_success:
+        print("\n🎉 כל הבדיקות עברו בהצלחה!")
+        return True
+    else:
+        print("\n⚠️  חלק מהבדיקות נכשלו")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
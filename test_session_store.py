@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+from session_store import SessionStore, resolve_session_id, run_in_session, current_session_id
+
+def test_session_isolation():
+    """בודק שכל סשן רואה רק את התוכן שלו ושהמזהים לא חוזרים"""
+    print("🧪 בודק הפרדה בין סשנים...")
+
+    store = SessionStore()
+    store.append('client-a', 'texts', {'text': 'שיר א'})
+    store.append('client-b', 'texts', {'text': 'שיר ב'})
+    store.append('client-a', 'images', {'url': 'data:image/png;base64,AAAA', 'type': 'original'})
+
+    a = store.get('client-a')
+    assert [t['text'] for t in a['texts']] == ['שיר א']
+    assert a['images'][0]['id'] == 0 and a['images'][0]['type'] == 'original'
+    assert store.get('client-b')['texts'][0]['text'] == 'שיר ב'
+    assert store.get('unknown') == {'images': [], 'texts': [], 'gradients': [], 'edge_images': []}
+
+    # עוגייה לא תקינה - סשן חדש
+    assert resolve_session_id('x' * 24) == ('x' * 24, False)
+    assert resolve_session_id('../../etc')[1]
+
+    # הקשר הסשן עובר ל-thread
+    assert run_in_session('client-a', current_session_id) == 'client-a'
+
+    print("✅ כל סשן מקבל רק את התוכן שלו")
+    return True
+
+def test_session_budgets():
+    """בודק פינוי לפי תקציב הסשן, תקציב המאגר ו-TTL"""
+    print("\n🧪 בודק תקציבי זיכרון ופינוי...")
+
+    blob = 'x' * 1000
+
+    # תקציב סשן - הפריטים הישנים נמחקים, המזהים ממשיכים לעלות
+    store = SessionStore(max_session_bytes=3500, max_total_bytes=10 ** 6)
+    for _ in range(10):
+        store.append('a', 'gradients', {'gradient_image': blob})
+    ids = [g['id'] for g in store.get('a')['gradients']]
+    assert ids == list(range(10 - len(ids), 10)) and len(ids) <= 3
+    assert store.stats()['bytes'] <= 3500
+
+    # תקציב המאגר - הסשן שלא היה בשימוש הכי הרבה זמן נמחק
+    store = SessionStore(max_session_bytes=10 ** 6, max_total_bytes=3500)
+    for sid in ('a', 'b', 'c', 'd'):
+        store.append(sid, 'images', {'url': blob})
+    assert store.get('a')['images'] == [] and store.get('d')['images']
+    assert store.stats()['evicted_sessions'] >= 1
+
+    # TTL
+    store = SessionStore(ttl=0.05)
+    store.append('a', 'texts', {'text': 'שיר'})
+    time.sleep(0.06)
+    store.append('b', 'texts', {'text': 'שיר'})
+    assert store.stats()['sessions'] == 1 and store.stats()['expired_sessions'] == 1
+
+    # ערכים גדולים לדיסק - לא נספרים בזיכרון ונטענים בחזרה בקריאה
+    store = SessionStore(spill_bytes=500)
+    store.append('a', 'images', {'url': blob, 'type': 'original'})
+    assert store.stats()['bytes'] < 1000 and store.stats()['disk_bytes'] == 1000
+    assert store.get('a')['images'][0]['url'] == blob
+    store.clear()
+    assert store.stats()['disk_bytes'] == 0
+
+    print(f"✅ {store.stats()}")
+    return True
+
+def test_content_pages():
+    """בודק עמודים וסמן since - כל פריט מגיע פעם אחת"""
+    print("\n🧪 בודק עמודים וסמן...")
+
+    store = SessionStore()
+    for i in range(5):
+        store.append('a', 'texts', {'text': f'שיר {i}'})
+        store.append('a', 'gradients', {'gradient_css': f'css {i}'})
+
+    seen = []
+    cursor = 0
+    while True:
+        page = store.page('a', since=cursor, limit=3)
+        seen += [t['text'] for t in page['texts']] + [g['gradient_css'] for g in page['gradients']]
+        cursor = page['cursor']
+        if not page['has_more']:
+            break
+    assert len(seen) == 10 and len(set(seen)) == 10
+
+    # אין חדש - עמוד ריק עם אותו סמן
+    assert store.page('a', since=cursor) == dict(store.get('b'), cursor=cursor, has_more=False)
+
+    # פריט חדש מגיע לבד
+    store.append('a', 'texts', {'text': 'חדש'})
+    page = store.page('a', since=cursor)
+    assert [t['text'] for t in page['texts']] == ['חדש'] and page['gradients'] == []
+
+    # סוג אחד בלבד
+    assert store.page('a', kinds=('gradients',))['texts'] == []
+
+    print("✅ העמודים מכסים את כל התוכן בלי כפילויות")
+    return True
+
+def test_blob_store():
+    """בודק שמירה לפי תוכן והחלפת data URL בכתובת blob"""
+    print("\n🧪 בודק את מאגר ה-blobs...")
+
+    import base64
+    import tempfile
+    from io import BytesIO
+    from PIL import Image
+    from blob_store import BlobStore, externalize_data_urls
+
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), (255, 0, 0)).save(buffer, format='PNG')
+    png = buffer.getvalue()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        blob_hash = store.put(png)
+        assert store.put(png) == blob_hash and store.stats()['writes'] == 1
+        assert store.get(blob_hash) == png
+        assert store.open(blob_hash)[1] == 'image/png'
+        assert store.open('../' + blob_hash) is None
+
+        data_url = f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+        item = externalize_data_urls({'gradient_image': data_url, 'colors_count': 3}, store)
+        assert item == {'gradient_image': f'/blob/{blob_hash}', 'gradient_image_hash': blob_hash, 'colors_count': 3}
+
+        # תקציב - הקובץ שלא נקרא הכי הרבה זמן נמחק
+        small = BlobStore(root, max_bytes=len(png) + 10)
+        other = small.put(png + b'\x00')
+        assert small.get(other) is not None and small.get(blob_hash) is None
+
+    # blob שסשן עוד מפנה אליו לא נמחק, והפינוי יורד עד low_water
+    with tempfile.TemporaryDirectory() as root:
+        sessions = SessionStore()
+        store = BlobStore(root, max_bytes=len(png) * 3, referenced=sessions.referenced_hashes)
+        kept = externalize_data_urls({'gradient_image': data_url}, store)['gradient_image_hash']
+        sessions.append('blob-session-0001', 'gradients', {'gradient_image_hash': kept})
+        hashes = [store.put(png + bytes([i])) for i in range(1, 4)]
+        assert store.get(kept) == png
+        assert store.stats()['bytes'] <= store.max_bytes * store.low_water
+        assert store.get(hashes[-1]) is not None and store.get(hashes[0]) is None
+
+    print("✅ כל תוכן נשמר פעם אחת")
+    return True
+
+def test_artifact_urls():
+    """בודק החזרת תוצרים ככתובות blob עם ETag ו-304 בצפייה חוזרת"""
+    print("\n🧪 בודק תוצרים ככתובות...")
+
+    import app as flask_module
+    client = flask_module.app.test_client()
+    colors = [[255, 0, 0], [0, 0, 255]]
+
+    inline = client.post('/create-combined-gradient', json={'colors': colors, 'width': 64, 'height': 16}).get_json()
+    assert inline['gradient_image'].startswith('data:image/png;base64,')
+
+    result = client.post('/create-combined-gradient', json={'colors': colors, 'width': 64, 'height': 16,
+                                                            'artifacts': 'url'}).get_json()
+    blob_hash = result['gradient_image_hash']
+    assert result['gradient_image'] == f'/blob/{blob_hash}'
+
+    first = client.get(result['gradient_image'])
+    assert first.status_code == 200 and first.mimetype == 'image/png'
+    assert first.headers['ETag'] == f'"{blob_hash}"' and 'immutable' in first.headers['Cache-Control']
+    repeat = client.get(result['gradient_image'], headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304 and not repeat.data
+
+    # WebP - קובץ אחר, אותם פיקסלים
+    webp = client.post('/create-combined-gradient', json={'colors': colors, 'width': 64, 'height': 16,
+                                                          'artifacts': 'url', 'artifact_format': 'webp'}).get_json()
+    assert client.get(webp['gradient_image']).mimetype == 'image/webp'
+
+    print("✅ צפייה חוזרת עולה 304")
+    return True
+
+def test_artifact_encoder():
+    """בודק את המקודד המשותף: ביט לפיקסל, WebP ללא אובדן, presets וקידוד inline"""
+    print("\n🧪 בודק את מקודד התוצרים...")
+
+    import numpy as np
+    from io import BytesIO
+    from PIL import Image
+    from artifact_encoder import encode_image, encode_edge_map, transcode, ARTIFACT_PRESETS
+
+    rng = np.random.RandomState(0)
+    edges = (rng.rand(120, 160) > 0.9).astype(np.uint8) * 255
+    gray = encode_edge_map(edges)
+    packed = encode_edge_map(edges, binary=True)
+    assert Image.open(BytesIO(gray)).mode == 'L' and Image.open(BytesIO(packed)).mode == '1'
+    assert len(packed) < len(gray) < len(encode_image(np.stack([edges] * 3, axis=-1)))
+
+    # כל preset וכל פורמט ללא אובדן
+    for preset in ARTIFACT_PRESETS:
+        for image_format in ('png', 'webp'):
+            data = encode_edge_map(edges, image_format, preset, binary=True)
+            assert np.array_equal(np.asarray(Image.open(BytesIO(data)).convert('L')), edges), (preset, image_format)
+    assert len(encode_image(edges, preset='archive')) <= len(encode_image(edges, preset='preview'))
+    assert transcode(gray) is gray
+    try:
+        encode_image(edges, 'gif')
+        assert False, 'gif לא נתמך'
+    except ValueError:
+        pass
+
+    # inline - הפורמט וה-preset מהבקשה חלים גם על data URL
+    import app as flask_module
+    client = flask_module.app.test_client()
+    result = client.post('/create-combined-gradient', json={'colors': [[255, 0, 0], [0, 0, 255]], 'width': 64,
+                                                            'height': 16, 'artifact_format': 'webp',
+                                                            'artifact_preset': 'archive'}).get_json()
+    assert result['gradient_image'].startswith('data:image/webp;base64,')
+
+    # פורמט / preset / מצב לא מוכרים - שגיאת לקוח (400), לפני כל ניתוח
+    for options in ({'artifact_format': 'gif'}, {'artifact_preset': 'tiny'}, {'artifacts': 'zip'}):
+        response = client.post('/create-combined-gradient', json=dict({'colors': [[255, 0, 0]]}, **options))
+        assert response.status_code == 400, options
+        response = client.post('/analyze-edges', json=dict({'image_url': 'data:image/png;base64,AAAA'}, **options))
+        assert response.status_code == 400, options
+
+    print("✅ קידוד בזיכרון בכל הפורמטים")
+    return True
+
+def main():
+    """פונקציה ראשית לבדיקות"""
+    print("🚀 מתחיל בדיקות מאגר הסשנים...")
+
+    isolation_success = test_session_isolation()
+    budget_success = test_session_budgets()
+    pages_success = test_content_pages()
+    blob_success = test_blob_store()
+    artifact_success = test_artifact_urls()
+    encoder_success = test_artifact_encoder()
+
+    print(f"\n📊 סיכום בדיקות:")
+    print(f"   הפרדה בין סשנים: {'✅' if isolation_success else '❌'}")
+    print(f"   תקציבים ופינוי: {'✅' if budget_success else '❌'}")
+    print(f"   עמודים וסמן: {'✅' if pages_success else '❌'}")
+    print(f"   מאגר blobs: {'✅' if blob_success else '❌'}")
+    print(f"   תוצרים ככתובות: {'✅' if artifact_success else '❌'}")
+    print(f"   מקודד תוצרים: {'✅' if encoder_success else '❌'}")
+
+    if isolation_success and budget_success and pages_success and blob_success and artifact_success and encoder_success:
+        print("\n🎉 כל הבדיקות עברו בהצלחה!")
+        return True
+    else:
+        print("\n⚠️  חלק מהבדיקות נכשלו")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
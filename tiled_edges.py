@@ -0,0 +1,323 @@
+"""
+ניתוח קווי מתאר ברצועות - זיכרון חסום לתמונות גדולות מאוד
+
+במקום מערכי float בגודל התמונה כולה, התמונה מעובדת ברצועות אופקיות (עם שורות
+חפיפה לגרעין), וכל רצועה נכתבת ישר למקודד PNG זורם. התמונה מפוענחת פעם אחת
+לגווני אפור (JPEG - ישר ל-'L' ב-draft), ומוקטנת אם גם היא חורגת מהתקציב.
+
+כך שיא הזיכרון תלוי בתקציב (EDGE_MEMORY_BUDGET_MB) ולא בגודל הקלט.
+ל-central / sobel / scharr התוצאה זהה לעיבוד של התמונה כולה; Canny הוא
+קירוב - הספים מחושבים על כל התמונה, וההיסטרזיס נעצר בגבולות החפיפה.
+
+הגדרות (משתני סביבה):
+    EDGE_MEMORY_BUDGET_MB    תקציב הזיכרון לניתוח אחד (ברירת מחדל: 64)
+    EDGE_TILED_MIN_PIXELS    מעל הסף הזה עוברים לעיבוד ברצועות אוטומטית (ברירת מחדל: 4,000,000)
+"""
+
+import os
+import zlib
+import struct
+from io import BytesIO
+
+# Import with error handling
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Warning: numpy import failed: {e}")
+    np = None
+
+try:
+    from PIL import Image
+except ImportError as e:
+    print(f"Warning: PIL import failed: {e}")
+    Image = None
+
+from lazy_imports import optional_import
+from edge_engine import compute_edge_map, auto_canny_thresholds, BINARY_EDGE_OPERATORS
+from artifact_encoder import png_compress_level, DEFAULT_ARTIFACT_PRESET
+from metrics import stage
+
+EDGE_MEMORY_BUDGET = int(os.getenv('EDGE_MEMORY_BUDGET_MB', 64)) * 1024 * 1024
+EDGE_TILED_MIN_PIXELS = int(os.getenv('EDGE_TILED_MIN_PIXELS', 4_000_000))
+
+# זיכרון עבודה לפיקסל ברצועה: מערכי float64 של הגרדיאנט, העוצמה והזמניים שלהם
+WORKING_BYTES_PER_PIXEL = 64
+# שורות חפיפה מעל ומתחת לכל רצועה: 1 לגרעין 3x3, יותר ל-Canny (החלקה, NMS והיסטרזיס)
+STRIP_OVERLAP = {'central': 1, 'sobel': 1, 'scharr': 1, 'canny': 16}
+MIN_STRIP_ROWS = 16
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# כמה בייטים דחוסים מצטברים לפני שנכתב chunk של IDAT
+_IDAT_CHUNK_SIZE = 256 * 1024
+
+
+class PngStreamWriter:
+    """
+    מקודד PNG זורם: שורות נכתבות ברצועות, ורק הפלט הדחוס נשמר בזיכרון
+
+    Args:
+        stream: קובץ / BytesIO לכתיבה
+        width (int): רוחב התמונה
+        height (int): גובה התמונה
+        mode (str): 'L' (אפור), 'RGB' או '1' (בינארי - ביט לפיקסל, ארוז)
+        level (int): רמת הדחיסה של zlib (0-9)
+    """
+
+    # מצב -> (color type, bit depth, ערוצים)
+    _COLOR_TYPES = {'L': (0, 8, 1), 'RGB': (2, 8, 3), '1': (0, 1, 1)}
+
+    def __init__(self, stream, width, height, mode='L', level=6):
+        if mode not in self._COLOR_TYPES:
+            raise ValueError(f"מצב PNG לא נתמך: {mode}")
+        color_type, bit_depth, self._channels = self._COLOR_TYPES[mode]
+        self.mode = mode
+        self._stream = stream
+        self.width = width
+        self.height = height
+        self._rows_written = 0
+        self._compressor = zlib.compressobj(level)
+        self._pending = []
+        self._pending_size = 0
+
+        stream.write(_PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self._stream.write(struct.pack('>I', len(data)))
+        self._stream.write(kind)
+        self._stream.write(data)
+        self._stream.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+    def _queue(self, data):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= _IDAT_CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_rows(self, rows):
+        """
+        כותב רצועת שורות - מערך uint8 בצורה (n, W) ל-'L' / '1' או (n, W, 3) ל-'RGB'
+
+        ב-'1' פיקסל מ-128 ומעלה הוא לבן.
+        """
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        if rows.shape[1] != self.width * self._channels:
+            raise ValueError(f"רוחב הרצועה {rows.shape[1]} לא תואם לתמונה")
+        if self._rows_written + len(rows) > self.height:
+            raise ValueError('נכתבו יותר שורות מגובה התמונה')
+        if self.mode == '1':
+            rows = np.packbits(rows >= 128, axis=1)
+        # בית פילטר 0 (None) לפני כל שורה - במפות קווי מתאר הוא דוחס טוב יותר מ-Sub / Up / Average
+        filtered = np.zeros((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows
+        self._queue(self._compressor.compress(filtered.tobytes()))
+        self._rows_written += len(rows)
+
+    def close(self):
+        if self._rows_written != self.height:
+            raise ValueError(f"נכתבו {self._rows_written} שורות מתוך {self.height}")
+        self._queue(self._compressor.flush())
+        self._flush()
+        self._chunk(b'IEND', b'')
+
+
+def should_tile(*sizes, tiled=None):
+    """
+    האם לעבד ברצועות: לפי בקשה מפורשת, או אוטומטית כשהתמונה הגדולה עוברת את הסף
+
+    Args:
+        sizes: (רוחב, גובה) של כל תמונה
+        tiled (bool): True / False מפורש, None - אוטומטי
+
+    Returns:
+        bool
+    """
+    if tiled is not None:
+        return bool(tiled)
+    return max(width * height for width, height in sizes) > EDGE_TILED_MIN_PIXELS
+
+
+def decode_gray(source, max_pixels=None, target_size=None):
+    """
+    מפענח את התמונה לגווני אפור בלי לשמור RGB מלא במקור
+
+    התוצאה נשארת תמונת PIL ('L', בית לפיקסל) - הרצועות נחתכות ממנה לפי הצורך,
+    בלי עותק NumPy של התמונה כולה.
+
+    Args:
+        source (ImageSource): מקור התמונה
+        max_pixels (int): מספר הפיקסלים המקסימלי (ברירת מחדל: חצי מתקציב הזיכרון)
+        target_size (tuple): (רוחב, גובה) שמספיק לשימוש - מאפשר פענוח מוקטן כבר ב-JPEG
+
+    Returns:
+        PIL.Image.Image: תמונה במצב 'L'
+    """
+    if max_pixels is None:
+        max_pixels = EDGE_MEMORY_BUDGET // 2
+
+    if source.is_decoded:
+        # כבר מפוענח (למשל לניתוח צבעים) - אין מה לחסוך בפענוח
+        img = Image.fromarray(source.gray())
+    else:
+        img = source.open()
+    width, height = img.size
+
+    # JPEG: פענוח ישר לאפור, בהקטנת DCT (1/2, 1/4, 1/8) שכבר נכנסת בתקציב - draft לא מקטין
+    # מתחת לגודל המבוקש, לכן מבקשים את גודל ההקטנה עצמו (ולא פענוח מלא והקטנה אחריו)
+    factor = 1
+    while factor < 8 and (width // factor) * (height // factor) > max_pixels:
+        factor *= 2
+    request = (max(1, width // factor), max(1, height // factor))
+    if target_size is not None:
+        request = (min(request[0], target_size[0]), min(request[1], target_size[1]))
+    with stage('decode'):
+        img.draft('L', request)
+        if img.mode != 'L':
+            img = img.convert('L')
+        else:
+            img.load()
+
+        # פורמטים אחרים (או יותר מ-1/8) - הקטנה אחרי הפענוח
+        width, height = img.size
+        if width * height > max_pixels:
+            scale = (width * height / max_pixels) ** 0.5
+            img = img.resize((max(1, int(width / scale)), max(1, int(height / scale))), Image.BILINEAR)
+    return img
+
+
+def gray_median(gray):
+    """
+    חציון גווני האפור מתוך ההיסטוגרמה - בלי למיין את כל הפיקסלים
+    """
+    counts = np.asarray(gray.histogram()[:256])
+    return float(np.searchsorted(np.cumsum(counts), (counts.sum() + 1) / 2))
+
+
+def strip_rows(width, operator, budget=None):
+    """
+    גובה הרצועה שנכנס בתקציב זיכרון העבודה (חצי מהתקציב הכולל)
+    """
+    budget = EDGE_MEMORY_BUDGET if budget is None else budget
+    return max(MIN_STRIP_ROWS, budget // 2 // max(1, width * WORKING_BYTES_PER_PIXEL))
+
+
+def _rows(gray, start, end):
+    if isinstance(gray, np.ndarray):
+        return gray[start:end]
+    return np.asarray(gray.crop((0, start, gray.size[0], end)))
+
+
+def iter_edge_strips(gray, operator, rows=None, canny_thresholds=None):
+    """
+    מחשב את מפת קווי המתאר רצועה אחרי רצועה
+
+    כל רצועה מחושבת עם שורות חפיפה מעל ומתחת, והחפיפה נחתכת - כך שב-central / sobel / scharr
+    התוצאה זהה לחישוב על התמונה כולה.
+
+    Args:
+        gray (PIL.Image.Image / np.ndarray): תמונה במצב 'L' או מערך (H, W) uint8
+        operator (str): אופרטור הגרדיאנט (ראו edge_engine)
+        rows (int): גובה רצועה (ברירת מחדל: לפי תקציב הזיכרון)
+        canny_thresholds (tuple): ספים ל-Canny (ברירת מחדל: אוטומטי לפי התמונה כולה)
+
+    Yields:
+        np.ndarray: רצועת מפת קווי מתאר (n, W) uint8
+    """
+    if isinstance(gray, np.ndarray):
+        height, width = gray.shape
+    else:
+        width, height = gray.size
+    rows = rows or strip_rows(width, operator)
+    overlap = STRIP_OVERLAP.get(operator, 1)
+    if operator == 'canny' and canny_thresholds is None:
+        if isinstance(gray, np.ndarray):
+            canny_thresholds = auto_canny_thresholds(gray)
+        else:
+            canny_thresholds = auto_canny_thresholds(np.array([gray_median(gray)]))
+
+    for top in range(0, height, rows):
+        bottom = min(height, top + rows)
+        start = max(0, top - overlap)
+        end = min(height, bottom + overlap)
+        # compute_edge_map מאפס את השורה הראשונה והאחרונה של כל חיתוך - בפנים אלה שורות החפיפה
+        # שנחתכות, ובקצוות התמונה אלה השוליים שנשארים 0 גם בחישוב המלא
+        edges = compute_edge_map(_rows(gray, start, end), operator, canny_thresholds)
+        yield edges[top - start:bottom - start]
+
+
+def tiled_edge_png(gray, operator, rows=None, preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    מפת קווי מתאר ברצועות, ישר לקובץ PNG
+
+    Args:
+        gray (PIL.Image.Image / np.ndarray): תמונה במצב 'L' או מערך (H, W) uint8
+        preset (str): preset הדחיסה (ראו artifact_encoder)
+
+    Returns:
+        bytes: קובץ PNG בגווני אפור (ב-Canny - ביט לפיקסל)
+    """
+    buffer = BytesIO()
+    width, height = gray.size if not isinstance(gray, np.ndarray) else (gray.shape[1], gray.shape[0])
+    mode = '1' if operator in BINARY_EDGE_OPERATORS else 'L'
+    writer = PngStreamWriter(buffer, width, height, mode, png_compress_level(preset))
+    # הגרדיאנט והקידוד משולבים ברצועות - נמדדים כשלב אחד
+    with stage('edges'):
+        for strip in iter_edge_strips(gray, operator, rows):
+            writer.write_rows(strip)
+        writer.close()
+    return buffer.getvalue()
+
+
+def tiled_combined_edge_png(source1, source2, blend_ratio=0.5, rows=None, thresholds=(100, 200),
+                            preset=DEFAULT_ARTIFACT_PRESET):
+    """
+    קווי מתאר משולבים ברצועות: שתי התמונות באפור, יישור גודל, ערבוב ו-Canny לכל רצועה
+
+    ערבוב גווני האפור שקול (עד עיגול) לאפור של הערבוב ב-RGB, כך שאין צורך ב-RGB מלא.
+
+    Args:
+        source1 (ImageSource): התמונה הראשונה
+        source2 (ImageSource): התמונה השנייה
+        blend_ratio (float): יחס הערבוב בין התמונות (0-1)
+        rows (int): גובה רצועה (ברירת מחדל: לפי תקציב הזיכרון)
+        thresholds (tuple): ספי Canny
+        preset (str): preset הדחיסה (ראו artifact_encoder)
+
+    Returns:
+        bytes: קובץ PNG בינארי (ביט לפיקסל)
+    """
+    cv2 = optional_import('cv2', 'OpenCV')
+    if cv2 is None:
+        raise RuntimeError('OpenCV library not available for edge detection')
+
+    (width1, height1), (width2, height2) = source1.size, source2.size
+    target = (min(width1, width2), min(height1, height2))
+    # כל תמונה מקבלת רבע מהתקציב (שתיים + רצועות העבודה)
+    max_pixels = EDGE_MEMORY_BUDGET // 4
+    grays = [decode_gray(source, max_pixels, target) for source in (source1, source2)]
+    width = min(gray.size[0] for gray in grays)
+    height = min(gray.size[1] for gray in grays)
+    grays = [gray if gray.size == (width, height) else gray.resize((width, height), Image.BILINEAR)
+             for gray in grays]
+
+    rows = rows or strip_rows(width, 'canny')
+    overlap = STRIP_OVERLAP['canny']
+    buffer = BytesIO()
+    writer = PngStreamWriter(buffer, width, height, '1', png_compress_level(preset))
+    with stage('edges'):
+        for top in range(0, height, rows):
+            bottom = min(height, top + rows)
+            start, end = max(0, top - overlap), min(height, bottom + overlap)
+            blended = cv2.addWeighted(_rows(grays[0], start, end), blend_ratio,
+                                      _rows(grays[1], start, end), 1 - blend_ratio, 0)
+            edges = cv2.Canny(blended, *thresholds)
+            writer.write_rows(edges[top - start:bottom - start])
+        writer.close()
+    return buffer.getvalue()